@@ -0,0 +1,382 @@
+"""
+Concurrent triplet extraction over the cleaned movie plots.
+
+Same CSV, prompt and checkpoint format as entityExtraction.py, but requests are
+issued on an asyncio client with a bounded number in flight, throttled to the
+account's requests/tokens-per-minute budget and retried with backoff when the
+API pushes back. Results are written out in input order as soon as every row
+before them has finished. With --pack-tokens, several short plots share one
+request and one copy of the instructions (see promptPacking.py). With
+--chunk-tokens, long plots are split into overlapping chunks that are
+extracted in parallel and merged back per movie (see chunking.py). Run
+ruleExtraction.py first to take the plots its parser handles confidently off
+this path; --hints then adds its candidates to the remaining prompts.
+
+Usage:
+    python Phase1_EntityGen/asyncExtraction.py --concurrency 32 --rpm 5000 --tpm 2000000
+    python Phase1_EntityGen/asyncExtraction.py --base-url http://127.0.0.1:8000/v1   # stub server
+    python Phase1_EntityGen/asyncExtraction.py --pack-tokens 3000 --pack-items 16
+    python Phase1_EntityGen/asyncExtraction.py --column Plot --chunk-tokens 1500 --chunk-overlap 150
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+import openai
+from dotenv import load_dotenv
+from prompts import TRIPLET_PROMPT
+from chunking import ChunkMerger, chunk_text
+from promptPacking import RowPacker, build_packed_prompt, format_hints, packed_max_tokens, parse_packed_response
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.checkpoint import TripletCheckpoint, iter_records
+from common.dataset import load_movies
+from common.llm_cache import acached_chat_completion, get_cache
+
+load_dotenv()
+
+# File paths
+csv_file = "cleaned_wiki_movie_plots.csv"
+output_file = "extracted_triplets.jsonl"
+
+MODEL = "gpt-4o-mini"
+TEMPERATURE = 0.3
+MAX_TOKENS = 512
+
+# Errors worth retrying; anything else is reported and the row is skipped
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+
+class RateLimiter:
+    """Token bucket over requests-per-minute and tokens-per-minute budgets.
+
+    Either budget may be None to leave it unbounded. Waiters are served in
+    arrival order so a large request cannot be starved by small ones.
+    """
+
+    def __init__(self, rpm=None, tpm=None):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests = float(rpm or 0)
+        self._tokens = float(tpm or 0)
+        self._last = time.monotonic()
+        # Created in acquire(): before 3.10 a Lock binds to the loop current at construction,
+        # and callers build the limiter before starting the loop that uses it
+        self._lock = None
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._last
+        self._last = now
+        if self.rpm:
+            self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+        if self.tpm:
+            self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+
+    async def acquire(self, tokens):
+        """Wait until one request and `tokens` tokens fit in the budget."""
+        if self.tpm:
+            tokens = min(tokens, self.tpm)
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                self._refill()
+                wait = 0.0
+                if self.rpm and self._requests < 1:
+                    wait = max(wait, (1 - self._requests) * 60 / self.rpm)
+                if self.tpm and self._tokens < tokens:
+                    wait = max(wait, (tokens - self._tokens) * 60 / self.tpm)
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+            if self.rpm:
+                self._requests -= 1
+            if self.tpm:
+                self._tokens -= tokens
+
+    def settle(self, estimated, actual):
+        """Return the difference between estimated and actual token usage to the bucket."""
+        if self.tpm and actual is not None:
+            self._tokens = min(self.tpm, self._tokens + estimated - actual)
+
+
+def estimate_tokens(prompt, max_tokens=MAX_TOKENS):
+    """Rough upper bound on tokens a request consumes (~4 characters per token)."""
+    return len(prompt) // 4 + max_tokens
+
+
+def retry_delay(error, attempt):
+    """Backoff before the next attempt, honouring the server's Retry-After when given."""
+    response = getattr(error, "response", None)
+    if response is not None:
+        retry_after = response.headers.get("retry-after")
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+    return min(60.0, 2 ** attempt) * random.uniform(0.5, 1.0)
+
+
+async def complete_async(client, prompt, limiter, max_retries=6, max_tokens=MAX_TOKENS, stats=None):
+    """One extraction completion with rate limiting and retries; None when it keeps failing."""
+    estimate = estimate_tokens(prompt, max_tokens)
+
+    async def before_request():
+        if stats is not None:
+            stats["requests"] += 1
+            stats["prompt_tokens"] += len(prompt) // 4
+        await limiter.acquire(estimate)
+
+    def after_response(response):
+        usage = getattr(response, "usage", None)
+        limiter.settle(estimate, usage.total_tokens if usage else None)
+
+    for attempt in range(max_retries + 1):
+        try:
+            # Cache hits return immediately without touching the rate limiter
+            return await acached_chat_completion(
+                client,
+                model=MODEL,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=TEMPERATURE,
+                max_tokens=max_tokens,
+                before_request=before_request,
+                after_response=after_response
+            )
+        except RETRYABLE_ERRORS as e:
+            if attempt == max_retries:
+                print(f"Giving up after {attempt + 1} attempts: {e}")
+                return None
+            await asyncio.sleep(retry_delay(e, attempt))
+        except openai.OpenAIError as e:
+            print(f"Error during OpenAI API call: {e}")
+            return None
+
+    return None
+
+
+async def extract_triplets_async(client, text, limiter, max_retries=6, stats=None, hints=None):
+    """Async counterpart of entityExtraction.extract_triplets with rate limiting and retries.
+
+    `hints` are rule-based candidate triplets for the plot (see ruleExtraction.py).
+    """
+    prompt = TRIPLET_PROMPT.format(text=text) + format_hints(hints)
+    triplets_text = await complete_async(client, prompt, limiter, max_retries, stats=stats)
+    if triplets_text is None:
+        return None
+    return list(set(triplets_text.strip().split("\n")))
+
+
+async def extract_pack_async(client, rows, limiter, max_retries=6, stats=None, hints=None):
+    """
+    Extracts triplets for several (row_id, title, text, ...) rows with one packed request.
+
+    Rows whose share of the answer is missing, malformed or truncated are sent
+    again in two smaller packs. A row that fails on its own falls back to
+    the single-plot prompt.
+
+    Returns:
+        dict: row_id -> triplet lines, or None when extraction failed.
+    """
+    hints = hints or {}
+    if len(rows) == 1:
+        row_id = rows[0][0]
+        return {row_id: await extract_triplets_async(client, rows[0][2], limiter, max_retries, stats,
+                                                     hints.get(row_id))}
+
+    row_ids = [row[0] for row in rows]
+    text = await complete_async(client, build_packed_prompt(rows, hints), limiter, max_retries,
+                                max_tokens=packed_max_tokens(rows), stats=stats)
+    if text is None:
+        results, failed = {}, dict.fromkeys(row_ids, "error")
+    else:
+        results, failed = parse_packed_response(text, row_ids)
+
+    retry = [row for row in rows if row[0] in failed]
+    if retry:
+        if stats is not None:
+            stats["resent"] += len(retry)
+        half = (len(retry) + 1) // 2
+        for part in (retry[:half], retry[half:]):
+            if part:
+                results.update(await extract_pack_async(client, part, limiter, max_retries, stats, hints))
+    return results
+
+
+class OrderedWriter:
+    """Collects results that finish out of order and writes them back in input order.
+
+    A result is only appended to the checkpoint once every row before it has
+    completed (or been skipped), so the JSONL stays in CSV order.
+    """
+
+    def __init__(self, checkpoint, flush_every=50):
+        self.checkpoint = checkpoint
+        self.flush_every = flush_every
+        self.next_index = 0
+        self.pending = {}
+        self.unflushed = 0
+        self.last_title = None
+
+    def add(self, index, record):
+        """Registers the result for input position `index` (None marks a skipped row)."""
+        self.pending[index] = record
+        while self.next_index in self.pending:
+            record = self.pending.pop(self.next_index)
+            if record:
+                self.checkpoint.append(record)
+                self.unflushed += 1
+                self.last_title = record["Title"]
+            self.next_index += 1
+        if self.unflushed >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if not self.unflushed:
+            return
+        self.checkpoint.flush()
+        print(f"Saved {self.unflushed} triplets. Last processed row: {self.last_title}")
+        self.unflushed = 0
+
+
+async def run_extraction(rows, client, limiter, writer, concurrency=16, max_retries=6, pack_tokens=None,
+                         pack_items=16, stats=None, chunk_tokens=None, chunk_overlap=150, hints=None):
+    """
+    Extracts triplets for `rows` ((row_id, title, text) tuples) with at most `concurrency` requests in flight.
+
+    With `pack_tokens`, up to `pack_items` plots totalling about that many
+    tokens share one request (see promptPacking.py). With `chunk_tokens`,
+    plots longer than that are split into overlapping chunks. The chunks are
+    extracted in parallel like any other request, and their triplets are
+    merged per movie (see chunking.py). `hints` ({row_id: candidate triplet
+    lines}, from ruleExtraction.py) are added to the prompts of whole plots.
+    """
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+    merger = ChunkMerger()
+
+    async def producer():
+        packer = RowPacker(pack_tokens, pack_items) if pack_tokens else None
+        for index, (row_id, title, text) in enumerate(rows):
+            text = str(text)
+            chunks = chunk_text(text, chunk_tokens, chunk_overlap) if chunk_tokens else [text]
+            if len(chunks) > 1:
+                merger.start(index, row_id, title, len(chunks))
+                for part, chunk in enumerate(chunks):
+                    await queue.put(("chunk", (index, part, chunk)))
+                continue
+            # Rows carry their input position so packed results can still be written in order
+            row = (row_id, title, text, index)
+            pack = packer.add(row) if packer else [row]
+            if pack:
+                await queue.put(("rows", pack))
+        pack = packer.flush() if packer else None
+        if pack:
+            await queue.put(("rows", pack))
+        for _ in range(concurrency):
+            await queue.put(None)
+
+    def record(row_id, title, triplets):
+        return {"row_id": int(row_id), "Title": title, "Triplets": triplets} if triplets else None
+
+    async def worker():
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            kind, payload = item
+            if kind == "chunk":
+                index, part, chunk = payload
+                lines = await extract_triplets_async(client, chunk, limiter, max_retries, stats)
+                merged = merger.add(index, part, lines)
+                if merged is not None:
+                    writer.add(index, record(*merged))
+                continue
+            results = await extract_pack_async(client, payload, limiter, max_retries, stats, hints)
+            for row_id, title, _, index in payload:
+                writer.add(index, record(row_id, title, results.get(row_id)))
+
+    await asyncio.gather(producer(), *(worker() for _ in range(concurrency)))
+    writer.flush()
+
+
+def make_client(base_url=None, timeout=120):
+    """Async OpenAI client; retries are handled here, not by the SDK."""
+    return openai.AsyncOpenAI(
+        api_key=os.getenv("OPENAI_API_KEY") or "stub",
+        base_url=base_url,
+        max_retries=0,
+        timeout=timeout
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent triplet extraction")
+    parser.add_argument("--csv", default=csv_file)
+    parser.add_argument("--output", default=output_file)
+    parser.add_argument("--concurrency", type=int, default=16, help="Maximum requests in flight")
+    parser.add_argument("--rpm", type=int, default=None, help="Requests-per-minute budget")
+    parser.add_argument("--tpm", type=int, default=None, help="Tokens-per-minute budget")
+    parser.add_argument("--max-retries", type=int, default=6)
+    parser.add_argument("--flush-every", type=int, default=50, help="Rows per write to the output file")
+    parser.add_argument("--limit", type=int, default=None, help="Only process this many rows")
+    parser.add_argument("--base-url", default=None, help="OpenAI-compatible endpoint, e.g. the stub server")
+    parser.add_argument("--pack-tokens", type=int, default=None,
+                        help="Pack several plots (up to this many plot tokens) into each request")
+    parser.add_argument("--pack-items", type=int, default=16, help="Most plots per packed request")
+    parser.add_argument("--chunk-tokens", type=int, default=None,
+                        help="Split plots longer than this many tokens into chunks extracted in parallel")
+    parser.add_argument("--chunk-overlap", type=int, default=150, help="Tokens repeated between adjacent chunks")
+    parser.add_argument("--column", choices=["Cleaned_Plot", "Plot"], default="Cleaned_Plot",
+                        help="Plot text to extract from; Plot keeps the sentence boundaries chunking splits on")
+    parser.add_argument("--hints", default=None,
+                        help="Candidate triplets from ruleExtraction.py to add to each plot's prompt")
+    args = parser.parse_args()
+    if args.chunk_tokens is not None and args.chunk_overlap >= args.chunk_tokens:
+        parser.error("--chunk-overlap must be smaller than --chunk-tokens")
+
+    df = load_movies(["Title", args.column], path=args.csv)
+
+    # Rows already in the checkpoint are skipped, so reruns resume where they stopped
+    checkpoint = TripletCheckpoint(args.output)
+    batch = df[~df.index.map(checkpoint.__contains__)]
+    if args.limit is not None:
+        batch = batch.iloc[:args.limit]
+    rows = zip(batch.index.tolist(), batch["Title"].tolist(), batch[args.column].tolist())
+
+    hints = {record["row_id"]: record["Triplets"] for record in iter_records(args.hints)} if args.hints else None
+
+    client = make_client(args.base_url)
+    limiter = RateLimiter(rpm=args.rpm, tpm=args.tpm)
+    writer = OrderedWriter(checkpoint, flush_every=args.flush_every)
+    stats = {"requests": 0, "prompt_tokens": 0, "resent": 0}
+
+    start = time.perf_counter()
+    try:
+        asyncio.run(run_extraction(rows, client, limiter, writer, args.concurrency, args.max_retries,
+                                   args.pack_tokens, args.pack_items, stats, args.chunk_tokens,
+                                   args.chunk_overlap, hints))
+    finally:
+        checkpoint.close()
+    elapsed = time.perf_counter() - start
+
+    cache = get_cache()
+    if cache is not None:
+        print(f"LLM cache: {cache.stats()}")
+    print(f"Processed {len(batch)} rows in {elapsed:.1f}s ({len(batch) / max(elapsed, 1e-9):.1f} rows/sec)")
+    print(f"{stats['requests']} API requests, ~{stats['prompt_tokens']} prompt tokens, "
+          f"{stats['resent']} rows re-sent after a malformed or truncated packed answer")
+    print(f"Triplet extraction completed. Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Throughput comparison of the sequential extraction loop against asyncExtraction.
+
+Both paths run against the local stub server, so the numbers reflect request
+scheduling only, not model speed. With --pack-tokens the async path is also
+run with packed prompts, and requests and prompt tokens are counted.
+
+Usage:
+    python Phase1_EntityGen/benchExtraction.py --rows 200 --latency 0.5 --concurrency 32
+    python Phase1_EntityGen/benchExtraction.py --rows 200 --pack-tokens 3000 --skip-sequential
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import openai
+
+import asyncExtraction
+import stubLLMServer
+from prompts import TRIPLET_PROMPT
+
+
+def run_sequential(base_url, rows):
+    """One blocking request per plot, as entityExtraction.py does."""
+    client = openai.OpenAI(api_key="stub", base_url=base_url, max_retries=0)
+    for _, _, text in rows:
+        response = client.chat.completions.create(
+            model=asyncExtraction.MODEL,
+            messages=[{"role": "user", "content": TRIPLET_PROMPT.format(text=text)}],
+            temperature=asyncExtraction.TEMPERATURE,
+            max_tokens=asyncExtraction.MAX_TOKENS
+        )
+        list(set(response.choices[0].message.content.strip().split("\n")))
+
+
+def run_async(base_url, rows, concurrency, output, pack_tokens=None):
+    client = asyncExtraction.make_client(base_url)
+    limiter = asyncExtraction.RateLimiter()
+    stats = {"requests": 0, "prompt_tokens": 0, "resent": 0}
+    with asyncExtraction.TripletCheckpoint(output) as checkpoint:
+        writer = asyncExtraction.OrderedWriter(checkpoint, flush_every=len(rows))
+        asyncio.run(asyncExtraction.run_extraction(rows, client, limiter, writer, concurrency,
+                                                   pack_tokens=pack_tokens, stats=stats))
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sequential vs async extraction")
+    parser.add_argument("--rows", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--skip-sequential", action="store_true")
+    parser.add_argument("--pack-tokens", type=int, default=None, help="Also run async with packed prompts")
+    args = parser.parse_args()
+
+    # Measure request scheduling, not cache hits from a previous run
+    os.environ["LLM_CACHE_DISABLE"] = "1"
+
+    server, base_url = stubLLMServer.start_in_thread(port=0, latency=args.latency, jitter=0.0)
+    rows = [(i, f"Movie {i}", f"plot text number {i} " * 40) for i in range(args.rows)]
+
+    results = {}
+    if not args.skip_sequential:
+        start = time.perf_counter()
+        run_sequential(base_url, rows)
+        results["sequential"] = time.perf_counter() - start
+
+    requests = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        name = f"async (concurrency={args.concurrency})"
+        requests[name] = run_async(base_url, rows, args.concurrency, os.path.join(tmp, "out.jsonl"))
+        results[name] = time.perf_counter() - start
+
+        if args.pack_tokens:
+            start = time.perf_counter()
+            name = f"packed ({args.pack_tokens} tokens)"
+            requests[name] = run_async(base_url, rows, args.concurrency, os.path.join(tmp, "packed.jsonl"),
+                                       args.pack_tokens)
+            results[name] = time.perf_counter() - start
+
+    server.shutdown()
+
+    print(f"\n{args.rows} rows, {args.latency}s simulated latency")
+    for name, elapsed in results.items():
+        counts = requests.get(name)
+        counts = f"  {counts['requests']:6} requests  ~{counts['prompt_tokens']} prompt tokens" if counts else ""
+        print(f"{name:>28}: {elapsed:7.2f}s  {args.rows / elapsed:8.1f} rows/sec{counts}")
+
+
+if __name__ == "__main__":
+    main()
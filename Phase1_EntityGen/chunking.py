@@ -0,0 +1,139 @@
+"""
+Token-bounded, overlapping chunks of long plots, with the triplets merged back per movie.
+
+Extraction caps each answer at MAX_TOKENS. A long plot sent whole either
+loses triplets from its second half or becomes one slow call that holds up
+the rest. chunk_text() cuts such a plot into windows of at most `max_tokens`
+tokens along sentence boundaries. Each window repeats the last
+`overlap_tokens` worth of sentences from the one before it, so a relation
+that spans a boundary is still seen whole. The chunks are extracted
+independently, and ChunkMerger joins their triplets per movie, dropping
+duplicates (compared on common.triplets' canonical keys).
+
+The raw Plot column keeps its punctuation. Cleaned_Plot has had it
+stripped, so its "sentences" are fixed runs of FALLBACK_SENTENCE_WORDS words.
+"""
+import os
+import re
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.tokens import count_tokens
+from common.triplets import TripletCanonicalizer, parse_triplet
+
+# A sentence ends at . ! or ? (plus up to two closing quotes/brackets) before a capital, but not after a title.
+# Only the whitespace is consumed, so the closing characters stay with their sentence.
+_ABBREVIATIONS = ("Mr", "Mrs", "Ms", "Dr", "St", "Jr", "Sr", "Lt", "Col", "Gen", "Capt", "Sgt", "Prof", "vs")
+SENTENCE_END = re.compile(
+    "".join(rf"(?<!\b{abbreviation}\.)" for abbreviation in _ABBREVIATIONS)
+    + r"(?:(?<=[.!?])|(?<=[.!?][\"')\]])|(?<=[.!?][\"')\]]{2}))\s+(?=[\"'(\[]?[A-Z0-9])"
+)
+FALLBACK_SENTENCE_WORDS = 40
+
+
+def split_sentences(text):
+    """Sentences of `text`, or fixed word runs when it has no sentence punctuation."""
+    text = " ".join(text.split())
+    sentences = [sentence for sentence in SENTENCE_END.split(text) if sentence]
+    if len(sentences) > 1 or count_tokens(text) <= FALLBACK_SENTENCE_WORDS * 2:
+        return sentences
+    words = text.split(" ")
+    return [" ".join(words[i:i + FALLBACK_SENTENCE_WORDS]) for i in range(0, len(words), FALLBACK_SENTENCE_WORDS)]
+
+
+def _split_long_sentence(sentence, max_tokens):
+    """Cuts one over-budget sentence into word runs that fit."""
+    words = sentence.split(" ")
+    step = max(1, len(words) * max_tokens // max(count_tokens(sentence), 1))
+    return [" ".join(words[i:i + step]) for i in range(0, len(words), step)]
+
+
+def chunk_text(text, max_tokens=1500, overlap_tokens=150):
+    """
+    Splits `text` into sentence-aligned windows of at most ~`max_tokens` tokens.
+
+    Args:
+        text (str): The plot.
+        max_tokens (int): Token budget per chunk.
+        overlap_tokens (int): Trailing tokens of each chunk repeated at the start of the next, capped at
+            half of `max_tokens` so every window moves the plot forward.
+
+    Returns:
+        list: The chunks; a plot within the budget comes back as a single chunk.
+    """
+    if count_tokens(text) <= max_tokens:
+        return [text]
+    overlap_tokens = min(overlap_tokens, max_tokens // 2)
+
+    sentences = []
+    for sentence in split_sentences(text):
+        tokens = count_tokens(sentence)
+        if tokens > max_tokens:
+            sentences.extend((part, count_tokens(part)) for part in _split_long_sentence(sentence, max_tokens))
+        else:
+            sentences.append((sentence, tokens))
+
+    chunks = []
+    window, used = [], 0
+    for sentence, tokens in sentences:
+        if window and used + tokens > max_tokens:
+            chunks.append(" ".join(s for s, _ in window))
+            # Carry the trailing sentences forward as overlap, but never the whole window
+            carried, carried_tokens = [], 0
+            for previous in reversed(window[1:]):
+                if carried_tokens + previous[1] > overlap_tokens:
+                    break
+                carried.insert(0, previous)
+                carried_tokens += previous[1]
+            window, used = carried, carried_tokens
+        window.append((sentence, tokens))
+        used += tokens
+    if window:
+        chunks.append(" ".join(s for s, _ in window))
+    return chunks
+
+
+def merge_triplets(chunk_results):
+    """Unions the triplet lines of a movie's chunks in order, dropping duplicates and unparseable lines."""
+    seen = set()
+    merged = []
+    for lines in chunk_results:
+        for line in lines or []:
+            parsed = parse_triplet(line)
+            if parsed is None:
+                continue
+            key = (TripletCanonicalizer.entity_key(parsed[0]), TripletCanonicalizer.relation_key(parsed[1]),
+                   TripletCanonicalizer.entity_key(parsed[2]))
+            if key not in seen:
+                seen.add(key)
+                merged.append(line.strip())
+    return merged
+
+
+class ChunkMerger:
+    """Collects per-chunk results that finish in any order and merges each movie once all its chunks are in."""
+
+    def __init__(self):
+        self._pending = {}
+
+    def start(self, index, row_id, title, chunks):
+        self._pending[index] = {"row_id": row_id, "title": title, "parts": [None] * chunks, "left": chunks,
+                               "failed": False}
+
+    def add(self, index, part, lines):
+        """Records chunk `part` of the movie at input position `index`.
+
+        Returns (row_id, title, merged triplet lines) once the last chunk is in, else None.
+        `lines` is None for a chunk whose extraction failed; the whole movie then
+        merges to None, so it stays pending in the checkpoint instead of being
+        saved with part of its triplets.
+        """
+        entry = self._pending[index]
+        entry["parts"][part] = lines
+        entry["failed"] = entry["failed"] or lines is None
+        entry["left"] -= 1
+        if entry["left"]:
+            return None
+        del self._pending[index]
+        merged = None if entry["failed"] else merge_triplets(entry["parts"])
+        return entry["row_id"], entry["title"], merged
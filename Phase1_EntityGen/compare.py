@@ -1,9 +1,14 @@
-import pandas as pd
+import os
+import sys
 
-df = pd.read_csv("cleaned_wiki_movie_plots.csv")
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.dataset import load_movies
 
-# Compare original vs cleaned for the first few rows
-for i in range(5):  # Check first 5 rows
-    print(f"Original: {df['Plot'][i]}")
-    print(f"\nCleaned:  {df['Cleaned_Plot'][i]}")
-    print("="*80)
\ No newline at end of file
+if __name__ == "__main__":
+    df = load_movies(["Plot", "Cleaned_Plot"])
+
+    # Compare original vs cleaned for the first few rows
+    for i in range(5):  # Check first 5 rows
+        print(f"Original: {df['Plot'][i]}")
+        print(f"\nCleaned:  {df['Cleaned_Plot'][i]}")
+        print("="*80)
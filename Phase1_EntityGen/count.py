@@ -1,10 +1,13 @@
-import json
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.checkpoint import iter_records
 
 def count_movies(json_file):
-    with open(json_file, 'r', encoding='utf-8') as file:
-        movies = json.load(file)
-    return len(movies)
+    return sum(1 for _ in iter_records(json_file))
 
-# Example usage
-json_file = "extracted_triplets.json"  # Replace with your actual JSON file path
-print("Number of movies:", count_movies(json_file))
\ No newline at end of file
+if __name__ == "__main__":
+    # Example usage
+    json_file = "extracted_triplets.jsonl"  # Replace with your actual JSON file path
+    print("Number of movies:", count_movies(json_file))
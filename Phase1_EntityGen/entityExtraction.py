@@ -1,58 +1,43 @@
-import openai
-import spacy
-import pandas as pd
-import json
 import os
+import sys
 from dotenv import load_dotenv
+from prompts import TRIPLET_PROMPT
 
-load_dotenv()
 
-# Ensure spaCy model is installed
-try:
-    nlp = spacy.load("en_core_web_sm")
-except OSError:
-    print("Downloading 'en_core_web_sm' model...")
-    import spacy.cli
-    spacy.cli.download("en_core_web_sm")
-    nlp = spacy.load("en_core_web_sm")
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.checkpoint import TripletCheckpoint
+from common.dataset import load_movies
+from common.llm_cache import cached_chat_completion
 
-# OpenAI API Key
-key_RAG = os.getenv("OPENAI_API_KEY")
-client = openai.OpenAI(api_key=key_RAG)
+load_dotenv()
 
 # File paths
 csv_file = "cleaned_wiki_movie_plots.csv"
-output_file = "extracted_triplets.json"
+output_file = "extracted_triplets.jsonl"
+
+_client = None
+
+def get_client():
+    """OpenAI client shared by every extraction call in this process, created on first use."""
+    global _client
+    if _client is None:
+        import openai
+        _client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return _client
 
 # Function to extract structured triplets (Subject, Relation, Object)
 def extract_triplets(text):
-    prompt = f"""
-Extract structured relational triplets (Subject, Relation, Object) from the following text.
-Ensure that:
-- Each triplet follows the format: (Subject, Relation, Object).
-- No missing objects; infer a reasonable object if necessary.
-- Relations are semantically meaningful (avoid generic verbs like 'is', 'has', 'appears').
-- Redundant or duplicate triplets are removed.
-- Output is strictly a newline-separated list of triplets.
-
-Example output format:
-(Jack, trades, cow for beans)
-(Mother, forces, Jack to drop beans in front yard)
-(Jack, ascends, beanstalk)
-
-Text: {text}
-"""
+    prompt = TRIPLET_PROMPT.format(text=text)
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",  
+        # Served from the on-disk LLM cache when this exact prompt was sent before
+        triplets_text = cached_chat_completion(
+            get_client(),
+            model="gpt-4o-mini",
             messages=[{"role": "user", "content": prompt}],
-            temperature=0.3,  
+            temperature=0.3,
             max_tokens=512
-        )
-
-        
-        triplets_text = response.choices[0].message.content.strip()
+        ).strip()
         triplets = list(set(triplets_text.split("\n")))
 
         return triplets
@@ -61,65 +46,43 @@ Text: {text}
         print(f"Error during OpenAI API call: {e}")
         return None
 
-# Function to get last processed index from JSON file
-def get_last_processed_index():
-    if os.path.exists(output_file) and os.path.getsize(output_file) > 0:
-        with open(output_file, "r") as f:
-            try:
-                data = json.load(f)
-                if data:
-                    last_title = data[-1]["Title"]
-                    return last_title
-            except json.JSONDecodeError:
-                return None
-    return None
-
-# Load cleaned dataset
-df = pd.read_csv(csv_file)
-
-# Determine starting index
-last_title = get_last_processed_index()
-if last_title:
-    last_index = df[df["Title"] == last_title].index.max() + 1
-else:
-    last_index = 0  # Start from the beginning
-
-# Process in batches of 50
-batch_size = 50
-triplet_data = []
-
-for index in range(last_index, len(df), batch_size):
-    batch = df.iloc[index : index + batch_size]
-
-    for _, row in batch.iterrows():
-        plot = row["Cleaned_Plot"]
-        triplets = extract_triplets(plot)
-
-        if triplets:
-            triplet_data.append({
-                "Title": row["Title"],
-                "Triplets": triplets
-            })
-
-    # Append results to JSON file after every 50 rows
-    if triplet_data:
-        if os.path.exists(output_file) and os.path.getsize(output_file) > 0:
-            with open(output_file, "r") as f:
-                try:
-                    existing_data = json.load(f)
-                except json.JSONDecodeError:
-                    existing_data = []
-        else:
-            existing_data = []
-
-        existing_data.extend(triplet_data)
-
-        with open(output_file, "w") as f:
-            json.dump(existing_data, f, indent=4)
-
-        print(f"Saved {len(triplet_data)} triplets. Last processed row: {batch.iloc[-1]['Title']}")
-
-        # Clear batch memory
-        triplet_data = []
-
-print(f"Triplet extraction completed. Results saved to {output_file}")
+def main():
+    # Load only the columns extraction needs from the cleaned dataset
+    df = load_movies(["Title", "Cleaned_Plot"], path=csv_file)
+
+    # Rows already in the checkpoint are skipped, so reruns resume where they stopped
+    checkpoint = TripletCheckpoint(output_file)
+    print(f"Resuming with {len(checkpoint)} rows already extracted")
+
+    # Process in batches of 50
+    batch_size = 50
+
+    for index in range(0, len(df), batch_size):
+        batch = df.iloc[index : index + batch_size]
+        saved = 0
+
+        for row_id, row in batch.iterrows():
+            if row_id in checkpoint:
+                continue
+
+            plot = row["Cleaned_Plot"]
+            triplets = extract_triplets(plot)
+
+            if triplets:
+                checkpoint.append({
+                    "row_id": int(row_id),
+                    "Title": row["Title"],
+                    "Triplets": triplets
+                })
+                saved += 1
+
+        # Flush results to disk after every 50 rows
+        if saved:
+            checkpoint.flush()
+            print(f"Saved {saved} triplets. Last processed row: {batch.iloc[-1]['Title']}")
+
+    checkpoint.close()
+    print(f"Triplet extraction completed. Results saved to {output_file}")
+
+if __name__ == "__main__":
+    main()
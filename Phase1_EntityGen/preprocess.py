@@ -1,17 +1,68 @@
-import pandas as pd
+"""
+Cleans wiki_movie_plots.csv into cleaned_wiki_movie_plots.csv (+ .parquet).
+
+The CSV is streamed in chunks and each chunk is cleaned on a process pool
+with vectorized pandas string operations, so memory stays bounded by the
+chunk size and all cores are used. Once the regex has replaced every
+non-word character with a space, splitting on whitespace yields the same
+tokens as NLTK's word_tokenize except for a few contractions ("cannot",
+"gonna"). The fast path therefore uses str.split; pass --tokenizer nltk for
+the original behaviour.
+
+Usage:
+    python Phase1_EntityGen/preprocess.py --workers 8 --chunksize 5000
+"""
+import argparse
+import collections
+import multiprocessing
+import os
 import re
-import nltk
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
+import sys
+import time
+from functools import partial
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.dataset import pq, write_parquet_chunk
+
+INPUT_CSV = "wiki_movie_plots.csv"
+OUTPUT_CSV = "cleaned_wiki_movie_plots.csv"
+
+NON_WORD = re.compile(r"\W+")
 
-# Download necessary NLTK data
-nltk.download("punkt")
-nltk.download("stopwords")
+_stop_words = None
 
-# Load stopwords once as a set (much faster lookup)
-stop_words = set(stopwords.words("english"))
 
-def clean_text(text):
+def ensure_nltk_data(resource, package):
+    """Downloads an NLTK package only when it is not installed yet."""
+    import nltk
+
+    try:
+        nltk.data.find(resource)
+    except LookupError:
+        nltk.download(package, quiet=True)
+
+
+def get_stop_words():
+    """English stopwords as a set (much faster lookup), loaded once per process."""
+    global _stop_words
+    if _stop_words is None:
+        ensure_nltk_data("corpora/stopwords", "stopwords")
+        from nltk.corpus import stopwords
+        _stop_words = frozenset(stopwords.words("english"))
+    return _stop_words
+
+
+def tokenize(text, tokenizer="fast"):
+    if tokenizer == "nltk":
+        ensure_nltk_data("tokenizers/punkt", "punkt")
+        from nltk.tokenize import word_tokenize
+        return word_tokenize(text)
+    return text.split()
+
+
+def clean_text(text, tokenizer="fast"):
     """
     Cleans text by:
     - Converting to lowercase
@@ -19,27 +70,90 @@ def clean_text(text):
     - Tokenizing into words
     - Removing stopwords
     """
-    text = str(text).lower().strip()  # Lowercase and trim spaces
-    text = re.sub(r'\W+', ' ', text)  # Remove special characters
-    tokens = word_tokenize(text)  # Tokenization
-    tokens = [word for word in tokens if word not in stop_words]  # Remove stopwords efficiently
-    return " ".join(tokens)
-
-# Load dataset
-df = pd.read_csv("wiki_movie_plots.csv")
-
-# Handle missing values
-df["Cast"].fillna("Unknown", inplace=True)
-
-# Apply text cleaning (using swifter for speed-up)
-try:
-    import swifter  # Install if not available
-    df["Cleaned_Plot"] = df["Plot"].swifter.apply(clean_text)
-except ImportError:
-    print("Swifter not installed. Using standard apply (slower). Install with: pip install swifter")
-    df["Cleaned_Plot"] = df["Plot"].apply(clean_text)
-
-# Save cleaned dataset
-df.to_csv("cleaned_wiki_movie_plots.csv", index=False)
-
-print("Preprocessing complete! Cleaned data saved as 'cleaned_wiki_movie_plots.csv'.")
\ No newline at end of file
+    stop_words = get_stop_words()
+    text = NON_WORD.sub(" ", str(text).lower().strip())  # Lowercase, trim and remove special characters
+    return " ".join(word for word in tokenize(text, tokenizer) if word not in stop_words)
+
+
+def clean_chunk(chunk, tokenizer="fast"):
+    """Cleans one DataFrame chunk; lowercasing and the regex run vectorized over the whole column."""
+    stop_words = get_stop_words()
+    chunk["Cast"] = chunk["Cast"].fillna("Unknown")
+    texts = chunk["Plot"].astype(str).str.lower().str.strip().str.replace(NON_WORD, " ", regex=True)
+    chunk["Cleaned_Plot"] = [
+        " ".join(word for word in tokenize(text, tokenizer) if word not in stop_words)
+        for text in texts
+    ]
+    return chunk
+
+
+def bounded_imap(pool, func, items, window):
+    """
+    Ordered pool.imap with at most `window` tasks submitted ahead of the consumer.
+
+    Pool.imap's feeder thread drains its input as fast as it can, so over a
+    read_csv chunk iterator the whole file would end up pickled in the task
+    queue. Here the next chunk is only read once the oldest result is taken.
+    """
+    pending = collections.deque()
+    for item in items:
+        pending.append(pool.apply_async(func, (item,)))
+        if len(pending) >= window:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+def preprocess(input_csv=INPUT_CSV, output_csv=OUTPUT_CSV, parquet_path=None, chunksize=5000,
+               workers=None, tokenizer="fast"):
+    """Streams `input_csv` through clean_chunk on `workers` processes into CSV and, if given, Parquet."""
+    parquet_writer = None
+    if parquet_path and pq is None:
+        print("pyarrow not installed. Writing CSV only. Install with: pip install pyarrow")
+        parquet_path = None
+
+    start = time.perf_counter()
+    rows = 0
+    reader = pd.read_csv(input_csv, chunksize=chunksize)
+    workers = workers or os.cpu_count()
+    with multiprocessing.Pool(processes=workers) as pool:
+        # Results come back in chunk order, so the output rows (and row ids) match the input;
+        # two chunks per worker keeps every process busy while bounding memory
+        cleaned = bounded_imap(pool, partial(clean_chunk, tokenizer=tokenizer), reader, window=2 * workers)
+        for i, chunk in enumerate(cleaned):
+            chunk.to_csv(output_csv, mode="w" if i == 0 else "a", header=i == 0, index=False)
+            if parquet_path:
+                # Same layout common.dataset reads: a row_id column, then the CSV columns
+                parquet_writer = write_parquet_chunk(parquet_writer, chunk, parquet_path)
+            rows += len(chunk)
+            elapsed = time.perf_counter() - start
+            print(f"Cleaned {rows} rows ({rows / max(elapsed, 1e-9):.0f} rows/sec)")
+    if parquet_writer is not None:
+        parquet_writer.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"Preprocessed {rows} rows in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):.0f} rows/sec)")
+    return rows, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Clean movie plots for triplet extraction")
+    parser.add_argument("--input", default=INPUT_CSV)
+    parser.add_argument("--output", default=OUTPUT_CSV)
+    parser.add_argument("--parquet", default=None, help="Parquet output (default: next to --output)")
+    parser.add_argument("--no-parquet", action="store_true", help="Only write the CSV")
+    parser.add_argument("--chunksize", type=int, default=5000, help="Rows read and cleaned per task")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Cleaning processes")
+    parser.add_argument("--tokenizer", choices=["fast", "nltk"], default="fast",
+                        help="fast: whitespace split after the regex; nltk: word_tokenize")
+    args = parser.parse_args()
+
+    parquet_path = None if args.no_parquet else args.parquet or os.path.splitext(args.output)[0] + ".parquet"
+    preprocess(args.input, args.output, parquet_path, args.chunksize, args.workers, args.tokenizer)
+
+    print(f"Preprocessing complete! Cleaned data saved as '{args.output}'"
+          + (f" and '{parquet_path}'." if parquet_path and os.path.exists(parquet_path) else "."))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Packing several plots into one extraction request, and splitting the answer back out.
+
+TRIPLET_PROMPT carries roughly 150 tokens of instructions and examples, and
+it is resent for every plot. For the many short plots in the dataset, that
+overhead is a large share of the input, and each plot costs a whole request.
+PACKED_TRIPLET_PROMPT sends the instructions once, followed by up to
+`max_items` plots under "## <row id>" headers, within a token budget. The
+model answers with the same headers.
+
+parse_packed_response() demultiplexes that answer into per-row triplet
+lists. It also reports which rows came back unusable:
+
+    missing     no section for the row
+    empty       a section with no parseable triplet
+    malformed   more unparseable lines than triplets
+    truncated   the last section when "## END" never arrived (the output
+                hit max_tokens)
+
+The caller re-sends only those rows, in smaller packs, and sends a row that
+still fails on its own with the single-plot prompt.
+"""
+import os
+import re
+import sys
+
+from prompts import PACKED_TRIPLET_PROMPT, TRIPLET_HINTS
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.triplets import parse_triplet
+
+HEADER = re.compile(r"^\s*#{2,3}\s*(?:row\s*)?(\d+|END)\b\s*:?\s*$", re.IGNORECASE)
+
+# Output tokens reserved per plot, and the model's completion ceiling
+OUTPUT_TOKENS_PER_ITEM = 384
+MAX_OUTPUT_TOKENS = 16_384
+# Rule-based candidates shown per plot
+MAX_HINTS = 20
+
+
+def estimate_text_tokens(text):
+    return len(text) // 4 + 1
+
+
+class RowPacker:
+    """Accumulates (row_id, title, text, ...) rows into packs of at most `max_items` plots and ~`max_tokens` plot tokens.
+
+    A plot larger than the budget gets a pack of its own.
+    """
+
+    def __init__(self, max_tokens=3000, max_items=16):
+        self.max_tokens = max_tokens
+        self.max_items = max_items
+        self.pack, self.tokens = [], 0
+
+    def add(self, row):
+        """Adds a row; returns the finished pack when the row did not fit in it, else None."""
+        estimate = estimate_text_tokens(row[2])
+        full = None
+        if self.pack and (len(self.pack) >= self.max_items or self.tokens + estimate > self.max_tokens):
+            full = self.flush()
+        self.pack.append(row)
+        self.tokens += estimate
+        return full
+
+    def flush(self):
+        """Returns the pack in progress (None when empty) and starts a new one."""
+        pack = self.pack or None
+        self.pack, self.tokens = [], 0
+        return pack
+
+
+def pack_rows(rows, max_tokens=3000, max_items=16):
+    """Yields packs of rows, in input order (see RowPacker)."""
+    packer = RowPacker(max_tokens, max_items)
+    for row in rows:
+        pack = packer.add(row)
+        if pack:
+            yield pack
+    pack = packer.flush()
+    if pack:
+        yield pack
+
+
+def format_hints(lines):
+    """The TRIPLET_HINTS block for a plot's rule-based candidates, or "" when there are none."""
+    if not lines:
+        return ""
+    return TRIPLET_HINTS.format(hints="\n".join(lines[:MAX_HINTS]))
+
+
+def build_packed_prompt(rows, hints=None):
+    """The packed prompt for (row_id, title, text, ...) rows, with each plot's candidates from `hints` ({row_id: lines})."""
+    hints = hints or {}
+    plots = "\n".join(f"## {row[0]}\n{row[2].strip()}\n{format_hints(hints.get(row[0]))}" for row in rows)
+    return PACKED_TRIPLET_PROMPT.format(plots=plots)
+
+
+def packed_max_tokens(rows):
+    return min(MAX_OUTPUT_TOKENS, OUTPUT_TOKENS_PER_ITEM * len(rows))
+
+
+def parse_packed_response(text, row_ids):
+    """
+    Splits a packed response into per-row triplet lines.
+
+    Args:
+        text (str): The model's answer.
+        row_ids (list): The row ids that were sent.
+
+    Returns:
+        tuple: ({row_id: [triplet lines]} for rows that parsed cleanly,
+        {row_id: reason} for rows to retry).
+    """
+    wanted = {str(row_id): row_id for row_id in row_ids}
+    sections = {}
+    order = []
+    current = None
+    finished = False
+    for line in text.splitlines():
+        header = HEADER.match(line)
+        if header:
+            key = header.group(1)
+            if key.upper() == "END":
+                finished = True
+                break
+            # Ids the model invented are dropped along with their lines
+            current = wanted.get(key)
+            if current is not None and current not in sections:
+                sections[current] = []
+                order.append(current)
+            continue
+        if current is not None and line.strip():
+            sections[current].append(line.strip())
+
+    results, failed = {}, {}
+    for row_id in row_ids:
+        if row_id not in sections:
+            failed[row_id] = "missing"
+            continue
+        if not finished and order and row_id == order[-1]:
+            failed[row_id] = "truncated"
+            continue
+        lines = sections[row_id]
+        valid = [line for line in lines if parse_triplet(line) is not None]
+        if not valid:
+            failed[row_id] = "empty"
+        elif len(lines) - len(valid) > len(valid):
+            failed[row_id] = "malformed"
+        else:
+            # Same shape as single-plot extraction: the model's lines, deduped
+            results[row_id] = list(dict.fromkeys(valid))
+    return results, failed
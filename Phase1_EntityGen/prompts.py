@@ -0,0 +1,46 @@
+# Prompt shared by the sequential and async triplet extraction scripts
+TRIPLET_PROMPT = """
+Extract structured relational triplets (Subject, Relation, Object) from the following text.
+Ensure that:
+- Each triplet follows the format: (Subject, Relation, Object).
+- No missing objects; infer a reasonable object if necessary.
+- Relations are semantically meaningful (avoid generic verbs like 'is', 'has', 'appears').
+- Redundant or duplicate triplets are removed.
+- Output is strictly a newline-separated list of triplets.
+
+Example output format:
+(Jack, trades, cow for beans)
+(Mother, forces, Jack to drop beans in front yard)
+(Jack, ascends, beanstalk)
+
+Text: {text}
+"""
+
+# Several plots per request (see promptPacking.py); each plot's text follows a "## <row id>" header
+PACKED_TRIPLET_PROMPT = """
+Extract structured relational triplets (Subject, Relation, Object) from each of the movie plots below.
+Ensure that:
+- Each triplet follows the format: (Subject, Relation, Object).
+- No missing objects; infer a reasonable object if necessary.
+- Relations are semantically meaningful (avoid generic verbs like 'is', 'has', 'appears').
+- Redundant or duplicate triplets are removed.
+- Every plot is handled on its own; never mix entities from different plots.
+- Output is strictly, for every plot, a "## <id>" header line with the plot's id followed by its
+  newline-separated triplets, and a final "## END" line after the last plot.
+
+Example output format:
+## 17
+(Jack, trades, cow for beans)
+(Mother, forces, Jack to drop beans in front yard)
+## 18
+(Jack, ascends, beanstalk)
+## END
+
+{plots}
+"""
+
+# Appended after a plot when the rule-based pre-pass (ruleExtraction.py) left candidates for it
+TRIPLET_HINTS = """
+Candidate triplets from a dependency parser, possibly incomplete or wrong. Correct, complete or drop them:
+{hints}
+"""
@@ -0,0 +1,306 @@
+"""
+Local subject-verb-object triplet extraction over spaCy dependency parses.
+
+Most plot sentences state their facts plainly ("Jack trades the cow for
+beans"), and the dependency parse already holds them. This pass reads those
+triplets locally. It is far cheaper than an API call and runs on all cores
+through nlp.pipe(n_process=...). The patterns:
+
+    subject  -> verb -> object          nsubj + dobj/attr/oprd/dative
+    subject  -> verb prep -> object     nsubj + prep + pobj ("escapes from prison")
+    agent    -> verb -> subject         passives ("Jack is killed by the giant")
+    verb particles are kept             "picks up", "turns down"
+    conjuncts fan out                   "Jack and Jill climb the hill"
+    "who"/"which" in relative clauses   replaced by the noun they modify
+    he/she/they                         resolved to the last named character,
+                                        at a lower score
+
+Every triplet is scored in [0, 1]: a pronoun that had to be resolved, a
+prepositional object or a long phrase lowers it. A plot's confidence is its
+mean triplet score times the share of its sentences that yielded a
+triplet.
+
+The CLI writes plots with confidence >= --threshold and at least
+--min-triplets triplets straight into the extraction checkpoint. The
+extractors skip rows already in the checkpoint, so only the rest go to the
+LLM. The rest are written to --hints with their candidate triplets, which
+asyncExtraction.py --hints adds to their prompts.
+
+The parser needs case and punctuation, so this reads the raw Plot column by
+default; Cleaned_Plot parses as one long lowercase sentence.
+
+Usage:
+    python Phase1_EntityGen/ruleExtraction.py --n-process 8
+    python Phase1_EntityGen/ruleExtraction.py --threshold 0.7 --min-triplets 5 --hints rule_hints.jsonl
+    python Phase1_EntityGen/asyncExtraction.py --hints rule_hints.jsonl
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.checkpoint import TripletCheckpoint
+from common.dataset import load_movies
+
+# File paths
+csv_file = "cleaned_wiki_movie_plots.csv"
+output_file = "extracted_triplets.jsonl"
+hints_file = "rule_hints.jsonl"
+
+SPACY_MODEL = "en_core_web_sm"
+
+SUBJECT_DEPS = {"nsubj", "nsubjpass"}
+OBJECT_DEPS = {"dobj", "attr", "oprd", "dative"}
+MODIFIER_DEPS = {"compound", "amod", "nummod", "poss"}
+# The prompt asks the LLM to avoid these too
+GENERIC_VERBS = {"be", "have", "appear", "seem", "do", "become"}
+PERSONAL_PRONOUNS = {"he", "she", "they", "him", "her", "them"}
+
+MAX_PHRASE_TOKENS = 6
+RESOLVED_PRONOUN_SCORE = 0.7
+PREP_OBJECT_SCORE = 0.85
+LONG_PHRASE_SCORE = 0.8
+
+_nlp = None
+
+
+def load_nlp(model=SPACY_MODEL):
+    """Loads the spaCy pipeline, downloading the model the first time."""
+    import spacy
+    try:
+        return spacy.load(model)
+    except OSError:
+        print(f"Downloading '{model}' model...")
+        import spacy.cli
+        spacy.cli.download(model)
+        return spacy.load(model)
+
+
+def get_nlp():
+    """The shared pipeline, loaded on first use."""
+    global _nlp
+    if _nlp is None:
+        _nlp = load_nlp()
+    return _nlp
+
+
+def third_person(lemma):
+    """'trade' -> 'trades', 'marry' -> 'marries', the form the LLM prompt's examples use."""
+    if lemma == "be":
+        return "is"
+    if lemma == "have":
+        return "has"
+    if lemma.endswith(("s", "sh", "ch", "x", "z", "o")):
+        return lemma + "es"
+    if lemma.endswith("y") and len(lemma) > 1 and lemma[-2] not in "aeiou":
+        return lemma[:-1] + "ies"
+    return lemma + "s"
+
+
+def _phrase(token):
+    """The noun phrase headed by `token`: its named entity, or the token with its compound/adjective modifiers."""
+    if token.ent_iob_ != "O":
+        for ent in token.doc.ents:
+            if ent.start <= token.i < ent.end:
+                return ent.text
+    words = [child for child in token.lefts if child.dep_ in MODIFIER_DEPS and child.pos_ != "PRON"]
+    words.append(token)
+    words.extend(child for child in token.rights if child.dep_ == "compound")
+    return " ".join(word.text for word in sorted(words, key=lambda word: word.i))
+
+
+def _fan_out(token):
+    """The token and the tokens coordinated with it ("Jack and Jill")."""
+    return [token, *token.conjuncts]
+
+
+def _is_named(token):
+    return token.pos_ == "PROPN" or token.ent_type_ in ("PERSON", "ORG", "NORP")
+
+
+def _relation(verb, prep=None):
+    parts = []
+    if any(child.dep_ == "neg" for child in verb.children):
+        parts.append("does not")
+        parts.append(verb.lemma_.lower())
+    else:
+        parts.append(third_person(verb.lemma_.lower()))
+    parts.extend(child.text.lower() for child in verb.children if child.dep_ == "prt")
+    if prep is not None:
+        parts.append(prep.text.lower())
+    return " ".join(parts)
+
+
+def _subjects(verb):
+    """Subject tokens of `verb`, inherited from the first verb of a coordination ("sells the cow and buys beans")."""
+    subjects = [child for child in verb.children if child.dep_ in SUBJECT_DEPS]
+    head = verb
+    while not subjects and head.dep_ in ("conj", "xcomp") and head.head is not head:
+        head = head.head
+        subjects = [child for child in head.children if child.dep_ in SUBJECT_DEPS]
+    resolved = []
+    for subject in subjects:
+        # "the man who kills her": "who" stands for "man"
+        if subject.tag_ in ("WP", "WDT") and verb.dep_ == "relcl":
+            subject = verb.head
+        resolved.extend(_fan_out(subject))
+    return resolved
+
+
+def _objects(verb):
+    """(object token, preposition or None) pairs of `verb`."""
+    objects = []
+    for child in verb.children:
+        if child.dep_ in OBJECT_DEPS:
+            objects.extend((obj, None) for obj in _fan_out(child))
+        elif child.dep_ == "prep":
+            for obj in child.children:
+                if obj.dep_ == "pobj":
+                    objects.extend((o, child) for o in _fan_out(obj))
+    return objects
+
+
+def svo_triplets(doc):
+    """
+    Reads scored triplets off a parsed document.
+
+    Args:
+        doc (spacy.tokens.Doc): A parsed plot.
+
+    Returns:
+        list: (subject, relation, object, score, sentence start) tuples in text order, without duplicates.
+    """
+    triplets = {}
+    last_named = None
+    for verb in doc:
+        if verb.pos_ != "VERB" or verb.lemma_.lower() in GENERIC_VERBS:
+            for subject in (child for child in verb.children if child.dep_ in SUBJECT_DEPS):
+                if _is_named(subject):
+                    last_named = subject
+            continue
+
+        passive = any(child.dep_ == "nsubjpass" for child in verb.children)
+        agents = [pobj for child in verb.children if child.dep_ == "agent"
+                  for pobj in child.children if pobj.dep_ == "pobj"]
+        pairs = []
+        for subject in _subjects(verb):
+            if passive:
+                # "Jack is killed by the giant" -> (giant, kills, Jack)
+                pairs.extend((agent, subject, None) for agent in agents)
+            else:
+                pairs.extend((subject, obj, prep) for obj, prep in _objects(verb))
+
+        for subject, obj, prep in pairs:
+            score = 1.0
+            parts = []
+            for role, token in enumerate((subject, obj)):
+                if token.text.lower() in PERSONAL_PRONOUNS:
+                    # Only subjects are resolved; "kills him" rarely means the last named character
+                    if last_named is None or role == 1:
+                        break
+                    token = last_named
+                    score *= RESOLVED_PRONOUN_SCORE
+                elif token.pos_ == "PRON":
+                    break
+                phrase = _phrase(token)
+                if len(phrase.split()) > MAX_PHRASE_TOKENS:
+                    score *= LONG_PHRASE_SCORE
+                parts.append(phrase)
+            else:
+                if prep is not None:
+                    score *= PREP_OBJECT_SCORE
+                key = (parts[0].lower(), _relation(verb, prep), parts[1].lower())
+                if key not in triplets:
+                    triplets[key] = (parts[0], key[1], parts[1], round(score, 3), verb.sent.start)
+
+        for subject in (child for child in verb.children if child.dep_ in SUBJECT_DEPS):
+            if _is_named(subject):
+                last_named = subject
+    return list(triplets.values())
+
+
+def plot_confidence(doc, triplets):
+    """Mean triplet score times the share of sentences that yielded at least one triplet."""
+    if not triplets:
+        return 0.0
+    sentences = sum(1 for _ in doc.sents)
+    covered = len({sentence for *_, sentence in triplets})
+    mean = sum(triplet[3] for triplet in triplets) / len(triplets)
+    return round(mean * covered / max(sentences, 1), 3)
+
+
+def format_triplet(triplet):
+    """The line format the LLM writes, so the checkpoint reads the same downstream."""
+    subject, relation, object_ = triplet[:3]
+    return f"({subject}, {relation}, {object_})"
+
+
+def extract_rule_triplets(texts, nlp=None, batch_size=64, n_process=1):
+    """
+    Parses `texts` in batches and yields (triplet lines, confidence) for each, in order.
+
+    Args:
+        texts (iterable): Plot texts.
+        nlp: A spaCy pipeline (default: the shared en_core_web_sm one).
+        batch_size (int): Texts per nlp.pipe batch.
+        n_process (int): Parser processes; -1 uses every core.
+    """
+    nlp = nlp or get_nlp()
+    for doc in nlp.pipe((str(text) for text in texts), batch_size=batch_size, n_process=n_process):
+        triplets = svo_triplets(doc)
+        yield [format_triplet(triplet) for triplet in triplets], plot_confidence(doc, triplets)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rule-based triplet pre-pass over spaCy dependency parses")
+    parser.add_argument("--csv", default=csv_file)
+    parser.add_argument("--output", default=output_file, help="Extraction checkpoint confident plots are written to")
+    parser.add_argument("--hints", default=hints_file, help="Where the remaining plots' candidates are written")
+    parser.add_argument("--column", choices=["Plot", "Cleaned_Plot"], default="Plot")
+    parser.add_argument("--threshold", type=float, default=0.6, help="Plot confidence needed to skip the LLM")
+    parser.add_argument("--min-triplets", type=int, default=3, help="Triplets needed to skip the LLM")
+    parser.add_argument("--n-process", type=int, default=1, help="Parser processes (-1 for all cores)")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--limit", type=int, default=None, help="Only process this many rows")
+    args = parser.parse_args()
+
+    df = load_movies(["Title", args.column], path=args.csv)
+
+    # Rows already extracted or already hinted are skipped, so reruns resume
+    checkpoint = TripletCheckpoint(args.output)
+    hints = TripletCheckpoint(args.hints)
+    batch = df[~df.index.map(lambda row_id: row_id in checkpoint or row_id in hints)]
+    if args.limit is not None:
+        batch = batch.iloc[:args.limit]
+
+    start = time.perf_counter()
+    accepted = 0
+    try:
+        results = extract_rule_triplets(batch[args.column].tolist(), batch_size=args.batch_size,
+                                        n_process=args.n_process)
+        for done, (row_id, title, (lines, confidence)) in enumerate(
+                zip(batch.index.tolist(), batch["Title"].tolist(), results), 1):
+            record = {"row_id": int(row_id), "Title": title, "Triplets": lines,
+                      "Source": "rules", "Confidence": confidence}
+            if confidence >= args.threshold and len(lines) >= args.min_triplets:
+                checkpoint.append(record)
+                accepted += 1
+            else:
+                hints.append(record)
+            if done % 1000 == 0:
+                checkpoint.flush()
+                hints.flush()
+                print(f"Parsed {done} rows, {accepted} accepted")
+    finally:
+        checkpoint.close()
+        hints.close()
+    elapsed = time.perf_counter() - start
+
+    print(f"Parsed {len(batch)} rows in {elapsed:.1f}s ({len(batch) / max(elapsed, 1e-9):.1f} rows/sec)")
+    print(f"{accepted} plots written to {args.output}; {len(batch) - accepted} left for the LLM "
+          f"with candidates in {args.hints}")
+
+
+if __name__ == "__main__":
+    main()
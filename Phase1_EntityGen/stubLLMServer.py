@@ -0,0 +1,254 @@
+"""
+Deterministic OpenAI-compatible server for benchmarks.
+
+Serves the two endpoints the pipeline calls, after a configurable delay:
+
+    /v1/chat/completions   canned Cypher for query-conversion prompts, a canned
+                           answer for synthesis prompts, and a fixed set of
+                           triplets for everything else (extraction), once per
+                           plot for packed prompts. Supports stream=true.
+    /v1/embeddings         unit vectors derived from a hash of each input, so
+                           the same text always gets the same embedding
+
+Load shaping:
+    --error-rate    fraction of requests answered with 429, to exercise client retries
+    --rpm           requests-per-minute limit. Requests over it get a 429 with
+                    Retry-After set to when the window frees up.
+
+Jitter and injected errors come from a seeded RNG, so runs with the same
+settings and request order see the same delays.
+
+Usage:
+    python Phase1_EntityGen/stubLLMServer.py --port 8000 --latency 0.5
+    python Phase1_EntityGen/stubLLMServer.py --port 8000 --latency 0.2 --rpm 600 --seed 7
+"""
+import argparse
+import base64
+import collections
+import hashlib
+import json
+import math
+import random
+import re
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CANNED_TRIPLETS = "\n".join([
+    "(Jack, trades, cow for beans)",
+    "(Mother, forces, Jack to drop beans in front yard)",
+    "(Jack, ascends, beanstalk)",
+])
+
+CANNED_CYPHER = """```cypher
+MATCH (m:Movie)-[:BELONGS_TO_GENRE]->(g:Genre {name: 'drama'})
+OPTIONAL MATCH (m)-[:HAS_DIRECTOR]->(d:Director)
+RETURN m.title AS title, m.year AS year, d.name AS director
+LIMIT 10
+```"""
+
+CANNED_ANSWER = ("Here are some movies that match your question. Each of them was retrieved from the "
+                 "movie knowledge graph and is listed with its release year and director.")
+
+EMBEDDING_DIM = 1536
+
+
+def canned_reply(messages):
+    """Picks the canned completion for a prompt by what the pipeline is asking for."""
+    prompt = " ".join(str(m.get("content", "")) for m in messages)
+    if "## END" in prompt:
+        # Packed extraction: one section per "## <id>" plot after the example block
+        plots = prompt.rsplit("## END", 1)[1]
+        ids = re.findall(r"^## (\d+)$", plots, re.MULTILINE)
+        return "\n".join(f"## {row_id}\n{CANNED_TRIPLETS}" for row_id in ids) + "\n## END"
+    if "Cypher query" in prompt:
+        return CANNED_CYPHER
+    if "movie knowledge assistant" in prompt:
+        return CANNED_ANSWER
+    return CANNED_TRIPLETS
+
+
+def fake_embedding(text, dim=EMBEDDING_DIM):
+    """Unit-length vector seeded by the text's hash."""
+    rng = random.Random(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest())
+    vector = [rng.random() - 0.5 for _ in range(dim)]
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return [x / norm for x in vector]
+
+
+class RequestWindow:
+    """Sliding one-minute window of request times for the --rpm limit."""
+
+    def __init__(self, rpm):
+        self.rpm = rpm
+        self.times = collections.deque()
+        self._lock = threading.Lock()
+
+    def admit(self):
+        """Returns 0 when the request is within the limit, else seconds until a slot frees."""
+        now = time.monotonic()
+        with self._lock:
+            while self.times and now - self.times[0] >= 60:
+                self.times.popleft()
+            if len(self.times) >= self.rpm:
+                return 60 - (now - self.times[0])
+            self.times.append(now)
+            return 0
+
+
+def make_handler(latency, jitter, error_rate, rpm=None, seed=0, embedding_dim=EMBEDDING_DIM):
+    rng = random.Random(seed)
+    rng_lock = threading.Lock()
+    window = RequestWindow(rpm) if rpm else None
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, payload, headers=None):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _stream(self, model, content):
+            """Sends the completion as server-sent events, one word per chunk."""
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            words = content.split(" ")
+            for i, word in enumerate(words):
+                chunk = {
+                    "id": "chatcmpl-stub",
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word},
+                                 "finish_reason": None}],
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            done = {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": int(time.time()),
+                    "model": model, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+            self.wfile.write(f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n".encode())
+            self.wfile.flush()
+
+        def _embeddings(self, request):
+            inputs = request.get("input", [])
+            inputs = [inputs] if isinstance(inputs, str) else inputs
+            data = []
+            for i, text in enumerate(inputs):
+                vector = fake_embedding(str(text), embedding_dim)
+                if request.get("encoding_format") == "base64":
+                    vector = base64.b64encode(struct.pack(f"<{len(vector)}f", *vector)).decode()
+                data.append({"object": "embedding", "index": i, "embedding": vector})
+            tokens = sum(len(str(text)) // 4 + 1 for text in inputs)
+            self._send(200, {"object": "list", "data": data, "model": request.get("model", "stub"),
+                             "usage": {"prompt_tokens": tokens, "total_tokens": tokens}})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+
+            if not self.path.endswith(("/chat/completions", "/embeddings")):
+                self._send(404, {"error": {"message": f"Unknown path {self.path}"}})
+                return
+
+            if window is not None:
+                wait = window.admit()
+                if wait:
+                    self._send(429, {"error": {"message": "Rate limit reached", "type": "requests"}},
+                               headers={"retry-after": f"{wait:.2f}"})
+                    return
+
+            with rng_lock:
+                delay = max(0.0, latency + rng.uniform(-jitter, jitter))
+                rejected = rng.random() < error_rate
+            time.sleep(delay)
+
+            if rejected:
+                self._send(429, {"error": {"message": "Rate limit reached", "type": "requests"}},
+                           headers={"retry-after": "0.1"})
+                return
+
+            if self.path.endswith("/embeddings"):
+                self._embeddings(request)
+                return
+
+            content = canned_reply(request.get("messages", []))
+            model = request.get("model", "stub")
+            if request.get("stream"):
+                self._stream(model, content)
+                return
+
+            prompt_tokens = sum(len(str(m.get("content", ""))) // 4 for m in request.get("messages", []))
+            completion_tokens = len(content) // 4
+            self._send(200, {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+            })
+
+    return StubHandler
+
+
+def make_server(host="127.0.0.1", port=8000, latency=0.5, jitter=0.1, error_rate=0.0, rpm=None, seed=0,
+                embedding_dim=EMBEDDING_DIM):
+    """Creates (but does not start) the stub server; port 0 picks a free port."""
+    server = ThreadingHTTPServer((host, port), make_handler(latency, jitter, error_rate, rpm, seed, embedding_dim))
+    server.daemon_threads = True
+    return server
+
+
+def start_in_thread(**kwargs):
+    """Starts a stub server on a background thread and returns it with its base URL."""
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub OpenAI chat completions and embeddings server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds per response")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Uniform +/- jitter in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--rpm", type=int, default=None, help="Requests per minute before answering 429")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for jitter and injected errors")
+    parser.add_argument("--embedding-dim", type=int, default=EMBEDDING_DIM)
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.latency, args.jitter, args.error_rate, args.rpm, args.seed,
+                         args.embedding_dim)
+    print(f"Stub LLM server listening on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
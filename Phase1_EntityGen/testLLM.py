@@ -4,16 +4,17 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-openai_api_key = os.getenv("OPENAI_API_KEY")
+if __name__ == "__main__":
+    openai_api_key = os.getenv("OPENAI_API_KEY")
 
-openai.api_key = openai_api_key
+    openai.api_key = openai_api_key
 
-completion = openai.chat.completions.create(
-  model="gpt-4o-mini",
-  messages=[
-    {"role": "system", "content": "You are a poetic assistant, skilled in explaining complex programming concepts with creative flair."},
-    {"role": "user", "content": "Compose a poem that explains the concept of recursion in programming."}
-  ]
-)
+    completion = openai.chat.completions.create(
+      model="gpt-4o-mini",
+      messages=[
+        {"role": "system", "content": "You are a poetic assistant, skilled in explaining complex programming concepts with creative flair."},
+        {"role": "user", "content": "Compose a poem that explains the concept of recursion in programming."}
+      ]
+    )
 
-print(completion.choices[0].message)
\ No newline at end of file
+    print(completion.choices[0].message)
@@ -1,21 +1,17 @@
-from neo4j import GraphDatabase
 import os
-from dotenv import load_dotenv
+import sys
 
-load_dotenv()
-
-# Change these based on your setup
-NEO4J_URI = os.getenv("NEO4J_URI")
-NEO4J_USER = os.getenv("NEO4J_USER")
-NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")
-
-driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.neo4j_pool import pool_metrics, read_session
 
 def test_connection(tx):
     result = tx.run("MATCH (n) RETURN count(n) AS node_count")
     for record in result:
         print("Total Nodes:", record["node_count"])
 
-# Test the connection
-with driver.session() as session:
-    session.execute_read(test_connection)
\ No newline at end of file
+if __name__ == "__main__":
+    # Test the connection (credentials come from NEO4J_URI / NEO4J_USER / NEO4J_PASSWORD in .env)
+    with read_session() as session:
+        session.execute_read(test_connection)
+
+    print("Pool:", pool_metrics())
@@ -0,0 +1,240 @@
+"""
+Offline export of the movie graph as neo4j-admin bulk import CSVs.
+
+For a first build of the full corpus, `neo4j-admin database import` is far
+faster than transactional MERGE: it writes the store files directly. This
+script streams the triplet checkpoint together with the CSV metadata lookup
+from newGraphGen.py into deduplicated node and relationship files.
+
+Entity ids are a 64-bit hash of the entity name, so they are assigned in the
+same single pass with no lookup table. Entity, CONTAINS and ACTS rows are
+deduplicated by spilling them into hash buckets on disk and deduplicating one
+bucket at a time. Memory stays bounded by the largest bucket rather than the
+size of the corpus.
+
+Records are prepared exactly as newGraphGen prepares them for bulkLoad, and
+the export writes the same bookkeeping bulkLoad does: Movie.content_hash and
+the titles asserting each ACTS edge in `sources`. The first graphSync run
+after an import then only touches what actually changed. Records sharing a
+(title, year) are one movie, as in prepare_movies; their triplet digests are
+summed as they stream past, and movies.csv is written at the end.
+
+Usage:
+    python Phase2_GraphGen/new/adminExport.py --output-dir import
+"""
+import argparse
+import csv
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+import zlib
+
+from graphSync import content_hash, triplet_digest
+from newGraphGen import CSV_FILE, JSON_FILE, load_metadata, prepare_records
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from common.checkpoint import iter_records
+
+# File name -> (neo4j-admin label or relationship type, header)
+NODE_FILES = {
+    "movies.csv": ("Movie", [":ID(Movie)", "title", "year:int", "content_hash"]),
+    "directors.csv": ("Director", ["name:ID(Director)"]),
+    "genres.csv": ("Genre", ["name:ID(Genre)"]),
+    "summaries.csv": ("Summary", ["title:ID(Summary)"]),
+    "entities.csv": ("Entity", [":ID(Entity)", "name"]),
+}
+RELATIONSHIP_FILES = {
+    "has_director.csv": ("HAS_DIRECTOR", [":START_ID(Movie)", ":END_ID(Director)"]),
+    "belongs_to_genre.csv": ("BELONGS_TO_GENRE", [":START_ID(Movie)", ":END_ID(Genre)"]),
+    "has_summary.csv": ("HAS_SUMMARY", [":START_ID(Movie)", ":END_ID(Summary)"]),
+    "contains.csv": ("CONTAINS", [":START_ID(Summary)", ":END_ID(Entity)"]),
+    "acts.csv": ("ACTS", [":START_ID(Entity)", ":END_ID(Entity)", "relation", "sources:string[]"]),
+}
+# Between the titles in ACTS.sources; titles can contain neo4j-admin's default ";"
+ARRAY_DELIMITER = "\x1f"
+
+
+def entity_id(name):
+    """Stable 64-bit id for an entity name; identical names always map to the same id."""
+    return hashlib.blake2b(name.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def clean(value):
+    """Keeps every CSV record on one physical line so buckets can be deduplicated line by line."""
+    return str(value).replace("\r", " ").replace("\n", " ")
+
+
+class SpilledDedupWriter:
+    """Writes CSV rows through on-disk hash buckets and deduplicates them bucket by bucket."""
+
+    def __init__(self, path, header, spill_dir, buckets=32):
+        self.path = path
+        self.header = header
+        self.bucket_paths = [os.path.join(spill_dir, f"{os.path.basename(path)}.{i}") for i in range(buckets)]
+        self.files = [open(p, "w", newline="", encoding="utf-8") for p in self.bucket_paths]
+        self.writers = [csv.writer(f, lineterminator="\n") for f in self.files]
+
+    def write(self, row):
+        row = [clean(value) for value in row]
+        bucket = zlib.crc32("\x1f".join(row).encode("utf-8")) % len(self.writers)
+        self.writers[bucket].writerow(row)
+
+    def finalize(self):
+        """Concatenates the buckets into the final file, dropping duplicate rows; returns the row count."""
+        for f in self.files:
+            f.close()
+        rows = 0
+        with open(self.path, "w", newline="", encoding="utf-8") as out:
+            csv.writer(out, lineterminator="\n").writerow(self.header)
+            for bucket_path in self.bucket_paths:
+                seen = set()
+                with open(bucket_path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        if line not in seen:
+                            seen.add(line)
+                            out.write(line)
+                rows += len(seen)
+                os.remove(bucket_path)
+        return rows
+
+
+class SpilledGroupWriter(SpilledDedupWriter):
+    """Spills (key columns..., value) rows and writes one row per key with its distinct values as an array."""
+
+    def write(self, row):
+        row = [clean(value) for value in row]
+        bucket = zlib.crc32("\x1f".join(row[:-1]).encode("utf-8")) % len(self.writers)
+        self.writers[bucket].writerow(row)
+
+    def finalize(self):
+        """Concatenates the buckets, grouping each key's values; returns the row count."""
+        for f in self.files:
+            f.close()
+        rows = 0
+        with open(self.path, "w", newline="", encoding="utf-8") as out:
+            writer = csv.writer(out, lineterminator="\n")
+            writer.writerow(self.header)
+            for bucket_path in self.bucket_paths:
+                groups = {}
+                with open(bucket_path, "r", newline="", encoding="utf-8") as f:
+                    for row in csv.reader(f):
+                        groups.setdefault(tuple(row[:-1]), {})[row[-1]] = None
+                for key, values in groups.items():
+                    writer.writerow([*key, ARRAY_DELIMITER.join(values)])
+                rows += len(groups)
+                os.remove(bucket_path)
+        return rows
+
+
+def export(movie_data, csv_metadata, output_dir, buckets=32):
+    """Streams movie records into neo4j-admin CSVs in `output_dir`; returns row counts per file."""
+    os.makedirs(output_dir, exist_ok=True)
+    spill_dir = tempfile.mkdtemp(prefix="spill-", dir=output_dir)
+
+    handles = {}
+    writers = {}
+    for name, (_, header) in {**NODE_FILES, **RELATIONSHIP_FILES}.items():
+        if name in ("entities.csv", "contains.csv", "acts.csv"):
+            continue
+        handles[name] = open(os.path.join(output_dir, name), "w", newline="", encoding="utf-8")
+        writers[name] = csv.writer(handles[name], lineterminator="\n")
+        writers[name].writerow(header)
+    spilled = {
+        name: SpilledDedupWriter(os.path.join(output_dir, name), header, spill_dir, buckets)
+        for name, (_, header) in {**NODE_FILES, **RELATIONSHIP_FILES}.items()
+        if name in ("entities.csv", "contains.csv")
+    }
+    spilled["acts.csv"] = SpilledGroupWriter(os.path.join(output_dir, "acts.csv"), RELATIONSHIP_FILES["acts.csv"][1],
+                                             spill_dir, buckets)
+
+    # Metadata-sized sets: bounded by the number of movies, not triplets
+    directors, genres, summaries = set(), set(), set()
+    counts = {name: 0 for name in writers}
+
+    def emit(name, row):
+        writers[name].writerow([clean(value) for value in row])
+        counts[name] += 1
+
+    # (title, year) -> [movie id, metadata, triplet digest so far]; one small entry per movie
+    movies = {}
+    for movie in prepare_records(movie_data, csv_metadata):
+        title, year, director, genre = movie["title"], movie["year"], movie["director"], movie["genre"]
+        triplets = movie["triplets"]
+        key = (title, year)
+        if key in movies:
+            movies[key][2] += triplet_digest(triplets)
+        else:
+            metadata = {"title": title, "year": year, "director": director, "genre": genre}
+            movies[key] = [len(movies), metadata, triplet_digest(triplets)]
+            movie_id = movies[key][0]
+            emit("has_director.csv", [movie_id, director])
+            emit("belongs_to_genre.csv", [movie_id, genre])
+            emit("has_summary.csv", [movie_id, title])
+        if director not in directors:
+            directors.add(director)
+            emit("directors.csv", [director])
+        if genre not in genres:
+            genres.add(genre)
+            emit("genres.csv", [genre])
+        if title not in summaries:
+            summaries.add(title)
+            emit("summaries.csv", [title])
+
+        for triplet in triplets:
+            subject_id, object_id = entity_id(triplet["subject"]), entity_id(triplet["object"])
+            spilled["entities.csv"].write([subject_id, triplet["subject"]])
+            spilled["entities.csv"].write([object_id, triplet["object"]])
+            spilled["contains.csv"].write([title, subject_id])
+            spilled["contains.csv"].write([title, object_id])
+            spilled["acts.csv"].write([subject_id, object_id, triplet["relation"], title])
+
+    for movie_id, movie, digest in movies.values():
+        emit("movies.csv", [movie_id, movie["title"], movie["year"], content_hash(movie, digest % (1 << 256))])
+
+    for handle in handles.values():
+        handle.close()
+    for name, writer in spilled.items():
+        counts[name] = writer.finalize()
+    shutil.rmtree(spill_dir, ignore_errors=True)
+    return counts
+
+
+def import_command(output_dir, database="neo4j"):
+    """The neo4j-admin invocation matching the files written by export()."""
+    parts = [f"neo4j-admin database import full {database} --overwrite-destination",
+             f"--array-delimiter=U+{ord(ARRAY_DELIMITER):04X}"]
+    for name, (label, _) in NODE_FILES.items():
+        parts.append(f"--nodes={label}={os.path.join(output_dir, name)}")
+    for name, (rel_type, _) in RELATIONSHIP_FILES.items():
+        parts.append(f"--relationships={rel_type}={os.path.join(output_dir, name)}")
+    return " \\\n    ".join(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the movie graph as neo4j-admin import CSVs")
+    parser.add_argument("--triplets", default=JSON_FILE)
+    parser.add_argument("--csv", default=CSV_FILE)
+    parser.add_argument("--output-dir", default="import")
+    parser.add_argument("--buckets", type=int, default=32,
+                        help="Spill buckets for entity/CONTAINS/ACTS dedup; raise for larger corpora")
+    args = parser.parse_args()
+
+    csv_metadata = load_metadata(args.csv)
+
+    start = time.perf_counter()
+    counts = export(iter_records(args.triplets), csv_metadata, args.output_dir, args.buckets)
+    elapsed = time.perf_counter() - start
+
+    for name, count in counts.items():
+        print(f"{name:>22}: {count} rows")
+    print(f"Exported in {elapsed:.1f}s\n")
+    print("Stop the database, then import with:\n")
+    print(import_command(args.output_dir))
+    print("\nAfter starting it again, create constraints and indexes with: python -m common.graph_schema")
+
+
+if __name__ == "__main__":
+    main()
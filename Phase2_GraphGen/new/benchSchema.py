@@ -0,0 +1,121 @@
+"""
+Load and query timings with and without the graph schema (constraints + indexes).
+
+For each configuration the database is wiped, the first --limit movies are
+bulk loaded, and a set of query shapes typical of QueryConversion output is
+timed. THIS DELETES EVERYTHING IN THE TARGET DATABASE, so it refuses to run
+without --wipe.
+
+Usage:
+    python Phase2_GraphGen/new/benchSchema.py --wipe --limit 2000
+"""
+from itertools import islice
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+from bulkLoad import bulk_load
+from newGraphGen import CSV_FILE, JSON_FILE, load_metadata, prepare_movies
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from common.checkpoint import iter_records
+from common.graph_schema import drop_schema, ensure_schema
+from common.neo4j_pool import read_session, write_session
+
+# Shapes QueryConversion typically generates, parameterized with values from the loaded data
+BENCHMARK_QUERIES = {
+    "movies_by_director": "MATCH (m:Movie)-[:HAS_DIRECTOR]->(d:Director {name: $director}) "
+                          "RETURN m.title, m.year",
+    "director_in_year": "MATCH (m:Movie {year: $year})-[:HAS_DIRECTOR]->(d:Director {name: $director}) "
+                        "RETURN m.title",
+    "busy_directors": "MATCH (m:Movie {year: $year})-[:HAS_DIRECTOR]->(d:Director) "
+                      "WITH d, count(m) AS movies WHERE movies > 1 RETURN d.name, movies",
+    "top_in_genre": "MATCH (m:Movie)-[:BELONGS_TO_GENRE]->(g:Genre {name: $genre}) "
+                    "RETURN m.title, m.year LIMIT 5",
+    "summarize_movie": "MATCH (m:Movie {title: $title})-[:HAS_SUMMARY]->(s:Summary)-[:CONTAINS]->(e1:Entity) "
+                       "OPTIONAL MATCH (e1)-[r:ACTS]->(e2:Entity) RETURN e1.name, r.relation, e2.name",
+    "thematic_entity": "MATCH (e:Entity) WHERE e.name CONTAINS $term "
+                       "MATCH (s:Summary)-[:CONTAINS]->(e) RETURN DISTINCT s.title LIMIT 20",
+}
+
+
+def wipe():
+    with write_session() as session:
+        session.run(
+            "MATCH (n) CALL { WITH n DETACH DELETE n } IN TRANSACTIONS OF 10000 ROWS"
+        ).consume()
+
+
+def time_queries(params, repeats):
+    """Median and p95 latency in milliseconds for each benchmark query."""
+    timings = {}
+    with read_session() as session:
+        for name, query in BENCHMARK_QUERIES.items():
+            session.run(query, params).consume()  # warm up plan cache
+            samples = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                session.run(query, params).consume()
+                samples.append((time.perf_counter() - start) * 1000)
+            samples.sort()
+            timings[name] = {
+                "p50_ms": round(statistics.median(samples), 2),
+                "p95_ms": round(samples[int(0.95 * (len(samples) - 1))], 2),
+            }
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark graph load and queries with/without schema")
+    parser.add_argument("--wipe", action="store_true", help="Confirm that the target database may be deleted")
+    parser.add_argument("--limit", type=int, default=2000, help="Movies to load per configuration")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--output", default="bench_schema.json")
+    args = parser.parse_args()
+
+    if not args.wipe:
+        parser.error("this benchmark deletes the whole database; pass --wipe to confirm")
+
+    csv_metadata = load_metadata(CSV_FILE)
+    movies = list(prepare_movies(islice(iter_records(JSON_FILE), args.limit), csv_metadata))
+    sample = movies[len(movies) // 2]
+    params = {
+        "director": sample["director"],
+        "year": sample["year"],
+        "genre": sample["genre"],
+        "title": sample["title"],
+        "term": sample["triplets"][0]["object"].split()[0],
+    }
+
+    report = {"movies": len(movies), "params": params}
+    for label, with_schema in (("without_schema", False), ("with_schema", True)):
+        print(f"\n=== {label} ===")
+        wipe()
+        drop_schema()
+        if with_schema:
+            ensure_schema()
+        _, load_seconds = bulk_load(movies, batch_size=args.batch_size, workers=args.workers)
+        report[label] = {
+            "load_seconds": round(load_seconds, 2),
+            "queries": time_queries(params, args.repeats),
+        }
+
+    print(f"\n{'':<22}{'without schema':>18}{'with schema':>18}")
+    print(f"{'load (s)':<22}{report['without_schema']['load_seconds']:>18}{report['with_schema']['load_seconds']:>18}")
+    for name in BENCHMARK_QUERIES:
+        print(f"{name + ' p50 (ms)':<22}"
+              f"{report['without_schema']['queries'][name]['p50_ms']:>18}"
+              f"{report['with_schema']['queries'][name]['p50_ms']:>18}")
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=4)
+    print(f"\nSaved results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Batched UNWIND loader for the movie knowledge graph.
+
+Builds the same graph as newGraphGen.upload_graph, but packs many rows into
+each parameterized transaction and spreads the batches over a pool of writer
+sessions. The load runs as a sequence of passes, each partitioned on the node
+its writes contend on. A key only ever lands in one partition, and every
+partition is written by one session, so workers rarely wait on each other's
+locks:
+
+    nodes     Director / Genre / Entity nodes          partitioned by name
+    movies    Movie, Summary, HAS_SUMMARY, HAS_DIRECTOR partitioned by director
+    genres    BELONGS_TO_GENRE                          partitioned by genre
+    triplets  ACTS and CONTAINS                         partitioned by subject entity
+    hashes    Movie.content_hash                        partitioned by title
+
+Plot and entity embeddings for the native vector indexes are written with
+the same batched passes (see write_embeddings and
+Phase3_LLM_RAG/graph_vectors.py).
+
+ACTS edges are shared between movies, so each one records the titles that
+assert it in `sources`; graphSync.py uses that to remove only a changed
+movie's share. The content hash is written last, so an interrupted load
+leaves those movies looking changed and the next sync redoes them.
+
+Triplet objects can still collide across partitions; execute_write retries
+the resulting transient deadlocks.
+"""
+import os
+import sys
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from common.neo4j_pool import write_session
+
+NODE_QUERIES = {
+    "Director": "UNWIND $rows AS name MERGE (:Director {name: name})",
+    "Genre": "UNWIND $rows AS name MERGE (:Genre {name: name})",
+    "Entity": "UNWIND $rows AS name MERGE (:Entity {name: name})",
+}
+
+MOVIES_QUERY = """
+UNWIND $rows AS row
+MERGE (m:Movie {title: row.title, year: row.year})
+MERGE (s:Summary {title: row.title})
+MERGE (m)-[:HAS_SUMMARY]->(s)
+WITH m, row
+MATCH (d:Director {name: row.director})
+MERGE (m)-[:HAS_DIRECTOR]->(d)
+"""
+
+GENRES_QUERY = """
+UNWIND $rows AS row
+MATCH (m:Movie {title: row.title, year: row.year})
+MATCH (g:Genre {name: row.genre})
+MERGE (m)-[:BELONGS_TO_GENRE]->(g)
+"""
+
+TRIPLETS_QUERY = """
+UNWIND $rows AS row
+MATCH (s:Summary {title: row.title})
+MATCH (e1:Entity {name: row.subject})
+MATCH (e2:Entity {name: row.object})
+MERGE (e1)-[r:ACTS {relation: row.relation}]->(e2)
+SET r.sources = CASE WHEN row.title IN coalesce(r.sources, []) THEN r.sources
+                     ELSE coalesce(r.sources, []) + row.title END
+MERGE (s)-[:CONTAINS]->(e1)
+MERGE (s)-[:CONTAINS]->(e2)
+"""
+
+HASHES_QUERY = """
+UNWIND $rows AS row
+MATCH (m:Movie {title: row.title, year: row.year})
+SET m.content_hash = row.content_hash
+"""
+
+# Stored through the procedure so the property is a compact float vector the vector index accepts
+EMBEDDING_QUERIES = {
+    "Summary": """
+UNWIND $rows AS row
+MATCH (s:Summary {title: row.title})
+CALL db.create.setNodeVectorProperty(s, 'embedding', row.embedding)
+""",
+    "Entity": """
+UNWIND $rows AS row
+MATCH (e:Entity {name: row.name})
+CALL db.create.setNodeVectorProperty(e, 'embedding', row.embedding)
+""",
+}
+
+
+def partition(items, key, partitions):
+    """Splits items into `partitions` lists so that equal keys always share a list."""
+    parts = [[] for _ in range(partitions)]
+    for item in items:
+        parts[zlib.crc32(str(key(item)).encode("utf-8")) % partitions].append(item)
+    return [part for part in parts if part]
+
+
+def _write_batch(tx, query, rows):
+    tx.run(query, rows=rows).consume()
+
+
+def run_pass(name, query, items, key, batch_size=1000, workers=4, prepare=None):
+    """Writes `items` with `query` in UNWIND batches, one partition per session at a time.
+
+    `prepare` turns a batch of items into query rows just before it is sent, so
+    large payloads (such as embeddings) are only materialized a batch at a time.
+    """
+    # More partitions than workers keeps the pool busy when a few keys are very large
+    parts = partition(items, key, workers * 4)
+
+    def write_partition(part):
+        with write_session() as session:
+            for i in range(0, len(part), batch_size):
+                batch = part[i:i + batch_size]
+                session.execute_write(_write_batch, query, prepare(batch) if prepare else batch)
+        return len(part)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        total = sum(pool.map(write_partition, parts))
+    elapsed = time.perf_counter() - start
+    print(f"{name:>10}: {total} rows in {elapsed:.1f}s ({total / max(elapsed, 1e-9):.0f} rows/sec)")
+    return total, elapsed
+
+
+def bulk_load(movies, batch_size=1000, workers=4):
+    """Loads prepared movie rows ({title, year, director, genre, triplets}) in batched passes."""
+    directors = list({m["director"] for m in movies})
+    genres = list({m["genre"] for m in movies})
+    entities = list({name for m in movies for t in m["triplets"] for name in (t["subject"], t["object"])})
+    triplet_rows = [
+        {"title": m["title"], **t}
+        for m in movies
+        for t in m["triplets"]
+    ]
+
+    start = time.perf_counter()
+    rows = 0
+    for label, names in (("Director", directors), ("Genre", genres), ("Entity", entities)):
+        rows += run_pass(label, NODE_QUERIES[label], names, key=lambda n: n,
+                         batch_size=batch_size, workers=workers)[0]
+    rows += run_pass("movies", MOVIES_QUERY, movies, key=lambda m: m["director"],
+                     batch_size=batch_size, workers=workers)[0]
+    rows += run_pass("genres", GENRES_QUERY, movies, key=lambda m: m["genre"],
+                     batch_size=batch_size, workers=workers)[0]
+    rows += run_pass("triplets", TRIPLETS_QUERY, triplet_rows, key=lambda t: t["subject"],
+                     batch_size=batch_size, workers=workers)[0]
+    hashes = [
+        {"title": m["title"], "year": m["year"], "content_hash": m["content_hash"]}
+        for m in movies
+        if "content_hash" in m
+    ]
+    if hashes:
+        rows += run_pass("hashes", HASHES_QUERY, hashes, key=lambda m: m["title"],
+                         batch_size=batch_size, workers=workers)[0]
+    elapsed = time.perf_counter() - start
+
+    print(f"Loaded {len(movies)} movies ({rows} rows) in {elapsed:.1f}s "
+          f"({len(movies) / max(elapsed, 1e-9):.0f} movies/sec, {rows / max(elapsed, 1e-9):.0f} rows/sec)")
+    return rows, elapsed
+
+
+def write_embeddings(label, items, prepare, batch_size=200, workers=4):
+    """Sets `embedding` on Summary (rows keyed by title) or Entity (keyed by name) nodes in batched passes."""
+    key = "title" if label == "Summary" else "name"
+    return run_pass(f"{label.lower()} vectors", EMBEDDING_QUERIES[label], items, key=lambda item: item[key],
+                    batch_size=batch_size, workers=workers, prepare=prepare)
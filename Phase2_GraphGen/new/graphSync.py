@@ -0,0 +1,159 @@
+"""
+Incremental, idempotent sync of prepared movies into an existing graph.
+
+The graph itself is the manifest. Every Movie loaded by bulkLoad carries a
+content_hash of its metadata and triplets. A sync reads those hashes once,
+diffs the input against them and only touches the delta:
+
+    new        loaded with the bulk passes
+    changed    old director/genre links and CONTAINS edges are removed, and
+               the movie's title is dropped from each ACTS edge's `sources`.
+               Edges no other movie asserts are deleted, and so are entities
+               left with no relationships. The movie is then loaded again.
+    unchanged  skipped
+    missing    (only with prune) cleaned up like a changed movie, then the
+               Movie and its Summary are deleted
+
+ACTS edges written before `sources` existed carry no owner. Such an edge is
+removed only when no other Summary contains both of its endpoints.
+"""
+import hashlib
+import json
+import os
+import sys
+import time
+
+from bulkLoad import bulk_load, run_pass
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from common.neo4j_pool import read_session
+
+EXISTING_QUERY = "MATCH (m:Movie) RETURN m.title AS title, m.year AS year, m.content_hash AS content_hash"
+
+UNLINK_METADATA_QUERY = """
+UNWIND $rows AS row
+MATCH (m:Movie {title: row.title, year: row.year})-[old:HAS_DIRECTOR|BELONGS_TO_GENRE]->()
+DELETE old
+"""
+
+RELEASE_ACTS_QUERY = """
+UNWIND $rows AS row
+MATCH (s:Summary {title: row.title})-[:CONTAINS]->(e1:Entity)-[r:ACTS]->(e2:Entity)<-[:CONTAINS]-(s)
+WITH DISTINCT row, r, e1, e2
+WHERE row.title IN coalesce(r.sources, [])
+   OR (r.sources IS NULL AND NOT EXISTS {
+        MATCH (other:Summary)-[:CONTAINS]->(e1)
+        WHERE other.title <> row.title AND (other)-[:CONTAINS]->(e2)
+      })
+WITH r, collect(row.title) AS released
+WITH r, [t IN coalesce(r.sources, []) WHERE NOT t IN released] AS remaining
+FOREACH (_ IN CASE WHEN size(remaining) > 0 THEN [1] ELSE [] END | SET r.sources = remaining)
+FOREACH (_ IN CASE WHEN size(remaining) = 0 THEN [1] ELSE [] END | DELETE r)
+"""
+
+UNLINK_ENTITIES_QUERY = """
+UNWIND $rows AS row
+MATCH (s:Summary {title: row.title})-[c:CONTAINS]->(e:Entity)
+DELETE c
+WITH DISTINCT e
+WHERE NOT (e)--()
+DELETE e
+"""
+
+DELETE_MOVIES_QUERY = """
+UNWIND $rows AS row
+MATCH (m:Movie {title: row.title, year: row.year})
+OPTIONAL MATCH (m)-[:HAS_SUMMARY]->(s:Summary)
+DETACH DELETE m, s
+"""
+
+
+def triplet_digest(triplets):
+    """
+    Order-independent digest of triplets: the sum of their hashes, mod 2**256.
+
+    Digests of a movie's records add up to the digest of all its triplets, so
+    adminExport can hash a movie whose records are streamed separately.
+    """
+    total = 0
+    for t in triplets:
+        encoded = json.dumps([t["subject"], t["relation"], t["object"]], ensure_ascii=False).encode("utf-8")
+        total += int.from_bytes(hashlib.sha256(encoded).digest(), "big")
+    return total % (1 << 256)
+
+
+def content_hash(movie, digest=None):
+    """Hash of everything a movie contributes to the graph; triplet order does not matter.
+
+    `digest` is the movie's triplet_digest when it was accumulated elsewhere.
+    """
+    digest = triplet_digest(movie["triplets"]) if digest is None else digest
+    payload = json.dumps(
+        [movie["title"], movie["year"], movie["director"], movie["genre"], f"{digest:064x}"],
+        ensure_ascii=False, default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def existing_hashes():
+    """(title, year) -> content_hash (None for movies loaded without one) for every Movie in the graph."""
+    with read_session() as session:
+        return {
+            (record["title"], record["year"]): record["content_hash"]
+            for record in session.run(EXISTING_QUERY)
+        }
+
+
+def diff(movies, existing):
+    """Splits prepared movies into (new, changed, unchanged) against the graph's hashes."""
+    new, changed, unchanged = [], [], []
+    for movie in movies:
+        key = (movie["title"], movie["year"])
+        if key not in existing:
+            new.append(movie)
+        elif existing[key] != movie["content_hash"]:
+            changed.append(movie)
+        else:
+            unchanged.append(movie)
+    return new, changed, unchanged
+
+
+def clean_up(keys, batch_size=1000, workers=4):
+    """Removes what the given movies ({title, year}) contributed, leaving the Movie and Summary nodes."""
+    run_pass("unlink", UNLINK_METADATA_QUERY, keys, key=lambda k: k["title"], batch_size=batch_size, workers=workers)
+    # An ACTS edge can be shared by movies in different partitions, and `sources` is read-modify-write,
+    # so releases run on one session to avoid lost updates
+    run_pass("release", RELEASE_ACTS_QUERY, keys, key=lambda k: k["title"], batch_size=batch_size, workers=1)
+    run_pass("entities", UNLINK_ENTITIES_QUERY, keys, key=lambda k: k["title"], batch_size=batch_size, workers=workers)
+
+
+def sync(movies, batch_size=1000, workers=4, prune=False):
+    """Upserts only new or changed movies (each prepared with a content_hash).
+
+    With `prune`, movies in the graph but not in `movies` are deleted, so only
+    pass it the full input, never a --limit slice.
+    """
+    start = time.perf_counter()
+    existing = existing_hashes()
+    new, changed, unchanged = diff(movies, existing)
+    print(f"Sync: {len(new)} new, {len(changed)} changed, {len(unchanged)} unchanged "
+          f"({len(existing)} movies in graph)")
+
+    stale = []
+    if prune:
+        wanted = {(m["title"], m["year"]) for m in movies}
+        stale = [{"title": title, "year": year} for title, year in existing if (title, year) not in wanted]
+        print(f"Sync: {len(stale)} movies no longer in the input")
+
+    cleanup = [{"title": m["title"], "year": m["year"]} for m in changed] + stale
+    if cleanup:
+        clean_up(cleanup, batch_size, workers)
+    if stale:
+        run_pass("prune", DELETE_MOVIES_QUERY, stale, key=lambda k: k["title"],
+                 batch_size=batch_size, workers=workers)
+    if new or changed:
+        bulk_load(new + changed, batch_size=batch_size, workers=workers)
+
+    elapsed = time.perf_counter() - start
+    print(f"Synced {len(new) + len(changed)} of {len(movies)} movies in {elapsed:.1f}s")
+    return {"new": len(new), "changed": len(changed), "unchanged": len(unchanged), "pruned": len(stale)}
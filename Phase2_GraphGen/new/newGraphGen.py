@@ -1,32 +1,31 @@
-from neo4j import GraphDatabase
-import json
-import pandas as pd
+from itertools import islice
+import argparse
 import os
+import sys
 from dotenv import load_dotenv
+from bulkLoad import bulk_load
+from graphSync import content_hash, sync
 
-load_dotenv()
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from common.checkpoint import iter_records
+from common.dataset import load_metadata_lookup
+from common.graph_schema import ensure_schema
+from common.neo4j_pool import pool_metrics, write_session
+from common.triplets import parse_triplet
 
-# Change these based on your setup
-NEO4J_URI = os.getenv("NEO4J_URI")
-NEO4J_USER = os.getenv("NEO4J_USER")
-NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")
+load_dotenv()
 
 # File paths
-JSON_FILE = "cleaned_triplets.json"
+JSON_FILE = "cleaned_triplets.jsonl"
 CSV_FILE = "cleaned_wiki_movie_plots.csv"
 
-# Load JSON data
-with open(JSON_FILE, "r") as f:
-    movie_data = json.load(f)
-
-# Load CSV data
-df = pd.read_csv(CSV_FILE)
-
-# Convert CSV to a lookup dictionary for metadata
-print(f'gathering metadata ....')
-df_unique = df.drop_duplicates(subset="Title", keep="first")
-csv_metadata = df_unique.set_index("Title")[["Release Year", "Director", "Genre"]].to_dict(orient="index")
-print("done")
+def load_metadata(csv_file):
+    """Builds the Title -> {Release Year, Director, Genre} lookup from the cleaned CSV."""
+    # Only the metadata columns are read, not the plot text
+    print(f'gathering metadata ....')
+    csv_metadata = load_metadata_lookup(csv_file)
+    print("done")
+    return csv_metadata
 
 def upload_graph(tx, movie_title, triplets, metadata):
     """Creates nodes and relationships for a single movie in Neo4j, including summary and triplets."""
@@ -60,41 +59,107 @@ def upload_graph(tx, movie_title, triplets, metadata):
                   triplets=triplets)
 
 def validate_triplets(triplets):
-    """Filters out invalid triplets that don't have exactly 3 elements."""
+    """Filters out invalid triplets; raw "(Subject, relation, Object)" lines are parsed on the fly.
+
+    Run `python -m common.triplets` first to also canonicalize entity names across movies.
+    """
     valid_triplets = []
     
     for triplet in triplets:
-        if isinstance(triplet, list) and len(triplet) == 3:
-            subject, relation, object_ = triplet
-            if all(isinstance(x, str) and x.strip() for x in [subject, relation, object_]):
-                valid_triplets.append({"subject": subject, "relation": relation, "object": object_})
+        parsed = parse_triplet(triplet)
+        if parsed is not None:
+            subject, relation, object_ = parsed
+            valid_triplets.append({"subject": subject, "relation": relation, "object": object_})
     
     return valid_triplets
 
+def prepare_records(movie_data, csv_metadata):
+    """Joins each triplet record with its CSV metadata; one row per record, without a content hash."""
+    for movie in movie_data:
+        title = movie["Title"]
+        if title not in csv_metadata:
+            print(f"Skipping {title} (metadata not found in CSV)")
+            continue
+
+        triplets = validate_triplets(movie["Triplets"])
+        if not triplets:
+            print(f"Skipping {title} (No valid triplets)")
+            continue
+
+        metadata = csv_metadata[title]
+        yield {
+            "title": title,
+            "year": metadata["Release Year"],
+            "director": metadata["Director"],
+            "genre": metadata["Genre"],
+            "triplets": triplets,
+        }
+
+def prepare_movies(movie_data, csv_metadata):
+    """
+    Joins triplet records with CSV metadata into rows for the bulk loader, one per (title, year).
+
+    Records that share a title (remakes, or a title listed twice) get the same
+    metadata and the same Summary node, so they are loaded as one movie with
+    their triplets combined under one content hash. Otherwise the graph keeps
+    whichever record's hash was written last, and every sync reloads the
+    other record and drops the first one's triplets.
+    """
+    movies = {}
+    for record in prepare_records(movie_data, csv_metadata):
+        key = (record["title"], record["year"])
+        if key in movies:
+            movies[key]["triplets"].extend(record["triplets"])
+        else:
+            movies[key] = {**record, "triplets": list(record["triplets"])}
+    for movie in movies.values():
+        movie["content_hash"] = content_hash(movie)
+        yield movie
+
 def main():
     """Main function to connect to Neo4j and upload the graph."""
-    driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
-
-    with driver.session() as session:
-        for i, movie in enumerate(movie_data[:2000]):  # Only process first 2000 movies
-            title = movie["Title"]
-            raw_triplets = movie["Triplets"]
-            
-            if title in csv_metadata:
-                metadata = csv_metadata[title]
-                
-                # Validate and filter triplets
-                triplets = validate_triplets(raw_triplets)
-                
-                if triplets:
-                    session.execute_write(upload_graph, title, triplets, metadata)
-                    print(f"Uploaded {i+1}/2000: {title} ({len(triplets)} valid triplets)")
-                else:
-                    print(f"Skipping {title} (No valid triplets)")
-            else:
-                print(f"Skipping {title} (metadata not found in CSV)")
-
-    driver.close()
+    parser = argparse.ArgumentParser(description="Load extracted triplets into Neo4j")
+    parser.add_argument("--mode", choices=["bulk", "sync", "per-movie"], default="bulk",
+                        help="bulk: batched UNWIND transactions over parallel sessions; "
+                             "sync: bulk-load only movies that are new or changed since the last load; "
+                             "per-movie: one transaction per movie")
+    parser.add_argument("--prune", action="store_true",
+                        help="sync mode: delete movies that are no longer in the input (not with --limit)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows per UNWIND transaction (bulk mode)")
+    parser.add_argument("--workers", type=int, default=4, help="Parallel writer sessions (bulk mode)")
+    parser.add_argument("--limit", type=int, default=None, help="Only load the first N movies")
+    parser.add_argument("--skip-schema", action="store_true", help="Do not create constraints/indexes before loading")
+    args = parser.parse_args()
+
+    csv_metadata = load_metadata(CSV_FILE)
+
+    # Stream triplet records (JSONL checkpoint, or a legacy JSON list)
+    movie_data = islice(iter_records(JSON_FILE), args.limit)
+
+    # Constraints/indexes turn every MERGE lookup from a label scan into an index seek
+    if not args.skip_schema:
+        ensure_schema()
+
+    if args.prune and (args.mode != "sync" or args.limit is not None):
+        parser.error("--prune needs --mode sync and the full input (no --limit)")
+
+    if args.mode == "sync":
+        sync(list(prepare_movies(movie_data, csv_metadata)), batch_size=args.batch_size,
+             workers=args.workers, prune=args.prune)
+        print(f"Neo4j pool: {pool_metrics()}")
+        return
+
+    if args.mode == "bulk":
+        movies = list(prepare_movies(movie_data, csv_metadata))
+        bulk_load(movies, batch_size=args.batch_size, workers=args.workers)
+        print(f"Neo4j pool: {pool_metrics()}")
+        return
+
+    with write_session() as session:
+        for i, movie in enumerate(prepare_movies(movie_data, csv_metadata)):
+            metadata = {"Release Year": movie["year"], "Director": movie["director"], "Genre": movie["genre"]}
+            session.execute_write(upload_graph, movie["title"], movie["triplets"], metadata)
+            print(f"Uploaded {i+1}: {movie['title']} ({len(movie['triplets'])} valid triplets)")
 
 if __name__ == "__main__":
     main()
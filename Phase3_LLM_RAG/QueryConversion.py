@@ -1,22 +1,46 @@
-import openai
-from neo4j import GraphDatabase
+import itertools
 import re
 from dotenv import load_dotenv
 import os
+import sys
 import reprlib
+from query_templates import TemplateLibrary
+from context_packing import apply_limit, format_rows, max_result_rows, pack_context
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.graph_schema import verify_schema
+from common.llm_cache import cached_chat_completion
+from common.neo4j_pool import read_session
 
 load_dotenv()
 
-# Change these based on your setup
-NEO4J_URI = os.getenv("NEO4J_URI")
-NEO4J_USER = os.getenv("NEO4J_USER")
-NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")
+_templates = None
+_client = None
 
-def get_cypher_query(nl_query):
-    """Uses GPT-4 to convert natural language query to Cypher."""
+def get_client():
+    """OpenAI client shared by every call in this process; openai is imported on first use."""
+    global _client
+    if _client is None:
+        import openai
+        _client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return _client
+
+def get_template_library():
+    """Process-wide template library, or None when QUERY_TEMPLATES_DISABLE=1."""
+    global _templates
+    if os.getenv("QUERY_TEMPLATES_DISABLE") == "1":
+        return None
+    if _templates is None:
+        _templates = TemplateLibrary(os.getenv("QUERY_TEMPLATES_PATH", "query_templates.json"),
+                                     validate=validate_cypher)
+    return _templates
 
-    my_api = os.getenv("OPENAI_API_KEY")
-    client = openai.OpenAI(api_key=my_api)
+MODEL = "gpt-4o-mini"
+SYSTEM_PROMPT = "You are an expert in Neo4j Cypher queries."
+CYPHER_BLOCK = re.compile(r"```cypher\n(.*?)\n```", re.DOTALL)
+
+def cypher_messages(nl_query):
+    """Chat messages asking the LLM to translate `nl_query` into Cypher."""
     prompt = f"""Convert the following natural language query into a Cypher query based on a movie knowledge graph:  
                 '{nl_query}'  
 
@@ -42,16 +66,14 @@ def get_cypher_query(nl_query):
 
                 Ensure a correct working query is returned with valid Cypher syntax.  
                 """
-    response = client.chat.completions.create(
-        # model="gpt-4o-realtime-preview-2024-12-17",
-        model = "gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": "You are an expert in Neo4j Cypher queries."},
-            {"role": "user", "content": prompt}
-        ]
-    )
-    llm_response = response.choices[0].message.content
-    match = re.search(r"```cypher\n(.*?)\n```", llm_response, re.DOTALL)
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+
+def extract_cypher(llm_response):
+    """Pulls the ```cypher block out of the LLM's answer."""
+    match = CYPHER_BLOCK.search(llm_response)
 
     if match:
         cypher_query = match.group(1).strip()
@@ -60,28 +82,115 @@ def get_cypher_query(nl_query):
 
     return cypher_query
 
-def execute_cypher_query(cypher_query):
-    """Executes a Cypher query on Neo4j."""
-    driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
-    results = []
-    with driver.session() as session:
-
-        try:
-            result = session.run(cypher_query)
-        
-        except Exception as e:
-            print(f"An error occurred running the cypher query: {e}")
-            return
-        for record in result:
-            results.append(record.values())
-    driver.close()
+def has_cypher(llm_response):
+    """True when the answer carries a ```cypher block; answers without one are not cached."""
+    return CYPHER_BLOCK.search(llm_response) is not None
+
+def get_cypher_query(nl_query):
+    """Uses GPT-4 to convert natural language query to Cypher."""
+
+    # Repeated questions are answered from the on-disk LLM cache
+    llm_response = cached_chat_completion(
+        get_client(),
+        # model="gpt-4o-realtime-preview-2024-12-17",
+        model = MODEL,
+        messages=cypher_messages(nl_query),
+        validate=has_cypher
+    )
+    return extract_cypher(llm_response)
+
+def resolve_query(nl_query):
+    """
+    Maps a question to (cypher, params, source).
+
+    Known question shapes are answered from the template library without an
+    LLM call (source is the template name). Anything else goes to
+    get_cypher_query, and the result is learned as a new template (source "llm").
+    """
+    library = get_template_library()
+    if library is not None:
+        matched = library.match(nl_query)
+        if matched is not None:
+            name, cypher_query, params = matched
+            return cypher_query, params, name
+
+    cypher_query = get_cypher_query(nl_query)
+    if library is not None:
+        learn_template(library, nl_query, cypher_query)
+    return cypher_query, {}, "llm"
+
+def learn_template(library, nl_query, cypher_query):
+    """Learns LLM Cypher as a template; a pattern that will not compile is logged and the answer goes on."""
+    try:
+        return library.learn(nl_query, cypher_query)
+    except re.error as e:
+        print(f"Could not learn a template for {nl_query!r}: {e}")
+        return None
+
+def validate_cypher(cypher_query, params=None):
+    """True when Neo4j can parse and plan the query; EXPLAIN does not execute it."""
+    from neo4j.exceptions import Neo4jError
+
+    try:
+        with read_session() as session:
+            session.run("EXPLAIN " + cypher_query, params or {}).consume()
+        return True
+    except Neo4jError as e:
+        print(f"Not caching generated query as a template: {e.message}")
+        return False
+
+def run_cypher(cypher_query, params=None, max_rows=None, skip=0):
+    """
+    Runs a query with a LIMIT pushed into it and returns (column names, rows, truncated).
+
+    One row past `max_rows` (default: MAX_RESULT_ROWS) is requested so that
+    `truncated` tells whether the query had more to give; pass `skip` to
+    fetch the following page.
+    """
+    max_rows = max_rows or max_result_rows()
+    with read_session() as session:
+        result = session.run(apply_limit(cypher_query, max_rows + 1, skip), params or {})
+        keys = result.keys()
+        rows = [record.values() for record in result]
+    return keys, rows[:max_rows], len(rows) > max_rows
+
+def pack_cypher(question, cypher_query, params=None, max_rows=None, budget=None):
+    """
+    Runs a query and packs its rows for the synthesis prompt as they stream from the server.
+
+    Unlike run_cypher, the driver's records are never collected: each is
+    formatted and deduped as it arrives. Returns (packed context, distinct
+    rows), where 0 distinct rows means the query found nothing.
+    """
+    max_rows = max_rows or max_result_rows()
+    with read_session() as session:
+        result = session.run(apply_limit(cypher_query, max_rows + 1), params or {})
+        keys = result.keys()
+        rows = format_rows(record.values() for record in itertools.islice(result, max_rows))
+        truncated = result.peek() is not None
+    return pack_context(question, rows, keys, budget, truncated), len(rows)
+
+def execute_cypher_query(cypher_query, params=None, max_rows=None):
+    """Executes a (parameterized) Cypher query on Neo4j using a pooled read session."""
+    try:
+        _, results, truncated = run_cypher(cypher_query, params, max_rows)
+    except Exception as e:
+        print(f"An error occurred running the cypher query: {e}")
+        return
+    if truncated:
+        print(f"Query returned more than {len(results)} rows; keeping the first {len(results)}")
     return results
 
-def clean_retrieved_results(query, result):
+def check_schema():
+    """Warns when the constraints/indexes created by Phase 2 are missing, since queries then fall back to label scans."""
+    missing = verify_schema()
+    if missing:
+        print(f"Warning: graph schema incomplete, missing {', '.join(missing)}. "
+              f"Run Phase2_GraphGen/new/newGraphGen.py to create it.")
+    return not missing
 
-    '''Gets the retrieved answer from Neo4j and passes back to the LLM to produce an intelligent output'''
-    my_api = os.getenv("OPENAI_API_KEY")
-    client = openai.OpenAI(api_key=my_api)
+def synthesis_messages(query, result, related=None):
+    """Chat messages asking the LLM to turn retrieved graph results (and optional semantic hits) into an answer."""
     prompt = f"""You are an intelligent movie knowledge assistant.
                  Based on the given query and the retrieved results from a Neo4j movie knowledge graph, format a clear and informative response.
 
@@ -97,15 +206,26 @@ def clean_retrieved_results(query, result):
 
                  Provide the structured response below: 
               """
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": "You are an expert in Neo4j Cypher queries."},
-            {"role": "user", "content": prompt}
-        ]
-    )
+    if related:
+        prompt = prompt.replace(
+            f"**Fetched Results:** {result}",
+            f"**Fetched Results:** {result}\n\n                 **Related Movies (semantic search):** {related}"
+        )
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
 
-    return response.choices[0].message.content
+def clean_retrieved_results(query, result, keys=None, truncated=False):
+
+    '''Gets the retrieved answer from Neo4j and passes back to the LLM to produce an intelligent output'''
+    # Deduped, grouped, relevance-ranked rows trimmed to the token budget instead of the raw repr
+    packed = pack_context(query, result, keys, truncated=truncated)
+    return cached_chat_completion(
+        get_client(),
+        model=MODEL,
+        messages=synthesis_messages(query, packed)
+    )
 
 
 def main():
@@ -118,15 +238,23 @@ def main():
     q_desc = 'Suggest movies which has an Irish man or Irish based theme'
     q_summ = "Summarize the movie Terrible Teddy, the Grizzly King"
 
+    check_schema()
+
     user_query = input("Enter your query: ")
     
-    cypher_query = get_cypher_query(user_query)
+    cypher_query, params, source = resolve_query(user_query)
 
     print(f"\nUnstructured Query:\n{user_query}")
-    print(f"\nGenerated Cypher Query:\n{cypher_query}")
+    print(f"\nGenerated Cypher Query ({source}):\n{cypher_query}")
+    if params:
+        print(f"Parameters: {params}")
     
-    results = execute_cypher_query(cypher_query)
-    final_response = clean_retrieved_results(user_query, results) if results else "No results found"
+    try:
+        keys, results, truncated = run_cypher(cypher_query, params)
+    except Exception as e:
+        print(f"An error occurred running the cypher query: {e}")
+        keys, results, truncated = None, None, False
+    final_response = clean_retrieved_results(user_query, results, keys, truncated) if results else "No results found"
 
     print("\nQuery Results:")
     print(reprlib.repr(results))
@@ -1,65 +1,214 @@
-import openai
-import pandas as pd
+import argparse
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from collections import Counter
+import hashlib
 import pickle
 import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
 from dotenv import load_dotenv
+from embedding_store import EmbeddingStore
+from ann_index import load_index
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.dataset import METADATA_COLUMNS, load_movies
 
 load_dotenv()
 
-# Load your movie dataset (assuming it's already cleaned)
-movie_df = pd.read_csv("cleaned_wiki_movie_plots.csv")
-my_api = os.getenv("OPENAI_API_KEY")
-client = openai.OpenAI(api_key=my_api)
+EMBEDDING_MODEL = "text-embedding-ada-002"
+EMBEDDING_DIM = 1536
+STORE_DIR = "movie_embeddings"
+
+# Per-request API limits for the embeddings endpoint, and a per-input cap that
+# keeps a single plot under ada-002's 8191-token context even for dense text
+MAX_REQUEST_INPUTS = 2048
+MAX_REQUEST_TOKENS = 250_000
+MAX_INPUT_CHARS = 8191 * 3
+
+_movie_df = None
+_client = None
+_embeddings = None
+
+def get_movie_df():
+    """Load the movie metadata (no plot text) once per process, on first use."""
+    global _movie_df
+    if _movie_df is None:
+        _movie_df = load_movies(METADATA_COLUMNS)
+    return _movie_df
+
+def get_client():
+    """OpenAI client shared by every embedding call in this process; openai is imported on first use."""
+    global _client
+    if _client is None:
+        import openai
+        _client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return _client
+
+def plot_hash(text):
+    """Content hash of a plot; a row is re-embedded only when this changes."""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+def pack_requests(items, max_inputs=MAX_REQUEST_INPUTS, max_tokens=MAX_REQUEST_TOKENS):
+    """
+    Group (row_id, title, text) items into embedding requests that stay under the API limits.
+    
+    Args:
+        items (iterable): (row_id, title, text) tuples.
+        max_inputs (int): Maximum inputs per request.
+        max_tokens (int): Estimated token budget per request (~4 characters per token).
+    
+    Yields:
+        list: One request's worth of items.
+    """
+    batch, tokens = [], 0
+    for item in items:
+        estimate = len(item[2]) // 4 + 1
+        if batch and (len(batch) >= max_inputs or tokens + estimate > max_tokens):
+            yield batch
+            batch, tokens = [], 0
+        batch.append(item)
+        tokens += estimate
+    if batch:
+        yield batch
 
 # Function to generate embeddings for the cleaned plot
-def generate_embeddings(df, column_name="Cleaned_Plot"):
+def generate_embeddings(df, column_name="Cleaned_Plot", store_dir=STORE_DIR, concurrency=8, dtype="float32"):
     """
-    Generate embeddings for the specified column in the DataFrame.
+    Embed every row of the DataFrame that is not already in the store.
+    
+    Plots are packed many per request and requests run concurrently. Each
+    finished request is appended to the store (and fsynced) straight away, so
+    the committed rows double as the resume marker: an interrupted run
+    loses at most the requests in flight. Rows whose plot hash is already
+    stored are skipped, and a changed plot replaces its old vector.
     
     Args:
         df (pd.DataFrame): The movie DataFrame.
         column_name (str): The column to generate embeddings for.
+        store_dir (str): The store directory.
+        concurrency (int): Embedding requests in flight.
+        dtype (str): On-disk precision for a new store, "float32" or "float16".
     
     Returns:
-        list: List of embeddings for the specified column.
+        EmbeddingStore: The up-to-date store.
     """
-    # Use OpenAI embeddings to generate embedding for each movie plot
-    embeddings = []
-    for plot in df[column_name]:
-        embedding = client.embeddings.create(input=[plot], model="text-embedding-ada-002")
-        embeddings.append(embedding.data[0].embedding)
-    
-    return np.array(embeddings)
+    store = EmbeddingStore(store_dir) if os.path.exists(os.path.join(store_dir, "meta.json")) else None
+    embedded = {(row["row_id"], row.get("plot_hash")) for row in store.rows} if store is not None else set()
+    stored_ids = {row_id for row_id, _ in embedded}
+
+    todo, hashes = [], {}
+    for row_id, title, plot in zip(df.index.tolist(), df["Title"].tolist(), df[column_name].tolist()):
+        if not isinstance(plot, str) or not plot.strip():
+            continue
+        hashes[row_id] = plot_hash(plot)
+        if (row_id, hashes[row_id]) not in embedded:
+            todo.append((row_id, title, plot[:MAX_INPUT_CHARS]))
+    print(f"{len(df) - len(todo)} rows already embedded, {len(todo)} to go")
+    if not todo:
+        return store if store is not None else EmbeddingStore.create(store_dir, dim=EMBEDDING_DIM, dtype=dtype, model=EMBEDDING_MODEL)
+
+    # The SDK retries rate limits and transient errors with exponential backoff
+    client = get_client().with_options(max_retries=8)
+
+    def embed(batch):
+        response = client.embeddings.create(input=[text for _, _, text in batch], model=EMBEDDING_MODEL)
+        return batch, np.array([item.embedding for item in response.data], dtype=np.float32)
+
+    start = time.perf_counter()
+    done = 0
+    replaced = False
+    batches = pack_requests(todo)
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        # Keep a bounded number of requests queued so memory does not grow with the corpus
+        pending = {pool.submit(embed, batch) for batch in islice(batches, concurrency * 2)}
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                batch, vectors = future.result()
+                if store is None:
+                    store = EmbeddingStore.create(store_dir, dim=vectors.shape[1], dtype=dtype, model=EMBEDDING_MODEL)
+                store.append(
+                    [row_id for row_id, _, _ in batch],
+                    [title for _, title, _ in batch],
+                    vectors,
+                    extra=[{"plot_hash": hashes[row_id]} for row_id, _, _ in batch]
+                )
+                replaced = replaced or any(row_id in stored_ids for row_id, _, _ in batch)
+                done += len(batch)
+                elapsed = time.perf_counter() - start
+                print(f"Embedded {done}/{len(todo)} rows ({done / max(elapsed, 1e-9):.0f} rows/sec)")
+            pending |= {pool.submit(embed, batch) for batch in islice(batches, len(finished))}
 
-# Save embeddings to a file
-def save_embeddings(embeddings, filename="movie_embeddings.pkl"):
+    # Changed plots were appended alongside their old vectors; drop the superseded ones
+    if replaced:
+        store.compact()
+    return store
+
+# Save embeddings to a memory-mapped store
+def save_embeddings(embeddings, filename=STORE_DIR, df=None, dtype="float32", column_name="Cleaned_Plot"):
     """
-    Save the generated embeddings to a file for later use.
+    Save the generated embeddings as a memory-mapped store for later use.
     
     Args:
-        embeddings (np.ndarray): The generated embeddings.
-        filename (str): The file to save embeddings.
+        embeddings (np.ndarray): The generated embeddings, one row per movie.
+        filename (str): The store directory.
+        df (pd.DataFrame): The rows the embeddings were generated from (defaults to the whole movie dataset).
+        dtype (str): On-disk precision, "float32" or "float16" (half the size).
+        column_name (str): The column the embeddings were generated from, hashed so later runs can skip these rows.
     """
-    with open(filename, "wb") as f:
-        pickle.dump(embeddings, f)
+    df = load_movies(["Title", column_name]) if df is None else df
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    store = EmbeddingStore.create(filename, dim=embeddings.shape[1], dtype=dtype, model=EMBEDDING_MODEL)
+    hashes = [{"plot_hash": plot_hash(plot) if isinstance(plot, str) else None} for plot in df[column_name]]
+    store.append(df.index, df["Title"].tolist(), embeddings, extra=hashes)
+    return store
 
 # Load the pre-saved embeddings from file
-def load_embeddings(filename="movie_embeddings.pkl"):
+def load_embeddings(filename=STORE_DIR, index=None, **index_params):
     """
-    Load embeddings from a saved file.
+    Load embeddings from a saved store, optionally behind an approximate index.
+
+    A legacy pickle (e.g. "movie_embeddings.pkl", rows aligned with the movie
+    dataset) is converted into a store next to it on first load.
     
     Args:
-        filename (str): The file containing saved embeddings.
+        filename (str): The store directory, or a legacy .pkl file.
+        index (str): "exact", "ivf" or "hnsw" (defaults to the SEMANTIC_INDEX environment variable, else "exact").
+        index_params: Build/query parameters for the index, e.g. nlist=1024, nprobe=16 or M=16, ef=64.
     
     Returns:
-        np.ndarray: Loaded embeddings.
+        EmbeddingStore or ANN index: Anything semantic_search() accepts.
+    """
+    if filename.endswith(".pkl"):
+        store_dir = filename[:-len(".pkl")]
+        if not os.path.exists(os.path.join(store_dir, "meta.json")):
+            with open(filename, "rb") as f:
+                save_embeddings(pickle.load(f), store_dir)
+        filename = store_dir
+    store = EmbeddingStore(filename)
+    index = index or os.getenv("SEMANTIC_INDEX", "exact")
+    return store if index == "exact" else load_index(store, index, **index_params)
+
+def get_embeddings():
+    """The default store (behind SEMANTIC_INDEX), loaded once per process, on first use."""
+    global _embeddings
+    if _embeddings is None:
+        _embeddings = load_embeddings()
+    return _embeddings
+
+def embed_queries(queries):
     """
-    with open(filename, "rb") as f:
-        embeddings = pickle.load(f)
-    return embeddings
+    Embed one or more query strings with a single API request.
+
+    Args:
+        queries (list): The natural language queries.
+
+    Returns:
+        np.ndarray: One float32 embedding per query.
+    """
+    response = get_client().embeddings.create(input=list(queries), model=EMBEDDING_MODEL)
+    return np.array([item.embedding for item in response.data], dtype=np.float32)
 
 # Perform semantic search based on a query
 def semantic_search(query, embeddings, movie_df, top_k=5):
@@ -68,7 +217,7 @@ def semantic_search(query, embeddings, movie_df, top_k=5):
     
     Args:
         query (str): The natural language query.
-        embeddings (np.ndarray): The movie plot embeddings.
+        embeddings (EmbeddingStore or ANN index): The movie plot embeddings, as returned by load_embeddings.
         movie_df (pd.DataFrame): The movie DataFrame.
         top_k (int): Number of top similar results to return.
     
@@ -76,58 +225,71 @@ def semantic_search(query, embeddings, movie_df, top_k=5):
         list: List of top-k most relevant movie titles and their similarity scores.
     """
     # Generate embedding for the query
-    query_embedding = openai.Embedding.create(input=[query], model="text-embedding-ada-002")["data"][0]["embedding"]
-    
-    # Calculate cosine similarity between query embedding and movie plot embeddings
-    similarities = cosine_similarity([query_embedding], embeddings)
+    query_embedding = embed_queries([query])[0]
     
-    # Get top-k most similar movies
-    top_k_indices = similarities[0].argsort()[-top_k:][::-1]
+    # Exact: one matrix-vector product then a partial top-k; ANN indexes only score the candidates they probe
+    positions, scores = embeddings.search(query_embedding, top_k)
     
     # Return the movie titles and similarity scores
-    return movie_df.iloc[top_k_indices][["Title", "Release Year", "Director", "Genre"]], similarities[0][top_k_indices]
+    return movie_df.loc[embeddings.row_ids[positions]][["Title", "Release Year", "Director", "Genre"]], scores
 
-def filter_directors_by_year(year, top_k=5):
+def semantic_search_batch(queries, embeddings, movie_df, top_k=5):
     """
-    Find directors who made more than one movie in a specific year by performing 
-    semantic search and filtering the results.
+    Answer many queries with one embedding request and one matrix product.
     
     Args:
-        year (int): The year for which to retrieve relevant directors.
-        top_k (int): Number of top similar results to retrieve.
-
+        queries (list): The natural language queries.
+        embeddings (EmbeddingStore or ANN index): The movie plot embeddings, as returned by load_embeddings.
+        movie_df (pd.DataFrame): The movie DataFrame.
+        top_k (int): Number of top similar results to return per query.
+    
     Returns:
-        list: Directors who made more than 1 movie in the specified year.
+        list: One (movies, similarity scores) pair per query, as returned by semantic_search.
     """
-    # Create a query for the specific year
-    query = f"List all directors who made movies in the year {year}"
-    
-    # Perform semantic search
-    relevant_movies, _ = semantic_search(query, embeddings, movie_df, top_k)
-    
-    # Filter movies for the specified year
-    relevant_movies_year = relevant_movies[relevant_movies['Release Year'] == year]
-    
-    # Extract the directors from the filtered data
-    directors = relevant_movies_year['Director'].tolist()
-    
-    # Count the number of movies for each director
-    director_count = Counter(directors)
+    positions, scores = embeddings.search_batch(embed_queries(queries), top_k)
+    columns = ["Title", "Release Year", "Director", "Genre"]
+    # An IVF probe can find fewer than top_k candidates; its padding (position -1) is not a hit
+    found = positions >= 0
+    return [
+        (movie_df.loc[embeddings.row_ids[row_positions[row_found]]][columns], row_scores[row_found])
+        for row_positions, row_scores, row_found in zip(positions, scores, found)
+    ]
+
+def filter_directors_by_year(year, min_movies=1):
+    """
+    Find directors who made more than `min_movies` movies in a specific year.
     
-    # Find directors who made more than 1 movie in the specified year
-    multi_movie_directors = [director for director, count in director_count.items() if count > 1]
+    Counting movies per director is a graph question: a top-k semantic search
+    only ever sees k movies, so this runs the busy_directors query template
+    on Neo4j (an index lookup on Movie.year) instead.
     
-    return multi_movie_directors
+    Args:
+        year (int): The year for which to retrieve directors.
+        min_movies (int): Directors need strictly more movies than this.
+
+    Returns:
+        list: Directors who made more than `min_movies` movies in the specified year, busiest first.
+    """
+    import QueryConversion
+    from query_templates import BUILTIN_TEMPLATES
+
+    template = next(t for t in BUILTIN_TEMPLATES if t.name == "busy_directors")
+    _, rows, _ = QueryConversion.run_cypher(template.cypher, {"year": year, "min_movies": min_movies})
+    return [director for director, _ in rows]
+
+def main():
+    parser = argparse.ArgumentParser(description="Embed the movie plots into the embedding store")
+    parser.add_argument("--csv", default=None, help="Cleaned CSV (default: MOVIE_DATASET or cleaned_wiki_movie_plots.csv)")
+    parser.add_argument("--column", default="Cleaned_Plot")
+    parser.add_argument("--store", default=STORE_DIR)
+    parser.add_argument("--concurrency", type=int, default=8, help="Embedding requests in flight")
+    parser.add_argument("--dtype", choices=["float32", "float16"], default="float32", help="Precision of a new store")
+    args = parser.parse_args()
+
+    # Embed only rows that are new or whose plot changed since the last run
+    store = generate_embeddings(load_movies(["Title", args.column], path=args.csv), args.column, args.store,
+                                args.concurrency, args.dtype)
+    print(f"{len(store)} plots in {args.store}")
 
 if __name__ == "__main__":
-    # Generate embeddings and save them (only once)
-    embeddings = generate_embeddings(movie_df)
-    save_embeddings(embeddings)  # Save to file
-    
-    # Load the saved embeddings
-    embeddings = load_embeddings()
-    
-    # Example query for directors who made more than one movie in the year 1925
-    year = 1925
-    directors_in_year = filter_directors_by_year(year)
-    print(f"Directors who made more than 1 movie in {year}: {directors_in_year}")
+    main()
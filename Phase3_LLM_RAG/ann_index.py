@@ -0,0 +1,261 @@
+"""
+Approximate nearest-neighbour indexes over an EmbeddingStore.
+
+Every index answers search(query, top_k) and search_batch(queries, top_k)
+with store positions and cosine scores, and exposes the store's row_ids.
+search_batch pads queries that found fewer than top_k candidates with
+position -1, which callers drop before looking up row_ids.
+That is the same interface EmbeddingStore has, so semantic_search() accepts
+either. Indexes are built once and persisted inside the store directory:
+
+    exact   brute-force matmul over the whole store (EmbeddingStore itself)
+    ivf     spherical k-means coarse quantizer with inverted lists. Vectors are
+            copied into list order, so probing a list reads one contiguous
+            block. Tune recall/latency with nlist (build) and nprobe (query).
+    hnsw    hnswlib graph (optional dependency: pip install hnswlib). Tune
+            with M / ef_construction (build) and ef (query).
+
+An index records how many store rows it covers. load_index() rebuilds it
+when the store has grown or been compacted since.
+
+Usage:
+    index = load_index(store, "ivf", nlist=1024, nprobe=16)
+    positions, scores = index.search(query_vector, top_k=5)
+"""
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+from embedding_store import EmbeddingStore, normalize, top_k_indices
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+INDEX_KINDS = ("exact", "ivf", "hnsw")
+
+# Rows scored per matrix product while building, to bound temporary memory
+CHUNK_ROWS = 65536
+
+
+def _chunks(count, size=CHUNK_ROWS):
+    for start in range(0, count, size):
+        yield start, min(start + size, count)
+
+
+def _nearest_centroid(vectors, centroids):
+    """Index of the most similar centroid for every row, computed in chunks."""
+    assign = np.empty(len(vectors), dtype=np.int64)
+    for start, end in _chunks(len(vectors)):
+        block = np.asarray(vectors[start:end], dtype=np.float32)
+        assign[start:end] = np.argmax(block @ centroids.T, axis=1)
+    return assign
+
+
+def spherical_kmeans(vectors, k, iterations=20, sample_size=100_000, seed=0):
+    """Unit-length centroids that maximize cosine similarity to a sample of `vectors`."""
+    rng = np.random.default_rng(seed)
+    count = len(vectors)
+    sample = np.sort(rng.choice(count, size=min(count, max(sample_size, k)), replace=False))
+    data = np.asarray(vectors[sample], dtype=np.float32)
+    centroids = data[rng.choice(len(data), size=k, replace=False)].copy()
+
+    for _ in range(iterations):
+        assign = _nearest_centroid(data, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, data)
+        counts = np.bincount(assign, minlength=k)
+        # Empty clusters restart from random sample points
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = data[rng.choice(len(data), size=int(empty.sum()), replace=False)]
+        centroids = normalize(sums)
+    return centroids
+
+
+class ExactIndex:
+    """Brute-force search; the reference the approximate indexes are measured against."""
+
+    kind = "exact"
+
+    def __init__(self, store):
+        self.store = store
+        self.row_ids = store.row_ids
+
+    def __len__(self):
+        return len(self.store)
+
+    def search(self, query, top_k=5):
+        return self.store.search(query, top_k)
+
+    def search_batch(self, queries, top_k=5):
+        return self.store.search_batch(queries, top_k)
+
+
+class IVFIndex:
+    """Inverted-file index: score only the vectors in the `nprobe` lists closest to the query."""
+
+    kind = "ivf"
+
+    def __init__(self, store, nprobe=16):
+        self.store = store
+        self.row_ids = store.row_ids
+        self.path = os.path.join(store.path, "ivf")
+        with open(os.path.join(self.path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.nprobe = nprobe
+        self.centroids = np.load(os.path.join(self.path, "centroids.npy"))
+        self.offsets = np.load(os.path.join(self.path, "offsets.npy"))
+        self.positions = np.load(os.path.join(self.path, "positions.npy"), mmap_mode="r")
+        self.vectors = np.load(os.path.join(self.path, "vectors.npy"), mmap_mode="r")
+
+    def __len__(self):
+        return self.meta["count"]
+
+    @classmethod
+    def build(cls, store, nlist=None, iterations=20, sample_size=100_000, nprobe=16, seed=0):
+        """Clusters the store into `nlist` lists (default ~4*sqrt(n)) and writes the index."""
+        count = len(store)
+        nlist = min(count, nlist or max(1, int(4 * np.sqrt(count))))
+        centroids = spherical_kmeans(store.vectors, nlist, iterations, sample_size, seed)
+        assign = _nearest_centroid(store.vectors, centroids)
+        order = np.argsort(assign, kind="stable")
+        offsets = np.searchsorted(assign[order], np.arange(nlist + 1)).astype(np.int64)
+
+        # Written to a temporary directory and renamed, so a crash never leaves a half-built index
+        path = os.path.join(store.path, "ivf")
+        tmp_path = path + ".tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        np.save(os.path.join(tmp_path, "centroids.npy"), centroids)
+        np.save(os.path.join(tmp_path, "offsets.npy"), offsets)
+        np.save(os.path.join(tmp_path, "positions.npy"), order)
+        vectors = np.lib.format.open_memmap(
+            os.path.join(tmp_path, "vectors.npy"), mode="w+", dtype=store.dtype, shape=(count, store.dim)
+        )
+        for start, end in _chunks(count):
+            vectors[start:end] = store.vectors[order[start:end]]
+        vectors.flush()
+        del vectors
+        with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+            json.dump({"count": count, "nlist": nlist, "iterations": iterations}, f)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+        return cls(store, nprobe=nprobe)
+
+    def _search_one(self, query, top_k, nprobe):
+        probes = top_k_indices(self.centroids @ query, nprobe)
+        blocks = [(self.offsets[p], self.offsets[p + 1]) for p in probes.tolist()]
+        candidates = np.concatenate([np.arange(start, end) for start, end in blocks])
+        if not len(candidates):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        scores = np.concatenate([
+            np.asarray(self.vectors[start:end] @ query.astype(self.vectors.dtype), dtype=np.float32)
+            for start, end in blocks
+        ])
+        best = top_k_indices(scores, top_k)
+        return np.asarray(self.positions[candidates[best]]), scores[best]
+
+    def search(self, query, top_k=5, nprobe=None):
+        """Top-k store positions and cosine scores, probing `nprobe` lists (default: self.nprobe)."""
+        return self._search_one(normalize(query), top_k, min(nprobe or self.nprobe, len(self.centroids)))
+
+    def search_batch(self, queries, top_k=5, nprobe=None):
+        """Per-query search; rows with fewer than top_k candidates are padded with position -1 and score -inf."""
+        queries = normalize(queries)
+        positions = np.full((len(queries), top_k), -1, dtype=np.int64)
+        scores = np.full((len(queries), top_k), -np.inf, dtype=np.float32)
+        for i, query in enumerate(queries):
+            found, found_scores = self.search(query, top_k, nprobe)
+            positions[i, :len(found)] = found
+            scores[i, :len(found)] = found_scores
+        return positions, scores
+
+
+class HNSWIndex:
+    """Hierarchical navigable small-world graph built with hnswlib over inner product."""
+
+    kind = "hnsw"
+
+    def __init__(self, store, ef=64):
+        if hnswlib is None:
+            raise ImportError("The hnsw index needs hnswlib. Install with: pip install hnswlib")
+        self.store = store
+        self.row_ids = store.row_ids
+        self.path = os.path.join(store.path, "hnsw")
+        with open(os.path.join(self.path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.index = hnswlib.Index(space="ip", dim=store.dim)
+        self.index.load_index(os.path.join(self.path, "index.bin"), max_elements=self.meta["count"])
+        self.ef = ef
+
+    def __len__(self):
+        return self.meta["count"]
+
+    @classmethod
+    def build(cls, store, M=16, ef_construction=200, ef=64, threads=-1):
+        """Inserts every store vector into a new graph and writes it to <store>/hnsw."""
+        if hnswlib is None:
+            raise ImportError("The hnsw index needs hnswlib. Install with: pip install hnswlib")
+        count = len(store)
+        index = hnswlib.Index(space="ip", dim=store.dim)
+        index.init_index(max_elements=count, ef_construction=ef_construction, M=M)
+        for start, end in _chunks(count):
+            index.add_items(np.asarray(store.vectors[start:end], dtype=np.float32),
+                            np.arange(start, end), num_threads=threads)
+
+        path = os.path.join(store.path, "hnsw")
+        tmp_path = path + ".tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        index.save_index(os.path.join(tmp_path, "index.bin"))
+        with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+            json.dump({"count": count, "M": M, "ef_construction": ef_construction}, f)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+        return cls(store, ef=ef)
+
+    def search_batch(self, queries, top_k=5, ef=None):
+        queries = normalize(np.atleast_2d(queries))
+        top_k = min(top_k, len(self))
+        self.index.set_ef(max(ef or self.ef, top_k))
+        labels, distances = self.index.knn_query(queries, k=top_k)
+        # hnswlib's inner-product distance is 1 - dot
+        return labels.astype(np.int64), (1.0 - distances).astype(np.float32)
+
+    def search(self, query, top_k=5, ef=None):
+        positions, scores = self.search_batch(query, top_k, ef)
+        return positions[0], scores[0]
+
+
+def load_index(store, kind="exact", rebuild=False, **params):
+    """Opens the persisted `kind` index for `store`, building it first when missing or stale.
+
+    Build parameters (nlist, iterations / M, ef_construction) only take effect
+    on a build. Query parameters (nprobe / ef) apply every time.
+    """
+    if isinstance(store, str):
+        store = EmbeddingStore(store)
+    if kind == "exact":
+        return ExactIndex(store)
+    if kind not in INDEX_KINDS:
+        raise ValueError(f"Unknown index kind {kind!r}; expected one of {', '.join(INDEX_KINDS)}")
+
+    cls = IVFIndex if kind == "ivf" else HNSWIndex
+    query_param = "nprobe" if kind == "ivf" else "ef"
+    query_kwargs = {query_param: params.pop(query_param)} if query_param in params else {}
+    meta_path = os.path.join(store.path, kind, "meta.json")
+    if not rebuild and os.path.exists(meta_path):
+        with open(meta_path) as f:
+            if json.load(f)["count"] == len(store):
+                return cls(store, **query_kwargs)
+        print(f"{kind} index is stale ({len(store)} rows in store), rebuilding")
+
+    start = time.perf_counter()
+    index = cls.build(store, **params, **query_kwargs)
+    print(f"Built {kind} index over {len(store)} vectors in {time.perf_counter() - start:.1f}s")
+    return index
@@ -0,0 +1,191 @@
+"""
+Streaming end-to-end answers: question -> Cypher -> Neo4j -> streamed synthesis.
+
+QueryConversion.main runs its stages back to back and waits for the whole
+answer. Here, semantic retrieval is prefetched while the Cypher is being
+resolved (template or LLM). The Neo4j query runs with a pushed-down LIMIT,
+and its rows are packed into the prompt within the token budget (see
+context_packing). The synthesis completion is streamed, so the first tokens
+are printed as soon as the model produces them.
+
+answer_stream() is an async generator of text chunks. Closing it, or
+cancelling the task that consumes it, cancels the prefetch and closes the
+LLM stream.
+
+Usage:
+    python Phase3_LLM_RAG/answer_pipeline.py "Suggest top 5 WAR movies"
+"""
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+
+from dotenv import load_dotenv
+
+import QueryConversion
+from context_packing import max_result_rows
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.llm_cache import acached_chat_completion, astream_chat_completion
+from common.neo4j_pool import get_driver
+
+load_dotenv()
+
+_async_client = None
+
+
+def get_async_client():
+    """AsyncOpenAI client shared by every pipeline run in this process; openai is imported on first use."""
+    global _async_client
+    if _async_client is None:
+        import openai
+        _async_client = openai.AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return _async_client
+
+
+def warm_up():
+    """
+    Imports openai and opens the Neo4j driver on a background thread.
+
+    Nothing is loaded at import time, so the CLI starts fast; calling this while
+    the question is still being typed hides most of that first-use cost.
+    Errors are left for the real call to report.
+    """
+    def work():
+        try:
+            get_async_client()
+            get_driver()
+        except Exception:
+            pass
+    thread = threading.Thread(target=work, daemon=True)
+    thread.start()
+    return thread
+
+
+async def resolve_query_async(question):
+    """Async counterpart of QueryConversion.resolve_query; returns (cypher, params, source)."""
+    library = QueryConversion.get_template_library()
+    if library is not None:
+        matched = library.match(question)
+        if matched is not None:
+            name, cypher_query, params = matched
+            return cypher_query, params, name
+
+    llm_response = await acached_chat_completion(
+        get_async_client(),
+        model=QueryConversion.MODEL,
+        messages=QueryConversion.cypher_messages(question),
+        validate=QueryConversion.has_cypher
+    )
+    cypher_query = QueryConversion.extract_cypher(llm_response)
+    if library is not None:
+        # Learning validates the template against Neo4j; keep that off the event loop
+        await asyncio.to_thread(QueryConversion.learn_template, library, question, cypher_query)
+    return cypher_query, {}, "llm"
+
+
+def semantic_prefetch(question, top_k=5):
+    """Top-k semantically similar movies as dicts, or None when no embedding store has been built."""
+    import Semantic_retrieval
+
+    if not os.path.exists(os.path.join(Semantic_retrieval.STORE_DIR, "meta.json")):
+        return None
+    movies, scores = Semantic_retrieval.semantic_search(
+        question, Semantic_retrieval.get_embeddings(), Semantic_retrieval.get_movie_df(), top_k
+    )
+    return [{**row, "score": round(float(score), 3)} for row, score in zip(movies.to_dict("records"), scores)]
+
+
+async def answer_stream(question, top_k=5, max_records=None, semantic=True, timings=None):
+    """
+    Yields the answer to `question` as it is generated.
+
+    Args:
+        question (str): The natural language question.
+        top_k (int): Semantically similar movies to add to the context.
+        max_records (int): LIMIT pushed into the Neo4j query (default: MAX_RESULT_ROWS).
+        semantic (bool): Prefetch semantic-search hits in parallel with Cypher generation.
+        timings (dict): Filled with per-stage seconds since the start (resolved, retrieved, first_token, done).
+    """
+    timings = {} if timings is None else timings
+    start = time.perf_counter()
+    prefetch = asyncio.create_task(asyncio.to_thread(semantic_prefetch, question, top_k)) if semantic else None
+    try:
+        try:
+            cypher_query, params, source = await resolve_query_async(question)
+        except ValueError as e:
+            # No usable Cypher; the semantic hits can still answer
+            print(f"Cypher generation failed, using semantic hits only: {e}")
+            cypher_query, params, source = None, {}, "semantic"
+        timings["resolved"] = time.perf_counter() - start
+        timings["source"] = source
+
+        packed, rows = "(no rows)", 0
+        if cypher_query is not None:
+            try:
+                packed, rows = await asyncio.to_thread(
+                    QueryConversion.pack_cypher, question, cypher_query, params, max_records
+                )
+            except Exception as e:
+                print(f"An error occurred running the cypher query: {e}")
+        related = None
+        if prefetch is not None:
+            try:
+                related = await prefetch
+            except Exception as e:
+                print(f"Semantic prefetch failed: {e}")
+        timings["retrieved"] = time.perf_counter() - start
+
+        if not rows and not related:
+            yield "No results found"
+            return
+
+        async for token in astream_chat_completion(
+            get_async_client(),
+            model=QueryConversion.MODEL,
+            messages=QueryConversion.synthesis_messages(question, packed, related)
+        ):
+            timings.setdefault("first_token", time.perf_counter() - start)
+            yield token
+    finally:
+        if prefetch is not None and not prefetch.done():
+            prefetch.cancel()
+        timings["done"] = time.perf_counter() - start
+
+
+async def answer(question, **kwargs):
+    """Collects answer_stream() into one string."""
+    return "".join([token async for token in answer_stream(question, **kwargs)])
+
+
+async def _print_answer(question, args):
+    timings = {}
+    async for token in answer_stream(question, top_k=args.top_k, max_records=args.max_records,
+                                     semantic=not args.no_semantic, timings=timings):
+        print(token, end="", flush=True)
+    print()
+    print(f"\n[{timings.get('source')}] " + ", ".join(
+        f"{stage} {seconds:.2f}s" for stage, seconds in timings.items() if isinstance(seconds, float)
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a question with a streamed response")
+    parser.add_argument("question", nargs="?", default=None)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--max-records", type=int, default=max_result_rows())
+    parser.add_argument("--no-semantic", action="store_true", help="Skip the semantic-retrieval prefetch")
+    args = parser.parse_args()
+
+    warm_up()
+    question = args.question or input("Enter your query: ")
+    try:
+        asyncio.run(_print_answer(question, args))
+    except KeyboardInterrupt:
+        print("\nCancelled")
+
+
+if __name__ == "__main__":
+    main()
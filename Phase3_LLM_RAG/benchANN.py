@@ -0,0 +1,128 @@
+"""
+Recall@k and latency of the approximate indexes against exact search.
+
+Queries are stored plot vectors with Gaussian noise added, so every query has
+a meaningful neighbourhood without any embedding API calls. Each IVF nprobe
+and HNSW ef setting is measured on the same queries against the exact top-k.
+Use --synthetic to benchmark a generated clustered corpus of any size instead
+of the real store.
+
+Usage:
+    python Phase3_LLM_RAG/benchANN.py --store movie_embeddings --queries 200 --top-k 10
+    python Phase3_LLM_RAG/benchANN.py --synthetic 1000000 --dim 256 --nprobe 4 8 16 32 --ef 32 64 128
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from ann_index import hnswlib, load_index
+from embedding_store import EmbeddingStore
+
+
+def synthetic_store(path, count, dim, clusters=256, seed=0):
+    """Fills a new store with `count` vectors drawn around `clusters` random centres."""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dim)).astype(np.float32)
+    store = EmbeddingStore.create(path, dim=dim)
+    for start in range(0, count, 100_000):
+        size = min(100_000, count - start)
+        vectors = centres[rng.integers(clusters, size=size)] + 0.5 * rng.standard_normal((size, dim)).astype(np.float32)
+        store.append(np.arange(start, start + size), [f"synthetic {i}" for i in range(start, start + size)], vectors)
+    return store
+
+
+def make_queries(store, count, noise=0.05, seed=1):
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(store), size=min(count, len(store)), replace=False)
+    base = np.asarray(store.vectors[np.sort(picks)], dtype=np.float32)
+    return base + noise * rng.standard_normal(base.shape).astype(np.float32)
+
+
+def measure(index, queries, top_k, truth=None, **query_params):
+    """Per-query latency percentiles and, when `truth` is given, mean recall@k."""
+    samples, recalls = [], []
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        positions, _ = index.search(query, top_k, **query_params)
+        samples.append((time.perf_counter() - start) * 1000)
+        if truth is not None:
+            recalls.append(len(set(positions.tolist()) & set(truth[i].tolist())) / len(truth[i]))
+    samples.sort()
+    result = {
+        "p50_ms": round(statistics.median(samples), 3),
+        "p99_ms": round(samples[int(0.99 * (len(samples) - 1))], 3),
+        "qps": round(len(samples) / (sum(samples) / 1000), 1),
+    }
+    if truth is not None:
+        result[f"recall@{top_k}"] = round(float(np.mean(recalls)), 4)
+    return result, samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ANN recall@k and latency against exact search")
+    parser.add_argument("--store", default="movie_embeddings", help="Embedding store directory")
+    parser.add_argument("--synthetic", type=int, default=None, help="Benchmark a generated corpus of this many vectors")
+    parser.add_argument("--dim", type=int, default=1536, help="Vector size for --synthetic")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=None, help="IVF lists (default ~4*sqrt(n))")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32, 64])
+    parser.add_argument("--M", type=int, default=16, help="HNSW links per node")
+    parser.add_argument("--ef-construction", type=int, default=200)
+    parser.add_argument("--ef", type=int, nargs="+", default=[16, 32, 64, 128, 256])
+    parser.add_argument("--output", default="bench_ann.json")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.synthetic:
+            start = time.perf_counter()
+            store = synthetic_store(os.path.join(tmp, "store"), args.synthetic, args.dim)
+            print(f"Generated {len(store)} synthetic vectors in {time.perf_counter() - start:.1f}s")
+        else:
+            store = EmbeddingStore(args.store)
+        queries = make_queries(store, args.queries)
+
+        exact = load_index(store, "exact")
+        truth = exact.search_batch(queries, args.top_k)[0]
+        exact_stats, _ = measure(exact, queries, args.top_k)
+        report = {"vectors": len(store), "dim": store.dim, "queries": len(queries), "top_k": args.top_k,
+                  "exact": exact_stats}
+
+        start = time.perf_counter()
+        ivf = load_index(store, "ivf", rebuild=True, nlist=args.nlist)
+        report["ivf"] = {"nlist": len(ivf.centroids), "build_seconds": round(time.perf_counter() - start, 2)}
+        for nprobe in args.nprobe:
+            report["ivf"][f"nprobe={nprobe}"] = measure(ivf, queries, args.top_k, truth, nprobe=nprobe)[0]
+
+        if hnswlib is not None:
+            start = time.perf_counter()
+            hnsw = load_index(store, "hnsw", rebuild=True, M=args.M, ef_construction=args.ef_construction)
+            report["hnsw"] = {"M": args.M, "ef_construction": args.ef_construction,
+                              "build_seconds": round(time.perf_counter() - start, 2)}
+            for ef in args.ef:
+                report["hnsw"][f"ef={ef}"] = measure(hnsw, queries, args.top_k, truth, ef=ef)[0]
+        else:
+            print("hnswlib not installed; skipping HNSW (pip install hnswlib)")
+
+    recall_key = f"recall@{args.top_k}"
+    print(f"\n{len(store)} vectors, {len(queries)} queries, top_k={args.top_k}")
+    print(f"{'setting':<24}{recall_key:>12}{'p50 (ms)':>12}{'p99 (ms)':>12}{'qps':>10}")
+    print(f"{'exact':<24}{1.0:>12}{exact_stats['p50_ms']:>12}{exact_stats['p99_ms']:>12}{exact_stats['qps']:>10}")
+    for kind in ("ivf", "hnsw"):
+        for setting, stats in report.get(kind, {}).items():
+            if isinstance(stats, dict):
+                print(f"{kind + ' ' + setting:<24}{stats[recall_key]:>12}{stats['p50_ms']:>12}"
+                      f"{stats['p99_ms']:>12}{stats['qps']:>10}")
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=4)
+    print(f"\nSaved results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,18 @@
-import pandas as pd
 import numpy as np
 import openai
 import os
+import sys
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 from rouge_score import rouge_scorer
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.dataset import load_movies
+
 # Load the cleaned wiki movie plot dataset
 def load_movie_data(file_path):
-    """Load the CSV file containing movie plots."""
-    df = pd.read_csv(file_path)
-    return df[['Title', 'Plot']]
+    """Load the title and plot columns of the movie dataset."""
+    return load_movies(['Title', 'Plot'], path=file_path)
 
 # Function to retrieve the original plot for a given movie title
 def get_original_plot(title, df):
@@ -74,7 +76,8 @@ if __name__ == "__main__":
     # Example movie title and LLM-generated plot
     movie_title = "Terrible Teddy, the Grizzly King"
     generated_plot = f"" # Add your generated plot here
-    csv_file_path = "/Users/jay/Desktop/The File/Learn/RAG/Recommender/wiki_movie_plots.csv"
+    # The cleaned dataset keeps the original Plot column (MOVIE_DATASET overrides the path)
+    csv_file_path = None
     comparison_results = compare_plots(movie_title, generated_plot, csv_file_path)
     
     print("Comparison Results:")
@@ -0,0 +1,179 @@
+"""
+Token-budgeted packing of Neo4j results into the synthesis prompt.
+
+A broad generated query (say, a thematic search over ACTS edges) can return
+thousands of rows. Interpolating their Python repr into the prompt makes it
+slow, costly, or longer than the model accepts. Before results reach the LLM
+they are:
+
+    limited     the executed query gets a LIMIT (see apply_limit), so the
+                server never sends more than the caller can use
+    deduped     identical rows are kept once
+    grouped     rows sharing their first column (usually the movie title)
+                are printed under one heading
+    ranked      groups and rows are ordered by word overlap with the question
+    packed      written as compact `a | b | c` lines until the token budget
+                is spent, followed by a note of how many rows were left out
+
+Tokens are counted with tiktoken when it is installed, otherwise estimated
+at ~4 characters per token.
+
+Configuration (environment):
+    CONTEXT_TOKEN_BUDGET    tokens of results per prompt (default: 3000)
+    MAX_RESULT_ROWS         LIMIT pushed into executed queries (default: 1000)
+"""
+import os
+import re
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.tokens import count_tokens
+
+DEFAULT_TOKEN_BUDGET = 3000
+DEFAULT_MAX_ROWS = 1000
+
+WORD = re.compile(r"\w+")
+_QUESTION_STOPWORDS = frozenset(
+    "the a an of in on for to by and or with which what who whom that this is are was were did do does "
+    "find list show suggest me all movies movie films film give about".split()
+)
+
+
+def token_budget():
+    return int(os.getenv("CONTEXT_TOKEN_BUDGET", DEFAULT_TOKEN_BUDGET))
+
+
+def max_result_rows():
+    return int(os.getenv("MAX_RESULT_ROWS", DEFAULT_MAX_ROWS))
+
+
+def apply_limit(cypher_query, limit, skip=0):
+    """Caps the final RETURN of `cypher_query` at `limit` rows (after `skip`), keeping any smaller LIMIT.
+
+    A smaller LIMIT already on the query bounds the page too: the rows past
+    `skip` are cut to what is left of it. Queries it cannot safely rewrite
+    (UNION, no trailing RETURN) are returned unchanged.
+    """
+    query = cypher_query.strip().rstrip(";").rstrip()
+    if re.search(r"\bUNION\b", query, re.IGNORECASE):
+        return cypher_query
+    returns = list(re.finditer(r"\bRETURN\b", query, re.IGNORECASE))
+    if not returns:
+        return cypher_query
+    # A RETURN inside a CALL { ... } subquery is not the final one: its block
+    # closes after it. Braces that open after it (map projections) are fine.
+    tail_start = returns[-1].start()
+    tail = query[tail_start:]
+    depth = 0
+    for char in tail:
+        depth += {"{": 1, "}": -1}.get(char, 0)
+        if depth < 0:
+            return cypher_query
+
+    existing = re.search(r"\bLIMIT\s+(\d+)\s*$", tail, re.IGNORECASE)
+    if existing:
+        if int(existing.group(1)) <= limit and not skip:
+            return query
+        limit = min(limit, max(0, int(existing.group(1)) - skip))
+        query = query[:tail_start + existing.start()].rstrip()
+    elif re.search(r"\b(?:LIMIT|SKIP)\b", tail, re.IGNORECASE):
+        return cypher_query  # parameterized or otherwise unusual paging; leave it alone
+    return f"{query}\n" + (f"SKIP {skip} " if skip else "") + f"LIMIT {limit}"
+
+
+def _format_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, (list, tuple, set)):
+        return ", ".join(_format_value(item) for item in value if item is not None)
+    if hasattr(value, "items") and not isinstance(value, str):
+        # Nodes, relationships and maps: their properties, not the driver repr
+        return "{" + ", ".join(f"{k}: {_format_value(v)}" for k, v in value.items()) + "}"
+    return str(value)
+
+
+def question_terms(question):
+    """Content words of a question (lowercased, no stopwords or very short words)."""
+    return {word for word in WORD.findall(question.lower()) if len(word) > 2 and word not in _QUESTION_STOPWORDS}
+
+
+def _relevance(text, terms):
+    words = set(WORD.findall(text.lower()))
+    return len(terms & words)
+
+
+def format_rows(rows):
+    """Formats and dedupes result rows, keeping first-seen order.
+
+    `rows` is consumed one row at a time, so it can be a Neo4j result being
+    streamed from the server; only the deduped strings are kept.
+    """
+    seen = set()
+    formatted = []
+    for row in rows:
+        values = tuple(_format_value(value) for value in row)
+        if values not in seen:
+            seen.add(values)
+            formatted.append(values)
+    return formatted
+
+
+def pack_context(question, rows, keys=None, budget=None, truncated=False):
+    """
+    Serializes result rows into a compact, relevance-ordered block that fits the token budget.
+
+    Args:
+        question (str): The user's question, used to rank rows.
+        rows (iterable): Result rows (lists of values, as execute_cypher_query returns them).
+        keys (list): Column names for the header line.
+        budget (int): Token budget (default: CONTEXT_TOKEN_BUDGET).
+        truncated (bool): The query itself was cut off by a pushed-down LIMIT.
+
+    Returns:
+        str: The packed results.
+    """
+    budget = budget or token_budget()
+    formatted = format_rows(rows)
+    if not formatted:
+        return "(no rows)"
+
+    # Group on the first column when it repeats, e.g. one heading per movie
+    groups = {}
+    grouped = len(formatted[0]) > 1 and len({values[0] for values in formatted}) < len(formatted)
+    for values in formatted:
+        groups.setdefault(values[0] if grouped else values, []).append(values[1:] if grouped else values)
+
+    terms = question_terms(question)
+    ranked = []
+    for order, (heading, members) in enumerate(groups.items()):
+        lines = [" | ".join(values) for values in members]
+        scores = [_relevance(line, terms) for line in lines]
+        heading_score = _relevance(heading, terms) if grouped else 0
+        members_ranked = [line for _, _, line in sorted(zip(scores, range(len(lines)), lines),
+                                                        key=lambda item: (-item[0], item[1]))]
+        ranked.append((-(heading_score + max(scores)), order, heading, members_ranked))
+    ranked.sort(key=lambda item: (item[0], item[1]))
+
+    header = " | ".join(keys) if keys else None
+    out = [header] if header else []
+    used = count_tokens(header) if header else 0
+    kept = 0
+    total = len(formatted)
+    for _, _, heading, lines in ranked:
+        block = [f"{heading}:"] + [f"  {line}" for line in lines] if grouped else lines
+        for i, line in enumerate(block):
+            cost = count_tokens(line) + 1
+            if used + cost > budget:
+                break
+            out.append(line)
+            used += cost
+            if not (grouped and i == 0):
+                kept += 1
+        else:
+            continue
+        break
+
+    omitted = total - kept
+    if omitted or truncated:
+        out.append(f"(+{omitted} more rows omitted" + (", query results were truncated" if truncated else "") + ")")
+    return "\n".join(out)
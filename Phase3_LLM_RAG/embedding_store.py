@@ -0,0 +1,214 @@
+"""
+Memory-mapped embedding store for semantic search.
+
+Vectors are L2-normalized once, at write time, and kept on disk as a raw
+row-major matrix. Opening a store is an mmap, and cosine similarity against
+every plot is a single matrix-vector product. A store directory contains:
+
+    meta.json     {"dim": 1536, "dtype": "float32", "model": "text-embedding-ada-002"}
+    vectors.bin   (n, dim) float32 or float16 matrix
+    row_ids.bin   int64 cleaned-CSV row id of each vector
+    rows.jsonl    {"row_id": ..., "title": ..., "plot_hash": ...} per vector, read only when needed
+"""
+import json
+import os
+import shutil
+import threading
+
+import numpy as np
+
+
+def normalize(vectors):
+    """Scales rows to unit length so a dot product equals cosine similarity."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def top_k_indices(scores, top_k):
+    """Indices of the `top_k` highest scores, best first, without sorting the whole array."""
+    top_k = min(top_k, scores.shape[-1])
+    if top_k <= 0:
+        return np.empty(scores.shape[:-1] + (0,), dtype=np.int64)
+    top = np.argpartition(-scores, top_k - 1, axis=-1)[..., :top_k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=-1), axis=-1)
+    return np.take_along_axis(top, order, axis=-1)
+
+
+class EmbeddingStore:
+    """Append-only, memory-mapped matrix of normalized embeddings keyed by CSV row id.
+
+    Usage:
+        store = EmbeddingStore.create("movie_embeddings", dim=1536)
+        store.append(row_ids, titles, vectors)
+        positions, scores = store.search(query_vector, top_k=5)
+        store.row_ids[positions]
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.dim = self.meta["dim"]
+        self.dtype = np.dtype(self.meta.get("dtype", "float32"))
+        self._rows = None
+        self._lock = threading.Lock()
+        self._repaired = False
+        self._open()
+
+    @classmethod
+    def create(cls, path, dim, dtype="float32", model=None):
+        """Creates an empty store (or opens the existing one at `path`)."""
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, "meta.json")
+        if not os.path.exists(meta_path):
+            with open(meta_path, "w") as f:
+                json.dump({"dim": dim, "dtype": np.dtype(dtype).name, "model": model}, f)
+            for name in ("vectors.bin", "row_ids.bin", "rows.jsonl"):
+                open(os.path.join(path, name), "ab").close()
+        return cls(path)
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _open(self):
+        """Maps the files; a partially written tail from an interrupted append is ignored."""
+        row_bytes = self.dim * self.dtype.itemsize
+        count = min(os.path.getsize(self._file("vectors.bin")) // row_bytes,
+                    os.path.getsize(self._file("row_ids.bin")) // 8)
+        if count:
+            self.vectors = np.memmap(self._file("vectors.bin"), dtype=self.dtype, mode="r", shape=(count, self.dim))
+            self.row_ids = np.memmap(self._file("row_ids.bin"), dtype=np.int64, mode="r", shape=(count,))
+        else:
+            self.vectors = np.empty((0, self.dim), dtype=self.dtype)
+            self.row_ids = np.empty((0,), dtype=np.int64)
+        # Reused by search() so single queries allocate nothing proportional to the corpus
+        self._scores = np.empty(count, dtype=np.float32) if self.dtype == np.float32 else None
+        self._rows = None
+        self._positions = None
+
+    def __len__(self):
+        return len(self.row_ids)
+
+    @property
+    def rows(self):
+        """Sidecar records ({"row_id", "title", ...}) aligned with the vectors, loaded on first use."""
+        if self._rows is None:
+            with open(self._file("rows.jsonl"), "r", encoding="utf-8") as f:
+                self._rows = [json.loads(line) for line in f][:len(self)]
+        return self._rows
+
+    @property
+    def titles(self):
+        return [row["title"] for row in self.rows]
+
+    def _repair(self):
+        """Cuts every file back to the last complete row so new appends stay aligned."""
+        count = len(self)
+        with open(self._file("vectors.bin"), "rb+") as f:
+            f.truncate(count * self.dim * self.dtype.itemsize)
+        with open(self._file("row_ids.bin"), "rb+") as f:
+            f.truncate(count * 8)
+        with open(self._file("rows.jsonl"), "rb+") as f:
+            offset = 0
+            for _ in range(count):
+                offset += len(f.readline())
+            f.truncate(offset)
+        self._repaired = True
+
+    def append(self, row_ids, titles, vectors, extra=None):
+        """Normalizes and appends vectors, then makes them durable before they become visible.
+
+        `extra` is an optional list of dicts merged into each row's sidecar record.
+        """
+        vectors = normalize(vectors).astype(self.dtype)
+        if vectors.ndim != 2 or vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected vectors of shape (n, {self.dim}), got {vectors.shape}")
+        row_ids = np.asarray(row_ids, dtype=np.int64)
+        extra = extra or [{}] * len(row_ids)
+        if not self._repaired:
+            self._repair()
+
+        # Sidecar first, matrix and ids last: a crash leaves at most an ignored tail
+        with open(self._file("rows.jsonl"), "a", encoding="utf-8") as f:
+            for row_id, title, fields in zip(row_ids.tolist(), titles, extra):
+                f.write(json.dumps({"row_id": row_id, "title": title, **fields}, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        for name, data in (("vectors.bin", vectors), ("row_ids.bin", row_ids)):
+            with open(self._file(name), "ab") as f:
+                f.write(np.ascontiguousarray(data).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+        self._open()
+
+    def compact(self):
+        """Drops vectors superseded by a later append for the same row id.
+
+        The compacted copy is built next to the store and swapped in with
+        directory renames, so a crash leaves either the old or the new store.
+        """
+        row_ids = np.asarray(self.row_ids)
+        # Position of the last occurrence of every row id, in store order
+        _, last = np.unique(row_ids[::-1], return_index=True)
+        keep = np.sort(len(row_ids) - 1 - last)
+        if len(keep) == len(row_ids):
+            return 0
+
+        tmp_path = self.path.rstrip(os.sep) + ".compact"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        compacted = EmbeddingStore.create(tmp_path, self.dim, self.dtype.name, self.meta.get("model"))
+        rows = self.rows
+        with open(compacted._file("rows.jsonl"), "w", encoding="utf-8") as f:
+            for position in keep.tolist():
+                f.write(json.dumps(rows[position], ensure_ascii=False) + "\n")
+        for name, data in (("vectors.bin", self.vectors[keep]), ("row_ids.bin", row_ids[keep])):
+            with open(compacted._file(name), "wb") as f:
+                f.write(np.ascontiguousarray(data).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+        old_path = self.path.rstrip(os.sep) + ".old"
+        shutil.rmtree(old_path, ignore_errors=True)
+        os.replace(self.path, old_path)
+        os.replace(tmp_path, self.path)
+        shutil.rmtree(old_path)
+        self._open()
+        return len(row_ids) - len(keep)
+
+    def _scores_for(self, query):
+        query = normalize(query)
+        if self._scores is not None:
+            return np.matmul(self.vectors, query, out=self._scores)
+        return np.matmul(self.vectors, query.astype(self.dtype)).astype(np.float32)
+
+    def search(self, query, top_k=5):
+        """Top-k store positions and cosine scores for one query vector."""
+        with self._lock:
+            scores = self._scores_for(query)
+            positions = top_k_indices(scores, top_k)
+            return positions, scores[positions].copy()
+
+    def positions_for(self, row_ids):
+        """Store positions of the given row ids; ids that were never embedded are skipped."""
+        if self._positions is None:
+            # Later appends supersede earlier ones, matching compact()
+            self._positions = {int(row_id): position for position, row_id in enumerate(self.row_ids)}
+        return np.array([self._positions[row_id] for row_id in map(int, row_ids) if row_id in self._positions],
+                        dtype=np.int64)
+
+    def search_within(self, query, positions, top_k=5):
+        """Top-k among the given store positions only, e.g. movies a graph query already selected."""
+        positions = np.asarray(positions, dtype=np.int64)
+        query = normalize(query).astype(self.dtype)
+        scores = np.matmul(self.vectors[positions], query).astype(np.float32, copy=False)
+        best = top_k_indices(scores, top_k)
+        return positions[best], scores[best]
+
+    def search_batch(self, queries, top_k=5):
+        """Top-k positions and scores for many query vectors with one matrix product."""
+        queries = normalize(queries)
+        scores = np.matmul(queries.astype(self.dtype), self.vectors.T).astype(np.float32, copy=False)
+        positions = top_k_indices(scores, top_k)
+        return positions, np.take_along_axis(scores, positions, axis=1)
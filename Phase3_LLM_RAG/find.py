@@ -1,13 +1,17 @@
-import pandas as pd
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.dataset import load_movies
 
 def find_short_plots(csv_file, max_tokens=512, num_movies=20):
     
-    # Load the CSV file
-    df = pd.read_csv(csv_file)
-
-    # Check if the required column exists
-    if 'Cleaned_Plot' not in df.columns:
-        raise ValueError("Column 'Cleaned_Plot' not found in the CSV file.")
+    # Load only the title and cleaned plot columns
+    try:
+        df = load_movies(['Title', 'Cleaned_Plot'], path=csv_file)
+    except (KeyError, ValueError) as e:
+        raise ValueError(f"Column 'Cleaned_Plot' not found in the CSV file: {e}")
 
     # Filter plots with token count <= max_tokens
     short_plots = df[df['Cleaned_Plot'].apply(lambda x: len(str(x).split()) <= max_tokens)]
@@ -24,11 +28,20 @@ def find_short_plots(csv_file, max_tokens=512, num_movies=20):
     
     return selected_movies
 
-# Run the function with your file
-csv_file_path = "/Users/jay/Desktop/The File/Learn/RAG/Recommender/cleaned_wiki_movie_plots.csv"  # Update with the correct path if needed
-short_movies = find_short_plots(csv_file_path)
+def main():
+    parser = argparse.ArgumentParser(description="List movies whose cleaned plot is short enough for a single prompt")
+    parser.add_argument("--csv", default=None, help="Cleaned dataset (default: MOVIE_DATASET or cleaned_wiki_movie_plots.csv)")
+    parser.add_argument("--max-tokens", type=int, default=512)
+    parser.add_argument("--num-movies", type=int, default=20)
+    parser.add_argument("--output", default="short_movie_plots.csv")
+    args = parser.parse_args()
+
+    short_movies = find_short_plots(args.csv, args.max_tokens, args.num_movies)
+
+    # Save the results to a new CSV
+    if not short_movies.empty:
+        short_movies.to_csv(args.output, index=False)
+        print(f"\nShort movie plots saved to '{args.output}'.")
 
-# Save the results to a new CSV
-if not short_movies.empty:
-    short_movies.to_csv("short_movie_plots.csv", index=False)
-    print("\nShort movie plots saved to 'short_movie_plots.csv'.")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""
+Embeddings stored in the graph, searched through Neo4j's native vector indexes.
+
+The embedding store (movie_embeddings/) lives outside the graph. A
+graph-constrained similarity question ("war movies like this plot, 1940s
+only") therefore needs a vector search in Python, then a Cypher round trip
+with the hits as candidates. This module writes the vectors onto the nodes
+instead:
+
+    Summary.embedding   the movie's plot vector, copied from the embedding store
+    Entity.embedding    an embedding of the entity name, generated here
+
+Both are written with bulkLoad's batched, partitioned passes, and each gets a
+vector index (summary_embedding, entity_embedding). A search is then one
+Cypher query: db.index.vector.queryNodes followed by graph filters on genre,
+year or director. queryNodes filters after the ANN lookup, so the queries ask
+it for `oversample` times more nodes than they return.
+
+Loading only writes nodes that have no embedding yet, so it can be re-run
+after a sync. Needs Neo4j 5.13 or later, for example a local container:
+
+    docker run -p 7474:7474 -p 7687:7687 -e NEO4J_AUTH=neo4j/password neo4j:5
+
+Usage:
+    python Phase3_LLM_RAG/graph_vectors.py load [--entities] [--refresh]
+    python Phase3_LLM_RAG/graph_vectors.py search "a soldier returns home after the war" --genre war
+    python Phase3_LLM_RAG/graph_vectors.py bench --queries 200 --genre drama
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+import Semantic_retrieval
+from benchANN import make_queries
+from embedding_store import EmbeddingStore
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Phase2_GraphGen", "new"))
+from bulkLoad import write_embeddings
+from common.graph_schema import ensure_vector_indexes
+from common.neo4j_pool import read_session
+
+# Shared by the single-query path and the store + Cypher path, so both answer the same question
+FILTERS = """
+WHERE ($genre IS NULL OR EXISTS { MATCH (m)-[:BELONGS_TO_GENRE]->(:Genre {name: $genre}) })
+  AND ($year_from IS NULL OR m.year >= $year_from)
+  AND ($year_to IS NULL OR m.year <= $year_to)
+  AND ($director IS NULL OR EXISTS { MATCH (m)-[:HAS_DIRECTOR]->(:Director {name: $director}) })
+"""
+
+SIMILAR_PLOTS_QUERY = """
+CALL db.index.vector.queryNodes('summary_embedding', $candidates, $embedding)
+YIELD node AS s, score
+MATCH (m:Movie)-[:HAS_SUMMARY]->(s)
+""" + FILTERS + """
+RETURN m.title AS title, m.year AS year, score
+ORDER BY score DESC
+LIMIT $top_k
+"""
+
+SIMILAR_ENTITIES_QUERY = """
+CALL db.index.vector.queryNodes('entity_embedding', $candidates, $embedding)
+YIELD node AS e, score
+MATCH (m:Movie)-[:HAS_SUMMARY]->(:Summary)-[:CONTAINS]->(e)
+""" + FILTERS + """
+WITH m, max(score) AS score, collect(DISTINCT e.name)[..5] AS entities
+RETURN m.title AS title, m.year AS year, score, entities
+ORDER BY score DESC
+LIMIT $top_k
+"""
+
+# The two-step path: vector hits from the embedding store, filtered by the graph
+CANDIDATE_FILTER_QUERY = """
+UNWIND $hits AS hit
+MATCH (m:Movie {title: hit.title, year: hit.year})-[:HAS_SUMMARY]->(:Summary)
+""" + FILTERS + """
+RETURN m.title AS title, m.year AS year, hit.score AS score
+ORDER BY score DESC
+LIMIT $top_k
+"""
+
+MISSING_QUERIES = {
+    "Summary": "MATCH (s:Summary) WHERE s.embedding IS NULL RETURN s.title AS key",
+    "Entity": "MATCH (e:Entity) WHERE e.embedding IS NULL RETURN e.name AS key",
+}
+ALL_QUERIES = {
+    "Summary": "MATCH (s:Summary) RETURN s.title AS key",
+    "Entity": "MATCH (e:Entity) RETURN e.name AS key",
+}
+
+
+def _keys(label, refresh=False):
+    with read_session() as session:
+        return [record["key"] for record in session.run((ALL_QUERIES if refresh else MISSING_QUERIES)[label])]
+
+
+def load_plot_embeddings(store, refresh=False, batch_size=200, workers=4):
+    """Copies plot vectors from the embedding store onto Summary nodes that lack one."""
+    wanted = set(_keys("Summary", refresh))
+    # Later rows supersede earlier ones for a title, as in the store itself
+    positions = {row["title"]: position for position, row in enumerate(store.rows) if row["title"] in wanted}
+    print(f"{len(wanted)} summaries without an embedding, {len(positions)} of them in the store")
+    items = [{"title": title, "position": position} for title, position in positions.items()]
+
+    def prepare(batch):
+        vectors = np.asarray(store.vectors[[item["position"] for item in batch]], dtype=np.float32)
+        return [{"title": item["title"], "embedding": vector.tolist()} for item, vector in zip(batch, vectors)]
+
+    return write_embeddings("Summary", items, prepare, batch_size=batch_size, workers=workers)[0]
+
+
+def load_entity_embeddings(refresh=False, batch_size=200, workers=4):
+    """Embeds the names of Entity nodes that lack an embedding and writes them back."""
+    names = _keys("Entity", refresh)
+    print(f"{len(names)} entities without an embedding")
+    client = Semantic_retrieval.get_client().with_options(max_retries=8)
+    written = 0
+    for batch in Semantic_retrieval.pack_requests((name, name, name) for name in names):
+        response = client.embeddings.create(input=[text for _, _, text in batch],
+                                            model=Semantic_retrieval.EMBEDDING_MODEL)
+        rows = [{"name": name, "embedding": item.embedding} for (name, _, _), item in zip(batch, response.data)]
+        written += write_embeddings("Entity", rows, None, batch_size=batch_size, workers=workers)[0]
+    return written
+
+
+def _params(embedding, top_k, oversample, genre, year_from, year_to, director):
+    return {
+        "embedding": np.asarray(embedding, dtype=np.float32).tolist(),
+        "candidates": top_k * oversample,
+        "top_k": top_k,
+        "genre": genre,
+        "year_from": year_from,
+        "year_to": year_to,
+        "director": director,
+    }
+
+
+def similar_movies(embedding, top_k=10, genre=None, year_from=None, year_to=None, director=None, oversample=10):
+    """Movies whose plot vector is closest to `embedding`, filtered in the same query. Returns dicts."""
+    with read_session() as session:
+        result = session.run(SIMILAR_PLOTS_QUERY,
+                             _params(embedding, top_k, oversample, genre, year_from, year_to, director))
+        return [record.data() for record in result]
+
+
+def movies_by_entities(embedding, top_k=10, genre=None, year_from=None, year_to=None, director=None, oversample=10):
+    """Movies containing the entities closest to `embedding`, with the matched entity names."""
+    with read_session() as session:
+        result = session.run(SIMILAR_ENTITIES_QUERY,
+                             _params(embedding, top_k, oversample, genre, year_from, year_to, director))
+        return [record.data() for record in result]
+
+
+def similar_movies_via_store(embedding, embeddings, top_k=10, genre=None, year_from=None, year_to=None,
+                             director=None, oversample=10):
+    """The same search through the embedding store: vector hits in Python, then a Cypher filter round trip."""
+    positions, scores = embeddings.search(np.asarray(embedding, dtype=np.float32), top_k * oversample)
+    # Matched on (title, year) like hybrid_retrieval: a title alone also matches its remakes
+    hits = Semantic_retrieval.get_movie_df().loc[embeddings.row_ids[positions], ["Title", "Release Year"]]
+    params = _params(embedding, top_k, oversample, genre, year_from, year_to, director)
+    params["hits"] = [{"title": title, "year": int(year), "score": float(score)}
+                      for (title, year), score in zip(hits.itertuples(index=False), scores)]
+    with read_session() as session:
+        return [record.data() for record in session.run(CANDIDATE_FILTER_QUERY, params)]
+
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    return {
+        "p50_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[int(0.95 * (len(samples) - 1))], 3),
+        "p99_ms": round(samples[int(0.99 * (len(samples) - 1))], 3),
+    }
+
+
+def bench(store_dir, queries=200, top_k=10, oversample=10, filters=None, output="bench_graph_vectors.json"):
+    """Latency of the single native-index query against the store + Cypher path, and how often they agree."""
+    filters = filters or {}
+    store = EmbeddingStore(store_dir)
+    embeddings = Semantic_retrieval.load_embeddings(store_dir)
+    vectors = make_queries(store, queries)
+    # Warm both paths (driver pool, movie metadata, page cache) before timing
+    similar_movies(vectors[0], top_k, oversample=oversample, **filters)
+    similar_movies_via_store(vectors[0], embeddings, top_k, oversample=oversample, **filters)
+
+    native, two_step, overlap = [], [], []
+    for vector in vectors:
+        start = time.perf_counter()
+        graph_hits = similar_movies(vector, top_k, oversample=oversample, **filters)
+        native.append((time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        store_hits = similar_movies_via_store(vector, embeddings, top_k, oversample=oversample, **filters)
+        two_step.append((time.perf_counter() - start) * 1000)
+        expected = {(hit["title"], hit["year"]) for hit in store_hits}
+        if expected:
+            overlap.append(len(expected & {(hit["title"], hit["year"]) for hit in graph_hits}) / len(expected))
+
+    report = {
+        "vectors": len(store), "queries": len(vectors), "top_k": top_k, "oversample": oversample,
+        "filters": filters,
+        "native_index": _percentiles(native),
+        "store_then_cypher": _percentiles(two_step),
+        f"overlap@{top_k}": round(float(np.mean(overlap)), 4) if overlap else None,
+    }
+    print(json.dumps(report, indent=4))
+    with open(output, "w") as f:
+        json.dump(report, f, indent=4)
+    print(f"Saved results to {output}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Native Neo4j vector indexes over plot and entity embeddings")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    load = sub.add_parser("load", help="Write embeddings onto Summary/Entity nodes and create the vector indexes")
+    load.add_argument("--store", default=Semantic_retrieval.STORE_DIR)
+    load.add_argument("--entities", action="store_true", help="Also embed and write entity names")
+    load.add_argument("--refresh", action="store_true", help="Rewrite embeddings that are already in the graph")
+    load.add_argument("--batch-size", type=int, default=200)
+    load.add_argument("--workers", type=int, default=4)
+
+    filter_args = argparse.ArgumentParser(add_help=False)
+    filter_args.add_argument("--top-k", type=int, default=10)
+    filter_args.add_argument("--oversample", type=int, default=10)
+    filter_args.add_argument("--genre", default=None, help="Lowercase genre name")
+    filter_args.add_argument("--year-from", type=int, default=None)
+    filter_args.add_argument("--year-to", type=int, default=None)
+    filter_args.add_argument("--director", default=None)
+
+    search = sub.add_parser("search", parents=[filter_args], help="Search the graph by plot or entity similarity")
+    search.add_argument("query")
+    search.add_argument("--entities", action="store_true", help="Match entity embeddings instead of plots")
+
+    benchmark = sub.add_parser("bench", parents=[filter_args],
+                               help="Compare the native index against the embedding store + Cypher path")
+    benchmark.add_argument("--store", default=Semantic_retrieval.STORE_DIR)
+    benchmark.add_argument("--queries", type=int, default=200)
+    benchmark.add_argument("--output", default="bench_graph_vectors.json")
+    args = parser.parse_args()
+
+    if args.command == "load":
+        store = EmbeddingStore(args.store)
+        start = time.perf_counter()
+        written = load_plot_embeddings(store, args.refresh, args.batch_size, args.workers)
+        if args.entities:
+            written += load_entity_embeddings(args.refresh, args.batch_size, args.workers)
+        failed = ensure_vector_indexes(store.dim)
+        print(f"Wrote {written} embeddings in {time.perf_counter() - start:.1f}s"
+              + (f"; could not create {', '.join(failed)}" if failed else ""))
+        return
+
+    filters = {"genre": args.genre, "year_from": args.year_from, "year_to": args.year_to, "director": args.director}
+    if args.command == "bench":
+        bench(args.store, args.queries, args.top_k, args.oversample, filters, args.output)
+        return
+
+    embedding = Semantic_retrieval.embed_queries([args.query])[0]
+    search_fn = movies_by_entities if args.entities else similar_movies
+    start = time.perf_counter()
+    hits = search_fn(embedding, args.top_k, oversample=args.oversample, **filters)
+    elapsed = (time.perf_counter() - start) * 1000
+    for i, hit in enumerate(hits, start=1):
+        extra = f"  ({', '.join(hit['entities'])})" if "entities" in hit else ""
+        print(f"{i:>3}. {hit['title']} ({hit['year']})  {hit['score']:.4f}{extra}")
+    print(f"\n{len(hits)} movies in {elapsed:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
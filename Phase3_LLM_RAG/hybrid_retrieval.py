@@ -0,0 +1,252 @@
+"""
+Hybrid retrieval: Neo4j traversal and embedding search fused for one question.
+
+QueryConversion only walks the graph and Semantic_retrieval only ranks plot
+embeddings. This engine routes each question to the right one, or to both:
+
+    graph    structured shapes the query templates recognise (a director's
+             movies, directors with more than N movies in a year). Counting
+             and exact filters are graph work, and a top-k vector search
+             cannot answer them, so only the graph runs.
+    hybrid   everything else. The graph query (a template or the LLM's
+             Cypher) and the vector search run in parallel. Then each path
+             filters the other:
+               - vector hits go into Cypher as a $candidates list, and the
+                 graph scores them by the summary entities and genres that
+                 match the question
+               - graph hits are re-ranked by similarity to the question,
+                 scoring only their own vectors
+             The four rankings are fused with reciprocal-rank fusion.
+
+Neither path scans the whole corpus. Cypher runs with a pushed-down LIMIT,
+candidates are looked up on the (title, year) constraint, and the vector
+search goes through the configured index (SEMANTIC_INDEX).
+
+Usage:
+    python Phase3_LLM_RAG/hybrid_retrieval.py "Suggest movies which has an Irish man or Irish based theme"
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import QueryConversion
+import Semantic_retrieval
+from context_packing import question_terms
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.neo4j_pool import read_session
+
+# Damping constant from Cormack et al., "Reciprocal Rank Fusion outperforms Condorcet and individual
+# Rank Learning Methods" (2009); it keeps one list's top hit from drowning out agreement between lists
+RRF_K = 60
+
+# Templates whose answers only the graph can give
+GRAPH_ONLY_TEMPLATES = frozenset({"movies_by_director", "director_year", "busy_directors"})
+
+CANDIDATE_QUERY = """
+UNWIND $candidates AS c
+MATCH (m:Movie {title: c.title, year: c.year})
+OPTIONAL MATCH (m)-[:HAS_SUMMARY]->(:Summary)-[:CONTAINS]->(e:Entity)
+WHERE any(term IN $terms WHERE toLower(e.name) CONTAINS term)
+OPTIONAL MATCH (m)-[:BELONGS_TO_GENRE]->(g:Genre)
+WHERE g.name IN $terms
+WITH m, count(DISTINCT e) + count(DISTINCT g) AS evidence
+WHERE evidence > 0
+RETURN m.title AS title, m.year AS year, evidence
+ORDER BY evidence DESC
+"""
+
+_movie_lookup = None
+
+
+def movie_lookup():
+    """(title, year) -> row id and title -> (title, year) over the movie dataset, built once per process."""
+    global _movie_lookup
+    if _movie_lookup is None:
+        movie_df = Semantic_retrieval.get_movie_df()
+        by_key, by_title = {}, {}
+        for row_id, title, year in zip(movie_df.index.tolist(), movie_df["Title"].tolist(),
+                                       movie_df["Release Year"].tolist()):
+            by_key[(title, year)] = row_id
+            by_title.setdefault(title, (title, year))
+        _movie_lookup = by_key, by_title
+    return _movie_lookup
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """
+    Fuses ranked lists: each key scores the sum of 1 / (k + rank) over the lists it appears in.
+
+    Args:
+        rankings (dict): List name -> keys, best first.
+        k (int): Damping constant.
+
+    Returns:
+        list: (key, score, names of the lists it appeared in), best first.
+    """
+    scores, sources = {}, {}
+    for name, keys in rankings.items():
+        for rank, key in enumerate(keys, start=1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            sources.setdefault(key, []).append(name)
+    return [(key, score, sources[key]) for key, score in sorted(scores.items(), key=lambda item: -item[1])]
+
+
+def graph_movies(keys, rows):
+    """(title, year) of each distinct movie in graph result rows, in order; empty when the rows are not movies."""
+    columns = [key.lower().split(".")[-1] for key in keys or []]
+    if "title" not in columns:
+        return []
+    title_at = columns.index("title")
+    year_at = columns.index("year") if "year" in columns else None
+    _, by_title = movie_lookup()
+
+    movies, seen = [], set()
+    for row in rows:
+        title = row[title_at]
+        movie = (title, row[year_at]) if year_at is not None else by_title.get(title, (title, None))
+        if movie not in seen:
+            seen.add(movie)
+            movies.append(movie)
+    return movies
+
+
+def graph_search(question, matched=None, max_rows=None):
+    """Resolves the question to Cypher (the given template match, else the LLM) and runs it."""
+    if matched is not None:
+        source, cypher_query, params = matched
+    else:
+        cypher_query, params, source = QueryConversion.get_cypher_query(question), {}, "llm"
+        library = QueryConversion.get_template_library()
+        if library is not None:
+            QueryConversion.learn_template(library, question, cypher_query)
+    keys, rows, truncated = QueryConversion.run_cypher(cypher_query, params, max_rows)
+    return {"source": source, "cypher": cypher_query, "params": params,
+            "keys": keys, "rows": rows, "truncated": truncated}
+
+
+def vector_search(question, embeddings, top_n):
+    """Embeds the question and returns (query vector, row ids, scores) of its `top_n` nearest plots."""
+    query = Semantic_retrieval.embed_queries([question])[0]
+    positions, scores = embeddings.search(query, top_n)
+    return query, embeddings.row_ids[positions], scores
+
+
+def candidate_evidence(question, candidates):
+    """Vector candidates ((title, year) pairs) that the graph links to the question's terms, best first."""
+    terms = sorted(question_terms(question))
+    if not candidates or not terms:
+        return []
+    with read_session() as session:
+        result = session.run(CANDIDATE_QUERY, {
+            "candidates": [{"title": title, "year": year} for title, year in candidates],
+            "terms": terms,
+        })
+        return [(record["title"], record["year"]) for record in result]
+
+
+def rerank_by_similarity(query, movies, embeddings):
+    """Graph hits ordered by plot similarity to the query, scoring only their own vectors."""
+    by_key, _ = movie_lookup()
+    store = getattr(embeddings, "store", embeddings)
+    positions = store.positions_for([by_key[movie] for movie in movies if movie in by_key])
+    if not len(positions):
+        return []
+    positions, _ = store.search_within(query, positions, len(positions))
+    movie_df = Semantic_retrieval.get_movie_df()
+    hits = movie_df.loc[store.row_ids[positions]]
+    return list(zip(hits["Title"].tolist(), hits["Release Year"].tolist()))
+
+
+def retrieve(question, top_k=10, candidates=50, max_rows=None, embeddings=None, timings=None):
+    """
+    Retrieves movies for `question` from the graph, the embeddings, or both.
+
+    Args:
+        question (str): The natural language question.
+        top_k (int): Fused movies to return.
+        candidates (int): Vector hits passed to the graph as candidates.
+        max_rows (int): LIMIT pushed into the graph query (default: MAX_RESULT_ROWS).
+        embeddings (EmbeddingStore or ANN index): Defaults to Semantic_retrieval.get_embeddings(), loaded once per process.
+        timings (dict): Filled with per-stage seconds since the start.
+
+    Returns:
+        dict: route ("graph" or "hybrid"), source, cypher, params, keys, rows and
+        truncated from the graph query, and movies, a list of
+        {"title", "year", "score", "sources"} dicts, best first.
+    """
+    timings = {} if timings is None else timings
+    start = time.perf_counter()
+    library = QueryConversion.get_template_library()
+    matched = library.match(question) if library is not None else None
+
+    if matched is not None and matched[0] in GRAPH_ONLY_TEMPLATES:
+        graph = graph_search(question, matched, max_rows)
+        timings["graph"] = time.perf_counter() - start
+        movies = [{"title": title, "year": year, "score": None, "sources": ["graph"]}
+                  for title, year in graph_movies(graph["keys"], graph["rows"])]
+        return {"route": "graph", **graph, "movies": movies}
+
+    embeddings = embeddings if embeddings is not None else Semantic_retrieval.get_embeddings()
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        graph_future = pool.submit(graph_search, question, matched, max_rows)
+        vector_future = pool.submit(vector_search, question, embeddings, candidates)
+        query, row_ids, _ = vector_future.result()
+        timings["vector"] = time.perf_counter() - start
+
+        movie_df = Semantic_retrieval.get_movie_df()
+        hits = movie_df.loc[row_ids]
+        vector_hits = list(zip(hits["Title"].tolist(), hits["Release Year"].tolist()))
+        # The candidate filter only needs the vector hits, so it overlaps with the graph query
+        evidence_future = pool.submit(candidate_evidence, question, vector_hits)
+
+        try:
+            graph = graph_future.result()
+        except Exception as e:
+            print(f"Graph search failed, using vector hits only: {e}")
+            graph = {"source": None, "cypher": None, "params": {}, "keys": None, "rows": [], "truncated": False}
+        timings["graph"] = time.perf_counter() - start
+        evidence = evidence_future.result()
+        timings["candidates"] = time.perf_counter() - start
+
+    graph_hits = graph_movies(graph["keys"], graph["rows"])
+    fused = reciprocal_rank_fusion({
+        "graph": graph_hits,
+        "vector": vector_hits,
+        "graph+vector": rerank_by_similarity(query, graph_hits, embeddings),
+        "vector+graph": evidence,
+    })
+    timings["fused"] = time.perf_counter() - start
+
+    movies = [{"title": title, "year": year, "score": round(score, 4), "sources": sources}
+              for (title, year), score, sources in fused[:top_k]]
+    return {"route": "hybrid", **graph, "movies": movies}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrieve movies for a question from the graph and the embeddings")
+    parser.add_argument("question", nargs="?", default=None)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--candidates", type=int, default=50, help="Vector hits passed to the graph as candidates")
+    args = parser.parse_args()
+
+    question = args.question or input("Enter your query: ")
+    timings = {}
+    result = retrieve(question, top_k=args.top_k, candidates=args.candidates, timings=timings)
+
+    print(f"\nRoute: {result['route']} (graph query from {result['source']})")
+    if result["cypher"]:
+        print(f"Cypher:\n{result['cypher']}")
+    if result["movies"]:
+        for i, movie in enumerate(result["movies"], start=1):
+            score = f"{movie['score']:.4f}" if movie["score"] is not None else "-"
+            print(f"{i:>3}. {movie['title']} ({movie['year']})  {score}  [{', '.join(movie['sources'])}]")
+    else:
+        print(f"{len(result['rows'])} rows: {result['rows'][:10]}")
+    print("\n" + ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in timings.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+"""
+Parameterized Cypher templates for common question shapes.
+
+A question is first matched against the built-in templates, whose slot
+patterns cover the shapes QueryConversion.main lists: movies by director,
+director + year, directors with more than N movies in a year, top N by
+genre, similar movies and movie summaries. A match yields pre-validated
+Cypher plus parameters with no LLM round trip. Because the query text
+never changes, Neo4j also reuses its cached plan.
+
+Questions that match nothing go to the LLM. Its Cypher is then learned:
+literals that also appear in the question become $p0, $p1, ... parameters,
+the question becomes a pattern with a slot at each of those values, and the
+pair is saved once EXPLAIN accepts the query. The next question of the same
+shape with different values skips the LLM too.
+
+Configuration (environment):
+    QUERY_TEMPLATES_PATH    learned templates file (default: query_templates.json)
+    QUERY_TEMPLATES_DISABLE set to 1 to always ask the LLM
+"""
+import json
+import os
+import re
+import threading
+
+_NUMBER_WORDS = {"one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8,
+                 "nine": 9, "ten": 10, "twenty": 20}
+
+NUMBER = r"(?P<{name}>\d+|" + "|".join(_NUMBER_WORDS) + r")"
+YEAR = r"(?P<year>\d{4})"
+TEXT = r"(?P<{name}>.+?)"
+
+
+def normalize_question(question):
+    """Lowercases, collapses whitespace and drops trailing punctuation."""
+    return re.sub(r"\s+", " ", question.strip().lower()).rstrip(" .?!")
+
+
+def _to_int(value):
+    return int(value) if value.isdigit() else _NUMBER_WORDS[value]
+
+
+class Template:
+    """A parameterized Cypher query and the question patterns that fill its slots."""
+
+    def __init__(self, name, cypher, patterns, slots=None, defaults=None):
+        self.name = name
+        self.cypher = cypher.strip()
+        self.patterns = [re.compile(pattern) for pattern in patterns]
+        self.slots = slots or {}
+        self.defaults = defaults or {}
+
+    def match(self, question, original):
+        """Parameters for `question` (normalized) if a pattern fits, else None.
+
+        Slots marked "text" take their value from the original question so the
+        stored capitalization of names and titles is kept.
+        """
+        for pattern in self.patterns:
+            found = pattern.fullmatch(question)
+            if not found:
+                continue
+            params = dict(self.defaults)
+            for name, value in found.groupdict().items():
+                if value is None:
+                    continue
+                kind = self.slots.get(name, "text")
+                if kind == "int":
+                    params[name] = _to_int(value)
+                elif kind == "lower":
+                    params[name] = value
+                else:
+                    start, end = found.span(name)
+                    params[name] = _original_span(original, start, end)
+            return params
+        return None
+
+
+def _original_span(original, start, end):
+    """Maps a span of the normalized question back onto the original text (case preserved)."""
+    collapsed = re.sub(r"\s+", " ", original.strip())
+    return collapsed[start:end].strip()
+
+
+BUILTIN_TEMPLATES = [
+    Template(
+        "director_year",
+        """
+        MATCH (m:Movie {year: $year})-[:HAS_DIRECTOR]->(d:Director {name: $director})
+        RETURN m.title AS title, m.year AS year, d.name AS director
+        """,
+        [
+            r"(?:find out |find |list |show )?(?:all )?(?:which )?movies? (?:did )?(?:the )?director "
+            + TEXT.format(name="director") + r" direct(?:ed)? in (?:the year )?" + YEAR,
+            r"(?:find |list |show )?(?:all )?movies? direct(?:or)?ed by " + TEXT.format(name="director")
+            + r" in (?:the year )?" + YEAR,
+        ],
+        slots={"year": "int"},
+    ),
+    Template(
+        "movies_by_director",
+        """
+        MATCH (m:Movie)-[:HAS_DIRECTOR]->(d:Director {name: $director})
+        RETURN m.title AS title, m.year AS year
+        ORDER BY m.year
+        """,
+        [
+            r"(?:find out |find |list |show )?(?:me )?(?:all )?(?:the )?movies? (?:directed|directored|made) by "
+            + TEXT.format(name="director"),
+            r"(?:which|what) movies? did (?:director )?" + TEXT.format(name="director") + r" direct",
+        ],
+    ),
+    Template(
+        "busy_directors",
+        """
+        MATCH (m:Movie {year: $year})-[:HAS_DIRECTOR]->(d:Director)
+        WITH d, count(m) AS movies
+        WHERE movies > $min_movies
+        RETURN d.name AS director, movies
+        ORDER BY movies DESC
+        """,
+        [
+            r"(?:list |find |show )?(?:all )?directors (?:which|who|that) (?:made|directed) more than "
+            + NUMBER.format(name="min_movies") + r" movies? in (?:the year )?" + YEAR,
+        ],
+        slots={"year": "int", "min_movies": "int"},
+    ),
+    Template(
+        "top_genre",
+        """
+        MATCH (m:Movie)-[:BELONGS_TO_GENRE]->(g:Genre {name: $genre})
+        OPTIONAL MATCH (m)-[:HAS_SUMMARY]->(:Summary)-[:CONTAINS]->(e:Entity)
+        WITH m, count(e) AS entities
+        RETURN m.title AS title, m.year AS year
+        ORDER BY entities DESC, m.year DESC
+        LIMIT $limit
+        """,
+        [
+            r"(?:suggest|recommend|list|show|find)(?: me)? (?:the )?(?:top |best )?" + NUMBER.format(name="limit")
+            + r" " + r"(?P<genre>[a-z][a-z \-]*?)" + r" (?:movies|films)",
+        ],
+        slots={"limit": "int", "genre": "lower"},
+    ),
+    Template(
+        "similar_movies",
+        """
+        MATCH (m:Movie {title: $title})-[:BELONGS_TO_GENRE]->(g:Genre)<-[:BELONGS_TO_GENRE]-(other:Movie)
+        WHERE other <> m
+        OPTIONAL MATCH (m)-[:HAS_SUMMARY]->(:Summary)-[:CONTAINS]->(e:Entity)
+                       <-[:CONTAINS]-(:Summary)<-[:HAS_SUMMARY]-(other)
+        WITH other, g, count(DISTINCT e) AS shared_entities
+        RETURN other.title AS title, other.year AS year, g.name AS genre, shared_entities
+        ORDER BY shared_entities DESC
+        LIMIT $limit
+        """,
+        [
+            r"(?:suggest|recommend|list|find|show)(?: me)? " + NUMBER.format(name="limit")
+            + r" (?:movies|films) similar to (?:the (?:movie|film) )?" + TEXT.format(name="title"),
+            r"(?:suggest|recommend|list|find|show)(?: me)? (?:movies|films) similar to (?:the (?:movie|film) )?"
+            + TEXT.format(name="title"),
+        ],
+        slots={"limit": "int"},
+        defaults={"limit": 5},
+    ),
+    Template(
+        "summarize_movie",
+        """
+        MATCH (m:Movie {title: $title})-[:HAS_SUMMARY]->(s:Summary)-[:CONTAINS]->(e1:Entity)
+        OPTIONAL MATCH (e1)-[r:ACTS]->(e2:Entity)<-[:CONTAINS]-(s)
+        RETURN m.title AS title, m.year AS year, e1.name AS subject, r.relation AS relation, e2.name AS object
+        """,
+        [
+            r"(?:summarize|summarise|describe|give (?:me )?a summary of|what is the plot of) (?:the (?:movie|film) )?"
+            + TEXT.format(name="title"),
+        ],
+    ),
+]
+
+
+# String literals and bare integers in generated Cypher (not hop ranges like *1..3 or property names)
+STRING_LITERAL = re.compile(r"'((?:[^'\\]|\\.)*)'|\"((?:[^\"\\]|\\.)*)\"")
+INT_LITERAL = re.compile(r"(?<![\w$.*])\d+(?![\w.])")
+# Row counts are part of the query's shape, even when the same number appears in the question
+PAGING_CLAUSE = re.compile(r"\b(?:LIMIT|SKIP)\s+$", re.IGNORECASE)
+
+
+def _find_value(normalized, value, kind, taken):
+    """Span of the first whole occurrence of `value` in the question that overlaps no span in `taken`."""
+    # "1" must not match inside "1925", nor "war" inside "warrior"
+    boundary = r"\d" if kind == "int" else r"\w"
+    for found in re.finditer(rf"(?<!{boundary}){re.escape(value)}(?!{boundary})", normalized):
+        if not any(found.start() < end and start < found.end() for start, end in taken):
+            return found.span()
+    return None
+
+
+def parameterize(question, cypher):
+    """Turns a question and its generated Cypher into a reusable template.
+
+    Returns {"pattern", "cypher", "slots", "params"}, where params holds this
+    question's own values so the parameterized query can be validated.
+
+    Only literals that also occur in the question are lifted into parameters;
+    anything else, including LIMIT/SKIP counts, is part of the query's shape.
+    Returns None when the question contains nothing to generalize over.
+    """
+    normalized = normalize_question(question)
+    literals = []
+    string_spans = []
+    for match in STRING_LITERAL.finditer(cypher):
+        string_spans.append(match.span())
+        value = match.group(1) if match.group(1) is not None else match.group(2)
+        if value:
+            kind = "lower" if value == value.lower() else "text"
+            literals.append((match.span(), value, kind))
+    for match in INT_LITERAL.finditer(cypher):
+        if any(start <= match.start() < end for start, end in string_spans):
+            continue
+        if PAGING_CLAUSE.search(cypher, 0, match.start()):
+            continue
+        literals.append((match.span(), match.group(), "int"))
+
+    # Each distinct value claims one span of the question; longest first so "tom hanks" wins over "tom"
+    spans = {}
+    for _, value, kind in sorted(literals, key=lambda literal: -len(literal[1])):
+        key = value.lower()
+        if key not in spans:
+            span = _find_value(normalized, key, kind, spans.values())
+            if span is not None:
+                spans[key] = span
+    literals = [literal for literal in literals if literal[1].lower() in spans]
+    if not literals:
+        return None
+
+    # One parameter per distinct value, numbered in order of appearance in the question
+    values = sorted(spans, key=lambda value: spans[value][0])
+    names = {value: f"p{i}" for i, value in enumerate(values)}
+    slots = {names[value.lower()]: kind for _, value, kind in literals}
+    params = {names[value.lower()]: int(value) if kind == "int" else value for _, value, kind in literals}
+
+    parameterized = cypher
+    for (start, end), value, _ in sorted(literals, reverse=True):
+        parameterized = parameterized[:start] + "$" + names[value.lower()] + parameterized[end:]
+
+    # Built from the question's spans right to left, so inserted groups are never searched again
+    pattern = normalized
+    tail = len(normalized)
+    parts = []
+    for value in reversed(values):
+        start, end = spans[value]
+        group = r"(?P<{}>\d+)" if slots[names[value]] == "int" else r"(?P<{}>.+?)"
+        parts.append(re.escape(pattern[end:tail]))
+        parts.append(group.format(names[value]))
+        tail = start
+    parts.append(re.escape(pattern[:tail]))
+    return {"pattern": "".join(reversed(parts)), "cypher": parameterized, "slots": slots, "params": params}
+
+
+class TemplateLibrary:
+    """Built-in templates plus templates learned from LLM output, persisted as JSON."""
+
+    def __init__(self, path="query_templates.json", validate=None):
+        self.path = path
+        self.validate = validate
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._learned = []
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for entry in json.load(f):
+                    self._learned.append(Template(entry["name"], entry["cypher"], [entry["pattern"]],
+                                                  entry["slots"]))
+
+    def match(self, question):
+        """Returns (template name, cypher, params) for a known question shape, or None."""
+        normalized = normalize_question(question)
+        for template in BUILTIN_TEMPLATES + self._learned:
+            params = template.match(normalized, question)
+            if params is not None and all(value is not None for value in params.values()):
+                self.hits += 1
+                return template.name, template.cypher, params
+        self.misses += 1
+        return None
+
+    def learn(self, question, cypher):
+        """Stores a parameterized version of LLM-generated Cypher; returns its name, or None if not reusable."""
+        template = parameterize(question, cypher)
+        if template is None:
+            return None
+        if self.validate is not None and not self.validate(template["cypher"], template["params"]):
+            return None
+
+        with self._lock:
+            name = f"learned_{len(self._learned)}"
+            self._learned.append(Template(name, template["cypher"], [template["pattern"]], template["slots"]))
+            if self.path:
+                entries = [
+                    {"name": t.name, "pattern": t.patterns[0].pattern, "cypher": t.cypher, "slots": t.slots}
+                    for t in self._learned
+                ]
+                tmp_path = self.path + ".tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(entries, f, indent=4, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+        return name
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0,
+                "builtin": len(BUILTIN_TEMPLATES), "learned": len(self._learned)}
@@ -0,0 +1,177 @@
+"""
+Long-running HTTP front end for answer_pipeline.
+
+The one-shot CLI pays for importing openai, opening the Neo4j driver and
+loading the embedding store on every question. This server pays for them
+once. Each request runs answer_stream() on one persistent event loop, so the
+AsyncOpenAI client, the driver pool and the cached embeddings are shared by
+every request.
+
+    GET  /health    {"status": "ok", "neo4j_pool": ..., "llm_cache": ...}
+    POST /answer    {"question": ..., "top_k": 5, "max_records": null, "semantic": true, "stream": false}
+                    JSON {"answer", "source", "timings"}, or with "stream": true the answer
+                    as server-sent events, one chunk per event, ending with the timings
+
+Usage:
+    python Phase3_LLM_RAG/server.py --port 8080
+    curl -s localhost:8080/answer -d '{"question": "Suggest top 5 WAR movies"}'
+"""
+import argparse
+import asyncio
+import json
+import os
+import queue
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import answer_pipeline
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.llm_cache import get_cache
+from common.neo4j_pool import close_driver, pool_metrics
+
+_DONE = object()
+
+
+class EventLoopThread:
+    """A single event loop on a background thread that request threads submit coroutines to."""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self._thread.start()
+
+    def run(self, coroutine, timeout=None):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(timeout)
+
+    def submit(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+
+
+def _answer_kwargs(request):
+    return {
+        "top_k": int(request.get("top_k", 5)),
+        "max_records": request.get("max_records"),
+        "semantic": bool(request.get("semantic", True)),
+    }
+
+
+def make_handler(loop, timeout=120):
+    class AnswerHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _stream(self, question, kwargs):
+            """Relays answer_stream() chunks from the event loop as server-sent events."""
+            chunks = queue.Queue()
+            timings = {}
+
+            async def produce():
+                try:
+                    async for token in answer_pipeline.answer_stream(question, timings=timings, **kwargs):
+                        chunks.put(token)
+                finally:
+                    chunks.put(_DONE)
+
+            future = loop.submit(produce())
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            try:
+                while (token := chunks.get(timeout=timeout)) is not _DONE:
+                    self.wfile.write(f"data: {json.dumps({'token': token})}\n\n".encode())
+                    self.wfile.flush()
+                future.result()
+                self.wfile.write(f"data: {json.dumps({'timings': timings})}\n\ndata: [DONE]\n\n".encode())
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError, queue.Empty):
+                # Client went away (or the answer stalled): stop generating
+                future.cancel()
+
+        def do_GET(self):
+            if self.path != "/health":
+                self._send(404, {"error": f"Unknown path {self.path}"})
+                return
+            cache = get_cache()
+            self._send(200, {"status": "ok", "neo4j_pool": pool_metrics(),
+                             "llm_cache": cache.stats() if cache is not None else None})
+
+        def do_POST(self):
+            if self.path != "/answer":
+                self._send(404, {"error": f"Unknown path {self.path}"})
+                return
+            length = int(self.headers.get("Content-Length", 0))
+            try:
+                request = json.loads(self.rfile.read(length) or b"{}")
+                question = str(request["question"]).strip()
+                kwargs = _answer_kwargs(request)
+            except (ValueError, KeyError, TypeError) as e:
+                self._send(400, {"error": f"Bad request: {e}"})
+                return
+            if not question:
+                self._send(400, {"error": "Empty question"})
+                return
+
+            if request.get("stream"):
+                self._stream(question, kwargs)
+                return
+
+            timings = {}
+            try:
+                text = loop.run(answer_pipeline.answer(question, timings=timings, **kwargs), timeout)
+            except Exception as e:
+                self._send(500, {"error": str(e)})
+                return
+            self._send(200, {"answer": text, "source": timings.pop("source", None), "timings": timings})
+
+    return AnswerHandler
+
+
+def make_server(host="127.0.0.1", port=8080, timeout=120):
+    """Creates (but does not start) the server and its event loop; port 0 picks a free port."""
+    loop = EventLoopThread()
+    server = ThreadingHTTPServer((host, port), make_handler(loop, timeout))
+    server.daemon_threads = True
+    return server, loop
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve answer_pipeline over HTTP with warm clients")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds before an answer is abandoned")
+    args = parser.parse_args()
+
+    server, loop = make_server(args.host, args.port, args.timeout)
+    # Connect while the first request is on its way rather than during it
+    answer_pipeline.warm_up()
+    print(f"Answer server listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        loop.stop()
+        close_driver()
+
+
+if __name__ == "__main__":
+    main()
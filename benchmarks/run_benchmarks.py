@@ -0,0 +1,362 @@
+"""
+Benchmark suite covering all three phases on a synthetic corpus.
+
+Each size in --sizes gets a deterministic corpus (see synthetic_corpus.py).
+The scenarios below then run against it, and everything is reported as JSON
+so results can be diffed across commits:
+
+    preprocess        preprocess.py over the raw CSV                        rows/sec
+    extraction        asyncExtraction requests against the stub LLM server  per-request p50/p95/p99, rows/sec
+    graph_load        bulkLoad of the corpus's triplets, then the query      rows/sec, per-query p50/p95/p99
+                      shapes from benchSchema.py
+    embedding_search  exact and IVF search over a synthetic vector store     p50/p95/p99, queries/sec
+    end_to_end        answer_pipeline: Cypher resolution, Neo4j, streamed    time to first token and total,
+                      synthesis                                              p50/p95/p99
+    startup           `python cli.py <command> --help` in a fresh process    wall and import p50 per command,
+                      for every subcommand (independent of --sizes)          slowest modules under -X importtime
+
+LLM calls go to Phase1_EntityGen/stubLLMServer.py, which is started in
+process with the given latency, jitter, error rate and rpm limit, and the
+LLM cache is disabled. graph_load and end_to_end need a real Neo4j
+(NEO4J_URI etc.) and delete everything in it first, so they only run with
+--wipe; end_to_end queries the graph graph_load left behind. A throwaway
+container works:
+
+    docker run -p 7687:7687 -e NEO4J_AUTH=neo4j/password neo4j:5
+
+Usage:
+    python benchmarks/run_benchmarks.py --sizes 1000 10000 --scenarios preprocess extraction embedding_search
+    python benchmarks/run_benchmarks.py --sizes 10000 --wipe --baseline bench_results_main.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+for path in ("", "Phase1_EntityGen", os.path.join("Phase2_GraphGen", "new"), "Phase3_LLM_RAG"):
+    sys.path.append(os.path.join(ROOT, path))
+
+from synthetic_corpus import SyntheticCorpus, write_corpus
+
+SCENARIOS = ["preprocess", "extraction", "graph_load", "embedding_search", "end_to_end", "startup"]
+NEEDS_NEO4J = {"graph_load", "end_to_end"}
+
+# Metrics where a higher number is better; every other number is a latency
+HIGHER_IS_BETTER = ("throughput_per_sec", "qps")
+
+
+def summarize(samples_ms, elapsed=None):
+    """Latency percentiles of `samples_ms` and, given the wall time, throughput."""
+    samples = sorted(samples_ms)
+    result = {
+        "count": len(samples),
+        "p50_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[int(0.95 * (len(samples) - 1))], 3),
+        "p99_ms": round(samples[int(0.99 * (len(samples) - 1))], 3),
+    }
+    if elapsed:
+        result["throughput_per_sec"] = round(len(samples) / elapsed, 2)
+    return result
+
+
+def bench_preprocess(paths, args):
+    import preprocess
+
+    rows, elapsed = preprocess.preprocess(paths["raw"], paths["cleaned"], chunksize=args.chunksize,
+                                          workers=args.workers)
+    return {"rows": rows, "seconds": round(elapsed, 3), "throughput_per_sec": round(rows / elapsed, 2)}
+
+
+def bench_extraction(paths, args, base_url):
+    import asyncExtraction
+
+    corpus = SyntheticCorpus(args.size, args.seed)
+    texts = [corpus.movie(row_id)[0]["Plot"] for row_id in range(min(args.size, args.extract_rows))]
+    client = asyncExtraction.make_client(base_url)
+    limiter = asyncExtraction.RateLimiter(rpm=args.rpm)
+    samples, failures = [], 0
+
+    async def run():
+        nonlocal failures
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def one(text):
+            nonlocal failures
+            async with semaphore:
+                start = time.perf_counter()
+                triplets = await asyncExtraction.extract_triplets_async(client, text, limiter)
+                samples.append((time.perf_counter() - start) * 1000)
+                failures += triplets is None
+
+        await asyncio.gather(*(one(text) for text in texts))
+
+    start = time.perf_counter()
+    asyncio.run(run())
+    return {**summarize(samples, time.perf_counter() - start), "failed": failures,
+            "concurrency": args.concurrency}
+
+
+def _prepared_movies(paths, args):
+    from common.checkpoint import iter_records
+    from newGraphGen import prepare_movies
+
+    corpus = SyntheticCorpus(args.size, args.seed)
+    metadata = {}
+    for row_id in range(args.size):
+        movie, _ = corpus.movie(row_id)
+        metadata[movie["Title"]] = {key: movie[key] for key in ("Release Year", "Director", "Genre")}
+    return list(prepare_movies(iter_records(paths["triplets"]), metadata))
+
+
+def bench_graph_load(paths, args):
+    from benchSchema import BENCHMARK_QUERIES, wipe
+    from bulkLoad import bulk_load
+    from common.graph_schema import ensure_schema
+    from common.neo4j_pool import read_session
+
+    movies = _prepared_movies(paths, args)
+    wipe()
+    ensure_schema()
+    rows, elapsed = bulk_load(movies, batch_size=args.batch_size, workers=args.workers)
+    report = {"movies": len(movies), "rows": rows, "seconds": round(elapsed, 3),
+              "throughput_per_sec": round(len(movies) / elapsed, 2), "queries": {}}
+
+    sample = movies[len(movies) // 2]
+    params = {"director": sample["director"], "year": sample["year"], "genre": sample["genre"],
+              "title": sample["title"], "term": sample["triplets"][0]["object"].split()[0]}
+    with read_session() as session:
+        for name, query in BENCHMARK_QUERIES.items():
+            session.run(query, params).consume()
+            samples = []
+            for _ in range(args.repeats):
+                start = time.perf_counter()
+                session.run(query, params).consume()
+                samples.append((time.perf_counter() - start) * 1000)
+            report["queries"][name] = summarize(samples)
+    return report
+
+
+def bench_embedding_search(paths, args):
+    from ann_index import load_index
+    from benchANN import make_queries, measure, synthetic_store
+
+    store = synthetic_store(paths["store"], args.size, args.dim, seed=args.seed)
+    queries = make_queries(store, args.queries)
+    report = {"vectors": len(store), "dim": args.dim, "top_k": args.top_k}
+    for kind in ("exact", "ivf"):
+        index = load_index(store, kind, rebuild=True)
+        start = time.perf_counter()
+        _, samples = measure(index, queries, args.top_k)
+        report[kind] = summarize(samples, time.perf_counter() - start)
+    return report
+
+
+def bench_end_to_end(paths, args):
+    import answer_pipeline
+
+    corpus = SyntheticCorpus(args.size, args.seed)
+    questions = []
+    for row_id in range(args.queries):
+        movie, mentioned = corpus.movie(row_id % args.size)
+        if row_id % 2:
+            # Answered by a query template
+            questions.append(f"Find all movies directed by {movie['Director']}")
+        else:
+            # Sent to the (stub) LLM for Cypher
+            questions.append(f"Suggest movies about {mentioned[0]} and a {movie['Genre']} theme")
+
+    first_token, total = [], []
+
+    async def run():
+        for question in questions:
+            timings = {}
+            async for _ in answer_pipeline.answer_stream(question, semantic=False, timings=timings):
+                pass
+            first_token.append(timings.get("first_token", timings["done"]) * 1000)
+            total.append(timings["done"] * 1000)
+
+    start = time.perf_counter()
+    asyncio.run(run())
+    elapsed = time.perf_counter() - start
+    return {"first_token": summarize(first_token), "total": summarize(total, elapsed)}
+
+
+def _import_times(stderr):
+    """(module, cumulative ms) of the top-level imports in `python -X importtime` output."""
+    times = []
+    for line in stderr.splitlines():
+        if line.startswith("import time:") and line.count("|") == 2:
+            _, cumulative, module = line.split("|")
+            # Nested imports are indented further; theirs is included in their parent's cumulative time
+            if cumulative.strip().isdigit() and not module.startswith("  "):
+                times.append((module.strip(), int(cumulative) / 1000))
+    return times
+
+
+def bench_startup(args):
+    import cli
+
+    results = {}
+    for command in cli.COMMANDS:
+        argv = [sys.executable, os.path.join(ROOT, "cli.py"), "--import-time", command, "--help"]
+        wall, imported = [], []
+        for _ in range(args.startup_runs):
+            start = time.perf_counter()
+            run = subprocess.run(argv, cwd=ROOT, capture_output=True, text=True)
+            wall.append((time.perf_counter() - start) * 1000)
+            if run.returncode != 0:
+                break
+            imported.append(float(run.stderr.rsplit(" in ", 1)[1].split()[0]))
+        if run.returncode != 0:
+            # Typically a dependency this environment does not have
+            results[command] = {"error": run.stderr.strip().splitlines()[-1] if run.stderr.strip() else "failed"}
+            continue
+        profile = subprocess.run([sys.executable, "-X", "importtime", *argv[1:]], cwd=ROOT,
+                                 capture_output=True, text=True)
+        top = sorted(_import_times(profile.stderr), key=lambda item: -item[1])
+        results[command] = {
+            "wall": summarize(wall),
+            "import_p50_ms": round(statistics.median(imported), 3),
+            "slowest_imports_ms": {module: round(ms, 1) for module, ms in top[:5]},
+        }
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline, threshold=0.10):
+    """Prints metrics that moved more than `threshold` against a previous report; returns the regressions."""
+    regressions = []
+
+    def walk(new, old, path):
+        for key, value in new.items():
+            if key not in old:
+                continue
+            if isinstance(value, dict) and isinstance(old[key], dict):
+                walk(value, old[key], path + [key])
+            elif isinstance(value, (int, float)) and isinstance(old[key], (int, float)) and old[key] and \
+                    (key.endswith("_ms") or key in HIGHER_IS_BETTER):
+                change = (value - old[key]) / old[key]
+                worse = change < -threshold if key in HIGHER_IS_BETTER else change > threshold
+                if abs(change) > threshold:
+                    name = ".".join(path + [key])
+                    print(f"{'REGRESSION' if worse else 'improved':>10}  {name}: {old[key]} -> {value} "
+                          f"({change:+.0%})")
+                    if worse:
+                        regressions.append(name)
+
+    walk(report["results"], baseline.get("results", {}), [])
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark preprocessing, extraction, graph load and retrieval")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000], help="Corpus sizes, e.g. 1000 10000 100000 1000000")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--wipe", action="store_true",
+                        help="Allow graph_load/end_to_end, which delete everything in the target Neo4j database")
+    # Stub LLM server
+    parser.add_argument("--latency", type=float, default=0.05, help="Stub seconds per LLM response")
+    parser.add_argument("--jitter", type=float, default=0.01)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of stub responses that are 429s")
+    parser.add_argument("--rpm", type=int, default=None, help="Stub requests-per-minute limit (and client budget)")
+    # Scenario knobs
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Preprocess processes / Neo4j writers")
+    parser.add_argument("--chunksize", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=32, help="Extraction requests in flight")
+    parser.add_argument("--extract-rows", type=int, default=2000, help="Cap on rows sent through extraction")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--repeats", type=int, default=20, help="Runs per graph query shape")
+    parser.add_argument("--dim", type=int, default=256, help="Vector size for embedding_search")
+    parser.add_argument("--queries", type=int, default=200, help="Queries for embedding_search and end_to_end")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--startup-runs", type=int, default=5, help="Fresh processes per command for startup")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", default=None, help="Previous report to compare against")
+    args = parser.parse_args()
+
+    scenarios = [s for s in SCENARIOS if s in args.scenarios]
+    if not args.wipe and NEEDS_NEO4J & set(scenarios):
+        print(f"Skipping {', '.join(sorted(NEEDS_NEO4J & set(scenarios)))}: they delete the Neo4j database, "
+              f"pass --wipe to run them")
+        scenarios = [s for s in scenarios if s not in NEEDS_NEO4J]
+
+    import stubLLMServer
+
+    server, base_url = stubLLMServer.start_in_thread(port=0, latency=args.latency, jitter=args.jitter,
+                                                     error_rate=args.error_rate, rpm=args.rpm, seed=args.seed)
+    os.environ.update({"OPENAI_BASE_URL": base_url, "OPENAI_API_KEY": "stub", "LLM_CACHE_DISABLE": "1"})
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": vars(args),
+        },
+        "results": {},
+    }
+    try:
+        if "startup" in scenarios:
+            print("\n=== startup ===")
+            report["results"]["startup"] = bench_startup(args)
+            print(json.dumps(report["results"]["startup"], indent=4))
+            scenarios = [s for s in scenarios if s != "startup"]
+        with tempfile.TemporaryDirectory() as tmp:
+            # Learned templates must not leak into (or come from) the working directory
+            os.environ["QUERY_TEMPLATES_PATH"] = os.path.join(tmp, "query_templates.json")
+            for size in args.sizes:
+                args.size = size
+                paths = {
+                    "raw": os.path.join(tmp, f"{size}_raw.csv"),
+                    "cleaned": os.path.join(tmp, f"{size}_cleaned.csv"),
+                    "triplets": os.path.join(tmp, f"{size}_triplets.jsonl"),
+                    "store": os.path.join(tmp, f"{size}_store"),
+                }
+
+                results = report["results"][str(size)] = {}
+                if {"preprocess", "graph_load"} & set(scenarios):
+                    start = time.perf_counter()
+                    write_corpus(size, paths["raw"], paths["triplets"], args.seed)
+                    results["corpus_seconds"] = round(time.perf_counter() - start, 3)
+                for scenario in scenarios:
+                    print(f"\n=== {scenario} ({size} rows) ===")
+                    if scenario == "extraction":
+                        results[scenario] = bench_extraction(paths, args, base_url)
+                    else:
+                        results[scenario] = globals()[f"bench_{scenario}"](paths, args)
+                    print(json.dumps(results[scenario], indent=4))
+    finally:
+        server.shutdown()
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=4)
+    print(f"\nSaved results to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f))
+        if regressions:
+            print(f"{len(regressions)} metrics regressed by more than 10%")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
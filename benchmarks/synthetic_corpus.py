@@ -0,0 +1,137 @@
+"""
+Deterministic synthetic movie corpus for benchmarks.
+
+Writes a CSV in the raw wiki_movie_plots.csv layout (the input of
+preprocess.py) at any size, plus, optionally, a triplet checkpoint in the
+extraction output format (the input of newGraphGen.py and common.triplets).
+The same --rows and --seed always produce the same files.
+
+Distributions are loosely shaped like the real data:
+    - plots of 80-400 words
+    - a few hundred directors and a dozen genres
+    - entity names drawn from a Zipf-like pool, so popular entities are
+      shared across many movies, as "police" or "New York" are
+
+Usage:
+    python benchmarks/synthetic_corpus.py --rows 100000 --output synthetic_wiki_movie_plots.csv
+    python benchmarks/synthetic_corpus.py --rows 10000 --output movies.csv --triplets triplets.jsonl
+"""
+import argparse
+import csv
+import json
+import random
+import time
+
+RAW_COLUMNS = ["Release Year", "Title", "Origin/Ethnicity", "Director", "Cast", "Genre", "Wiki Page", "Plot"]
+
+GENRES = ["drama", "comedy", "western", "war", "horror", "romance", "crime", "thriller", "musical",
+          "adventure", "science fiction", "animation"]
+ORIGINS = ["American", "British", "Bollywood", "Tamil", "Japanese", "Australian", "Canadian"]
+RELATIONS = ["meets", "kills", "marries", "rescues", "betrays", "follows", "hires", "escapes from", "loves",
+             "robs", "visits", "defeats", "joins", "warns", "returns to"]
+SYLLABLES = ["al", "an", "ar", "bel", "bra", "dor", "el", "fen", "gar", "hal", "jo", "ka", "lan", "mar", "mo",
+             "nor", "pe", "ra", "ri", "sa", "ston", "ta", "tho", "vin", "wel", "zar"]
+WORDS = ("the a his her their after before while when then finally later town city ship train house farm "
+         "money letter gun war night secret plan family friend police doctor soldier captain daughter son "
+         "wife husband brother sister king village river island prison hotel school army gang").split()
+
+
+def _name(rng, parts=2):
+    return " ".join("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))).capitalize()
+                    for _ in range(parts))
+
+
+def _pool(rng, size, parts=2):
+    return [_name(rng, parts) for _ in range(size)]
+
+
+def _zipf_pick(rng, pool):
+    # Inverse-transform sample of an approximately 1/rank distribution
+    return pool[min(len(pool) - 1, int(len(pool) ** rng.random()) - 1)]
+
+
+class SyntheticCorpus:
+    """Generates movies (raw CSV rows) and their triplets from one seed."""
+
+    def __init__(self, rows, seed=0):
+        self.rows = rows
+        self.seed = seed
+        rng = random.Random(seed)
+        self.directors = _pool(rng, max(50, rows // 20))
+        self.cast = _pool(rng, max(200, rows // 2))
+        self.entities = _pool(rng, max(500, int(rows ** 0.75) * 4), parts=1) + self.cast[:200]
+
+    def _movie_rng(self, row_id):
+        return random.Random(self.seed * 1_000_003 + row_id)
+
+    def movie(self, row_id):
+        """The raw CSV row for `row_id`, plus the entities its plot mentions."""
+        rng = self._movie_rng(row_id)
+        mentioned = [_zipf_pick(rng, self.entities) for _ in range(rng.randint(3, 8))]
+        words = [rng.choice(WORDS) for _ in range(rng.randint(80, 400))]
+        for name in mentioned:
+            words.insert(rng.randrange(len(words)), name)
+        sentences = [" ".join(words[i:i + 15]).capitalize() + "." for i in range(0, len(words), 15)]
+        title = f"{_name(rng, 1)} {rng.choice(WORDS).capitalize()} {row_id}"
+        return {
+            "Release Year": rng.randint(1901, 2017),
+            "Title": title,
+            "Origin/Ethnicity": rng.choice(ORIGINS),
+            "Director": rng.choice(self.directors),
+            "Cast": ", ".join(rng.sample(self.cast, 3)),
+            "Genre": rng.choice(GENRES),
+            "Wiki Page": f"https://en.wikipedia.org/wiki/{title.replace(' ', '_')}",
+            "Plot": " ".join(sentences),
+        }, mentioned
+
+    def triplets(self, row_id, mentioned):
+        """Raw extraction lines ("1. (Subject, relation, Object)") over the movie's entities."""
+        rng = random.Random(self.seed * 7_000_003 + row_id)
+        lines = []
+        for i in range(rng.randint(3, 12)):
+            subject, object_ = rng.choice(mentioned), rng.choice(mentioned + self.entities[:50])
+            lines.append(f"{i + 1}. ({subject}, {rng.choice(RELATIONS)}, {object_})")
+        return lines
+
+    def __iter__(self):
+        """Yields (row_id, raw CSV row, triplet lines)."""
+        for row_id in range(self.rows):
+            movie, mentioned = self.movie(row_id)
+            yield row_id, movie, self.triplets(row_id, mentioned)
+
+
+def write_corpus(rows, output, triplets_path=None, seed=0):
+    """Writes the raw CSV (and the triplet checkpoint when a path is given); returns the row count."""
+    corpus = SyntheticCorpus(rows, seed)
+    triplets_file = open(triplets_path, "w", encoding="utf-8") if triplets_path else None
+    try:
+        with open(output, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=RAW_COLUMNS)
+            writer.writeheader()
+            for row_id, movie, lines in corpus:
+                writer.writerow(movie)
+                if triplets_file is not None:
+                    record = {"row_id": row_id, "Title": movie["Title"], "Triplets": lines}
+                    triplets_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+    finally:
+        if triplets_file is not None:
+            triplets_file.close()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a deterministic synthetic movie corpus")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="synthetic_wiki_movie_plots.csv", help="Raw CSV, as preprocess.py reads")
+    parser.add_argument("--triplets", default=None, help="Also write an extraction checkpoint (JSONL) here")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    write_corpus(args.rows, args.output, args.triplets, args.seed)
+    elapsed = time.perf_counter() - start
+    print(f"Generated {args.rows} movies in {elapsed:.1f}s ({args.rows / max(elapsed, 1e-9):.0f} rows/sec)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+One entry point for every phase of the pipeline.
+
+    python cli.py preprocess ...      Phase1_EntityGen/preprocess.py
+    python cli.py extract-rules ...   Phase1_EntityGen/ruleExtraction.py
+    python cli.py extract ...         Phase1_EntityGen/asyncExtraction.py
+    python cli.py load-graph ...      Phase2_GraphGen/new/newGraphGen.py
+    python cli.py embed ...           Phase3_LLM_RAG/Semantic_retrieval.py
+    python cli.py query ...           Phase3_LLM_RAG/answer_pipeline.py
+    python cli.py serve ...           Phase3_LLM_RAG/server.py
+    python cli.py worker ...          workers/worker.py
+
+Arguments after the subcommand go to that script's own parser, so
+`python cli.py query --help` lists the query flags. Only the chosen
+subcommand's module is imported. Those modules import openai, neo4j,
+pandas and spaCy on first use and cache their clients, models and
+datasets per process, so `query` does not pay for the extraction or
+embedding stack before it reads the question.
+
+--import-time prints how long the subcommand's module took to import.
+`python -X importtime cli.py query --help` breaks that down per module,
+and run_benchmarks.py --scenarios startup records it.
+"""
+import importlib
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# subcommand -> (directory, module, description)
+COMMANDS = {
+    "preprocess": ("Phase1_EntityGen", "preprocess", "Clean and lemmatize the raw plots CSV"),
+    "extract-rules": ("Phase1_EntityGen", "ruleExtraction", "Rule-based triplet pre-pass over spaCy parses"),
+    "extract": ("Phase1_EntityGen", "asyncExtraction", "Concurrent LLM triplet extraction"),
+    "load-graph": (os.path.join("Phase2_GraphGen", "new"), "newGraphGen", "Load extracted triplets into Neo4j"),
+    "embed": ("Phase3_LLM_RAG", "Semantic_retrieval", "Embed the plots into the embedding store"),
+    "query": ("Phase3_LLM_RAG", "answer_pipeline", "Answer a question with a streamed response"),
+    "serve": ("Phase3_LLM_RAG", "server", "Serve answers over HTTP with warm clients"),
+    "worker": ("workers", "worker", "Shared work-queue workers for extraction and embedding"),
+}
+
+
+def usage():
+    lines = ["usage: python cli.py [--import-time] <command> [args...]", "", "commands:"]
+    lines.extend(f"  {name:<14}{description}" for name, (_, _, description) in COMMANDS.items())
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    show_import_time = "--import-time" in argv[:1]
+    if show_import_time:
+        argv.pop(0)
+    if not argv or argv[0] in ("-h", "--help"):
+        print(usage())
+        return
+    command, rest = argv[0], argv[1:]
+    if command not in COMMANDS:
+        print(f"Unknown command '{command}'\n\n{usage()}", file=sys.stderr)
+        sys.exit(2)
+
+    directory, module_name, _ = COMMANDS[command]
+    # The scripts import their siblings by bare name, as when run directly
+    sys.path.insert(0, os.path.join(ROOT, directory))
+    sys.path.append(ROOT)
+
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    if show_import_time:
+        print(f"[{command}] imported {module_name} in {(time.perf_counter() - start) * 1000:.0f} ms",
+              file=sys.stderr)
+
+    sys.argv = [f"cli.py {command}", *rest]
+    module.main()
+
+
+if __name__ == "__main__":
+    main()
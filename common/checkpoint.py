@@ -0,0 +1,215 @@
+"""
+Append-only JSONL checkpoint for triplet extraction output.
+
+Every line is one movie record keyed by a stable `row_id`, its row position
+in cleaned_wiki_movie_plots.csv, so duplicate titles no longer confuse
+resume. A sidecar index (`<path>.idx`) holds a bitmap of finished row ids and
+the JSONL byte offset it covers. On reopen only the lines written after that
+offset are re-scanned.
+
+Convert an old JSON list output with:
+    python -m common.checkpoint extracted_triplets.json extracted_triplets.jsonl
+"""
+import json
+import os
+
+
+class TripletCheckpoint:
+    """Append-only record store with an O(1) done-set for resuming extraction.
+
+    Usage:
+        with TripletCheckpoint("extracted_triplets.jsonl") as checkpoint:
+            if row_id not in checkpoint:
+                checkpoint.append({"row_id": row_id, "Title": title, "Triplets": triplets})
+            checkpoint.flush()
+    """
+
+    def __init__(self, path, fsync=True):
+        self.path = path
+        self.index_path = path + ".idx"
+        self.fsync = fsync
+        self._done = bytearray()
+        self._count = 0
+        self._scan_from(self._load_index())
+        self._file = open(path, "ab")
+
+    # Done-set bitmap
+    def _mark(self, row_id):
+        byte, bit = row_id >> 3, 1 << (row_id & 7)
+        if byte >= len(self._done):
+            self._done.extend(bytes(byte - len(self._done) + 1))
+        if not self._done[byte] & bit:
+            self._done[byte] |= bit
+            self._count += 1
+            return True
+        return False
+
+    def __contains__(self, row_id):
+        byte = row_id >> 3
+        return byte < len(self._done) and bool(self._done[byte] & (1 << (row_id & 7)))
+
+    def __len__(self):
+        return self._count
+
+    def _load_index(self):
+        """Loads the sidecar index and returns the JSONL offset it is valid up to."""
+        if not (os.path.exists(self.index_path) and os.path.exists(self.path)):
+            return 0
+        try:
+            with open(self.index_path, "rb") as f:
+                meta = json.loads(f.readline())
+                done = bytearray(f.read())
+        except (OSError, ValueError):
+            return 0
+        # The JSONL was truncated or replaced behind our back; rebuild from scratch
+        if meta.get("offset", 0) > os.path.getsize(self.path):
+            return 0
+        self._done = done
+        self._count = meta.get("count", 0)
+        return meta["offset"]
+
+    def _scan_from(self, offset):
+        """
+        Marks rows written after `offset`.
+
+        A final line without its newline is a write torn by a crash and is
+        truncated. A complete line that does not parse is skipped, so one bad
+        record cannot take the valid ones after it down with it.
+        """
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb+") as f:
+            f.seek(offset)
+            good = offset
+            corrupt = 0
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    self._mark(json.loads(line)["row_id"])
+                except (ValueError, KeyError, TypeError):
+                    if not corrupt:
+                        print(f"Skipping corrupt record at byte {good} of {self.path}")
+                    corrupt += 1
+                good += len(line)
+            if corrupt > 1:
+                print(f"Skipped {corrupt} corrupt records in {self.path}")
+            if good < os.path.getsize(self.path):
+                print(f"Truncating incomplete record at byte {good} of {self.path}")
+                f.truncate(good)
+
+    def append(self, record):
+        """Buffers one record; it must carry an integer `row_id`."""
+        row_id = int(record["row_id"])
+        self._file.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+        self._mark(row_id)
+
+    def flush(self):
+        """Makes everything appended so far durable, then persists the done-set index."""
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(json.dumps({"offset": self._file.tell(), "count": self._count}).encode() + b"\n")
+            f.write(self._done)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, self.index_path)
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_records(path):
+    """Streams movie records from a JSONL checkpoint, one dict at a time.
+
+    Records repeated for the same row_id (e.g. two workers racing) are yielded
+    once, and lines that do not parse are skipped (as when the checkpoint is
+    reopened). Legacy `.json` list files are still accepted, but they have to be
+    parsed in full.
+    """
+    if path.endswith(".json"):
+        with open(path, "r", encoding="utf-8") as f:
+            yield from json.load(f)
+        return
+
+    seen = bytearray()
+    corrupt = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break  # torn final line from an interrupted writer
+            try:
+                record = json.loads(line)
+            except ValueError:
+                corrupt += 1
+                continue
+            if not isinstance(record, dict):
+                corrupt += 1
+                continue
+            row_id = record.get("row_id")
+            if row_id is not None:
+                byte, bit = row_id >> 3, 1 << (row_id & 7)
+                if byte >= len(seen):
+                    seen.extend(bytes(byte - len(seen) + 1))
+                if seen[byte] & bit:
+                    continue
+                seen[byte] |= bit
+            yield record
+    if corrupt:
+        print(f"Skipped {corrupt} corrupt records in {path}")
+
+
+def convert_legacy_json(json_path, jsonl_path, titles):
+    """Converts an old extracted_triplets.json list into a JSONL checkpoint.
+
+    The legacy extraction walked the CSV in order, so each record is matched
+    to the next CSV row (in `titles`, the CSV's Title column) carrying its
+    title. Duplicate titles therefore map to the right rows. Rows already in
+    the checkpoint are skipped, so the conversion can be rerun.
+    """
+    titles = list(titles)
+    position = 0
+    converted = 0
+    with TripletCheckpoint(jsonl_path) as checkpoint:
+        for record in iter_records(json_path):
+            try:
+                position = titles.index(record["Title"], position)
+            except ValueError:
+                print(f"Skipping {record['Title']} (not found in CSV after row {position})")
+                continue
+            if position not in checkpoint:
+                checkpoint.append({"row_id": position, **record})
+                converted += 1
+            position += 1
+    return converted
+
+
+def main():
+    import argparse
+    from common.dataset import load_movies
+
+    parser = argparse.ArgumentParser(description="Convert a legacy extracted_triplets.json into a JSONL checkpoint")
+    parser.add_argument("json_file")
+    parser.add_argument("jsonl_file")
+    parser.add_argument("--csv", default="cleaned_wiki_movie_plots.csv")
+    args = parser.parse_args()
+
+    titles = load_movies(["Title"], path=args.csv)["Title"]
+    converted = convert_legacy_json(args.json_file, args.jsonl_file, titles)
+    print(f"Converted {converted} records into {args.jsonl_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Columnar access to the cleaned movie dataset.
+
+Most scripts only need a few metadata columns, yet re-parsing
+cleaned_wiki_movie_plots.csv pulls the large Plot and Cleaned_Plot text into
+memory every time. This module keeps a Parquet copy next to the CSV and
+reads it memory-mapped. Only the requested columns are read, and filters
+such as [("Release Year", "==", 1925)] are pushed down to skip row groups.
+
+Every frame is indexed by `row_id`, the row's position in the cleaned CSV,
+which is the key the triplet checkpoint and the embedding store use.
+
+The Parquet copy is written by preprocess.py, or converted from the CSV
+(in chunks) the first time it is needed and whenever the CSV is newer.
+Without pyarrow everything falls back to pd.read_csv(usecols=...).
+
+pandas is imported on first read, so scripts that only import this module
+(the CLI's --help, the query path) do not pay for it.
+
+Configuration (environment):
+    MOVIE_DATASET    cleaned CSV path (default: cleaned_wiki_movie_plots.csv)
+"""
+import operator
+import os
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+DEFAULT_CSV = "cleaned_wiki_movie_plots.csv"
+METADATA_COLUMNS = ["Title", "Release Year", "Director", "Genre"]
+
+_OPS = {
+    "==": operator.eq, "=": operator.eq, "!=": operator.ne,
+    "<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge,
+}
+
+
+def dataset_path(path=None):
+    return path or os.getenv("MOVIE_DATASET", DEFAULT_CSV)
+
+
+def parquet_path_for(csv_path):
+    return os.path.splitext(csv_path)[0] + ".parquet"
+
+
+def write_parquet_chunk(writer, chunk, path):
+    """Appends one DataFrame chunk (indexed by row id) to a ParquetWriter, opening it on first use."""
+    table = pa.Table.from_pandas(
+        chunk.rename_axis("row_id").reset_index(),
+        schema=writer.schema if writer is not None else None,
+        preserve_index=False
+    )
+    if writer is None:
+        writer = pq.ParquetWriter(path, table.schema, compression="zstd")
+    writer.write_table(table)
+    return writer
+
+
+def ensure_parquet(csv_path=None, chunksize=50_000):
+    """Returns the Parquet copy of `csv_path`, converting it first when missing or older than the CSV."""
+    csv_path = dataset_path(csv_path)
+    parquet_path = parquet_path_for(csv_path)
+    if os.path.exists(parquet_path) and (
+        not os.path.exists(csv_path) or os.path.getmtime(parquet_path) >= os.path.getmtime(csv_path)
+    ):
+        return parquet_path
+
+    import pandas as pd
+
+    print(f"Converting {csv_path} to {parquet_path} ...")
+    tmp_path = parquet_path + ".tmp"
+    writer = None
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+        writer = write_parquet_chunk(writer, chunk, tmp_path)
+    if writer is not None:
+        writer.close()
+        os.replace(tmp_path, parquet_path)
+    return parquet_path
+
+
+def _apply_filters(df, filters):
+    """pandas equivalent of pyarrow's [(column, op, value), ...] conjunction, for the CSV fallback."""
+    import pandas as pd
+
+    mask = pd.Series(True, index=df.index)
+    for column, op, value in filters:
+        if op == "in":
+            mask &= df[column].isin(value)
+        elif op == "not in":
+            mask &= ~df[column].isin(value)
+        else:
+            mask &= _OPS[op](df[column], value)
+    return df[mask]
+
+
+def load_movies(columns=None, filters=None, path=None):
+    """
+    Reads the cleaned dataset, indexed by row id.
+
+    Args:
+        columns (list): Columns to read (default: all). Filter columns are read as needed.
+        filters (list): (column, op, value) conjunction, e.g. [("Genre", "==", "war"), ("Release Year", ">=", 1950)].
+        path (str): Cleaned CSV path (default: MOVIE_DATASET or cleaned_wiki_movie_plots.csv).
+
+    Returns:
+        pd.DataFrame: The requested columns of the matching rows.
+    """
+    csv_path = dataset_path(path)
+    columns = list(columns) if columns is not None else None
+    filter_columns = [column for column, _, _ in filters or [] if columns is not None and column not in columns]
+
+    if pq is not None:
+        table = pq.read_table(
+            ensure_parquet(csv_path),
+            columns=None if columns is None else ["row_id"] + columns + filter_columns,
+            filters=filters or None,
+            memory_map=True
+        )
+        df = table.to_pandas().set_index("row_id")
+    else:
+        import pandas as pd
+
+        df = pd.read_csv(csv_path, usecols=None if columns is None else columns + filter_columns)
+        df = _apply_filters(df, filters) if filters else df
+        df.index.name = "row_id"
+    return df if columns is None else df[columns]
+
+
+def load_metadata_lookup(path=None):
+    """Title -> {Release Year, Director, Genre} for the first row carrying each title."""
+    df = load_movies(METADATA_COLUMNS, path=path)
+    return df.drop_duplicates(subset="Title", keep="first").set_index("Title")[METADATA_COLUMNS[1:]].to_dict(orient="index")
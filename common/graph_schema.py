@@ -0,0 +1,115 @@
+"""
+Constraints and indexes for the movie knowledge graph.
+
+Every MERGE in the loaders looks a node up by one of these properties.
+Without a backing index each lookup is a label scan, and load time grows
+quadratically with the graph. All statements use IF NOT EXISTS, so
+ensure_schema() is safe to run before every load.
+"""
+from common.neo4j_pool import read_session, write_session
+
+# Uniqueness constraints also create the range index MERGE uses for lookups
+CONSTRAINTS = {
+    "movie_title_year": "CREATE CONSTRAINT movie_title_year IF NOT EXISTS "
+                        "FOR (m:Movie) REQUIRE (m.title, m.year) IS UNIQUE",
+    "director_name": "CREATE CONSTRAINT director_name IF NOT EXISTS "
+                     "FOR (d:Director) REQUIRE d.name IS UNIQUE",
+    "genre_name": "CREATE CONSTRAINT genre_name IF NOT EXISTS "
+                  "FOR (g:Genre) REQUIRE g.name IS UNIQUE",
+    "entity_name": "CREATE CONSTRAINT entity_name IF NOT EXISTS "
+                   "FOR (e:Entity) REQUIRE e.name IS UNIQUE",
+    "summary_title": "CREATE CONSTRAINT summary_title IF NOT EXISTS "
+                     "FOR (s:Summary) REQUIRE s.title IS UNIQUE",
+}
+
+# Lookups the generated Cypher does that the constraints above do not cover:
+# title-only and year-only movie matches, relation filters on ACTS, and
+# CONTAINS / STARTS WITH searches over names (text indexes)
+INDEXES = {
+    "movie_title": "CREATE INDEX movie_title IF NOT EXISTS FOR (m:Movie) ON (m.title)",
+    "movie_year": "CREATE INDEX movie_year IF NOT EXISTS FOR (m:Movie) ON (m.year)",
+    "acts_relation": "CREATE INDEX acts_relation IF NOT EXISTS FOR ()-[r:ACTS]-() ON (r.relation)",
+    "movie_title_text": "CREATE TEXT INDEX movie_title_text IF NOT EXISTS FOR (m:Movie) ON (m.title)",
+    "director_name_text": "CREATE TEXT INDEX director_name_text IF NOT EXISTS FOR (d:Director) ON (d.name)",
+    "entity_name_text": "CREATE TEXT INDEX entity_name_text IF NOT EXISTS FOR (e:Entity) ON (e.name)",
+}
+
+# Optional native vector indexes over embeddings written by Phase3_LLM_RAG/graph_vectors.py
+VECTOR_INDEXES = {
+    "summary_embedding": ("Summary", "embedding"),
+    "entity_embedding": ("Entity", "embedding"),
+}
+
+
+def ensure_schema(wait_seconds=300):
+    """Creates any missing constraints and indexes and waits for them to come online.
+
+    Returns the names of statements that failed (e.g. a uniqueness constraint
+    over data that already holds duplicates).
+    """
+    from neo4j.exceptions import Neo4jError
+
+    failed = []
+    with write_session() as session:
+        for name, statement in {**CONSTRAINTS, **INDEXES}.items():
+            try:
+                session.run(statement).consume()
+            except Neo4jError as e:
+                print(f"Could not create {name}: {e.message}")
+                failed.append(name)
+        session.run("CALL db.awaitIndexes($timeout)", timeout=wait_seconds).consume()
+    return failed
+
+
+def ensure_vector_indexes(dim, similarity="cosine", wait_seconds=300):
+    """Creates the vector indexes for `dim`-dimensional embeddings; returns the names that failed.
+
+    Needs Neo4j 5.13 or later.
+    """
+    from neo4j.exceptions import Neo4jError
+
+    failed = []
+    with write_session() as session:
+        for name, (label, prop) in VECTOR_INDEXES.items():
+            statement = (f"CREATE VECTOR INDEX {name} IF NOT EXISTS FOR (n:{label}) ON (n.{prop}) "
+                         f"OPTIONS {{indexConfig: {{`vector.dimensions`: {int(dim)}, "
+                         f"`vector.similarity_function`: '{similarity}'}}}}")
+            try:
+                session.run(statement).consume()
+            except Neo4jError as e:
+                print(f"Could not create {name}: {e.message}")
+                failed.append(name)
+        session.run("CALL db.awaitIndexes($timeout)", timeout=wait_seconds).consume()
+    return failed
+
+
+def verify_schema():
+    """Returns the names of expected constraints/indexes that are missing or not yet ONLINE."""
+    with read_session() as session:
+        constraints = {record["name"] for record in session.run("SHOW CONSTRAINTS YIELD name")}
+        indexes = {
+            record["name"]: record["state"]
+            for record in session.run("SHOW INDEXES YIELD name, state")
+        }
+    missing = [name for name in CONSTRAINTS if name not in constraints]
+    missing += [name for name in INDEXES if indexes.get(name) != "ONLINE"]
+    return missing
+
+
+def drop_schema():
+    """Drops everything ensure_schema() creates; only meant for benchmarking."""
+    with write_session() as session:
+        for name in CONSTRAINTS:
+            session.run(f"DROP CONSTRAINT {name} IF EXISTS").consume()
+        for name in list(INDEXES) + list(VECTOR_INDEXES):
+            session.run(f"DROP INDEX {name} IF EXISTS").consume()
+
+
+def main():
+    failed = ensure_schema()
+    missing = verify_schema()
+    print("Schema ready" if not (failed or missing) else f"Schema incomplete: {', '.join(sorted(set(failed + missing)))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""
+Persistent on-disk cache for chat completion responses.
+
+Responses are stored in SQLite under a SHA-256 of (model, messages,
+temperature, max_tokens). Extraction reruns and repeated questions in
+QueryConversion are then answered locally instead of paying another round
+trip. The cache is capped by total response size with least-recently-used
+eviction, and entries can optionally expire after a TTL.
+
+Only complete answers are stored: a response cut off by max_tokens
+(finish_reason other than "stop") is returned but not cached, and callers
+can pass `validate` to keep answers they cannot use (e.g. no Cypher block)
+out of the cache, so a bad answer is retried next time instead of replayed.
+
+Configuration (environment):
+    LLM_CACHE_PATH       SQLite file (default: llm_cache.sqlite3)
+    LLM_CACHE_MAX_MB     size cap before LRU eviction kicks in (default: 512)
+    LLM_CACHE_TTL        seconds an entry stays valid (default: never expires)
+    LLM_CACHE_DISABLE    set to 1 to bypass the cache entirely
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class LLMCache:
+    """SQLite-backed response cache with size-based LRU eviction and an optional TTL."""
+
+    def __init__(self, path="llm_cache.sqlite3", max_bytes=512 * 1024 * 1024, ttl=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed_at)")
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def make_key(model, messages, temperature=None, max_tokens=None):
+        """Content address of a request: identical prompts and settings share a key."""
+        payload = json.dumps(
+            {"model": model, "messages": messages, "temperature": temperature, "max_tokens": max_tokens},
+            sort_keys=True, ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Returns the cached response for `key`, or None on a miss or expired entry."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, size, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self.ttl is not None and row[2] + self.ttl < now:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._total_bytes -= row[1]
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, model, response):
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, response, size, now, now)
+            )
+            self._total_bytes += size - (old[0] if old else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Drops least-recently-used entries until the cache is back under 90% of its cap."""
+        # Other processes may share the file, so start from the real total
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        target = int(self.max_bytes * 0.9)
+        while self._total_bytes > target:
+            rows = self._conn.execute(
+                "SELECT key, size FROM responses ORDER BY accessed_at LIMIT 256"
+            ).fetchall()
+            if not rows:
+                break
+            freed = 0
+            for key, size in rows:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                freed += size
+                if self._total_bytes - freed <= target:
+                    break
+            self._total_bytes -= freed
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": entries,
+                "bytes": self._total_bytes,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._total_bytes = 0
+
+    def close(self):
+        self._conn.close()
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Process-wide cache configured from the environment, or None when disabled."""
+    global _default_cache
+    if os.getenv("LLM_CACHE_DISABLE") == "1":
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            ttl = os.getenv("LLM_CACHE_TTL")
+            _default_cache = LLMCache(
+                path=os.getenv("LLM_CACHE_PATH", "llm_cache.sqlite3"),
+                max_bytes=int(float(os.getenv("LLM_CACHE_MAX_MB", "512")) * 1024 * 1024),
+                ttl=float(ttl) if ttl else None
+            )
+    return _default_cache
+
+
+def _request_kwargs(model, messages, temperature, max_tokens):
+    kwargs = {"model": model, "messages": messages}
+    if temperature is not None:
+        kwargs["temperature"] = temperature
+    if max_tokens is not None:
+        kwargs["max_tokens"] = max_tokens
+    return kwargs
+
+
+def _cacheable(content, finish_reason, validate):
+    """True for a complete answer that `validate` (when given) accepts; a validator that raises rejects it."""
+    if content is None or finish_reason != "stop":
+        return False
+    if validate is None:
+        return True
+    try:
+        return bool(validate(content))
+    except Exception:
+        return False
+
+
+def cached_chat_completion(client, model, messages, temperature=None, max_tokens=None, cache=None,
+                           validate=None):
+    """
+    Returns the message content of a chat completion, served from the cache when possible.
+
+    `validate(content)` decides whether a fresh answer is stored; rejected
+    answers are still returned, so the caller can report them.
+    """
+    cache = cache or get_cache()
+    key = LLMCache.make_key(model, messages, temperature, max_tokens)
+    if cache is not None:
+        content = cache.get(key)
+        if content is not None:
+            return content
+
+    response = client.chat.completions.create(**_request_kwargs(model, messages, temperature, max_tokens))
+    content = response.choices[0].message.content
+    if cache is not None and _cacheable(content, response.choices[0].finish_reason, validate):
+        cache.put(key, model, content)
+    return content
+
+
+async def acached_chat_completion(client, model, messages, temperature=None, max_tokens=None,
+                                  cache=None, before_request=None, validate=None, after_response=None):
+    """Async variant of cached_chat_completion.
+
+    `before_request` is awaited only on a cache miss, right before the API
+    call, so rate limiters are not charged for cache hits. `after_response`
+    is called with the raw API response (e.g. to settle a token budget
+    against its usage).
+    """
+    cache = cache or get_cache()
+    key = LLMCache.make_key(model, messages, temperature, max_tokens)
+    if cache is not None:
+        content = cache.get(key)
+        if content is not None:
+            return content
+
+    if before_request is not None:
+        await before_request()
+    response = await client.chat.completions.create(**_request_kwargs(model, messages, temperature, max_tokens))
+    if after_response is not None:
+        after_response(response)
+    content = response.choices[0].message.content
+    if cache is not None and _cacheable(content, response.choices[0].finish_reason, validate):
+        cache.put(key, model, content)
+    return content
+
+
+async def astream_chat_completion(client, model, messages, temperature=None, max_tokens=None, cache=None,
+                                  validate=None):
+    """Yields a chat completion's text as it is generated.
+
+    A cache hit is yielded in one piece. A streamed response is cached only
+    once it has finished with finish_reason "stop" (and passed `validate`),
+    so a cancelled or cut-off stream never leaves a truncated entry behind.
+    """
+    cache = cache or get_cache()
+    key = LLMCache.make_key(model, messages, temperature, max_tokens)
+    if cache is not None:
+        content = cache.get(key)
+        if content is not None:
+            yield content
+            return
+
+    stream = await client.chat.completions.create(
+        **_request_kwargs(model, messages, temperature, max_tokens), stream=True
+    )
+    parts = []
+    finish_reason = None
+    try:
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            finish_reason = chunk.choices[0].finish_reason or finish_reason
+            if chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+                yield parts[-1]
+    finally:
+        await stream.close()
+    if cache is not None and parts and _cacheable("".join(parts), finish_reason, validate):
+        cache.put(key, model, "".join(parts))
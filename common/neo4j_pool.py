@@ -0,0 +1,163 @@
+"""
+Process-wide Neo4j driver shared by every phase.
+
+Building a driver per query pays TCP, TLS and authentication setup on every
+question. One driver is created lazily per process with a tuned connection
+pool, its connectivity is verified once, and it is closed at interpreter exit.
+
+Sessions are handed out through read_session() / write_session(). On clustered
+deployments (neo4j:// URIs) these route to readers or the leader. Each
+checkout holds one of NEO4J_POOL_SIZE slots, which is how pool utilization
+and acquisition wait time are measured (see pool_metrics()).
+
+Configuration (environment):
+    NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD, NEO4J_DATABASE
+    NEO4J_POOL_SIZE            maximum pooled connections (default: 50)
+    NEO4J_ACQUIRE_TIMEOUT      seconds to wait for a free connection (default: 60)
+    NEO4J_LIVENESS_CHECK       ping connections idle longer than this many seconds before reuse (default: 30)
+    NEO4J_MAX_LIFETIME         seconds before a pooled connection is recycled (default: 3600)
+
+The neo4j package itself is imported with the driver, so importing this
+module costs nothing until the first session is opened.
+"""
+import atexit
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Same values as neo4j.READ_ACCESS / neo4j.WRITE_ACCESS, without importing the driver
+READ_ACCESS = "READ"
+WRITE_ACCESS = "WRITE"
+
+
+class PoolMetrics:
+    """Counters for connection slot usage and time spent waiting for a slot."""
+
+    def __init__(self, pool_size):
+        self.pool_size = pool_size
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.acquisitions = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._lock = threading.Lock()
+
+    def acquired(self, wait):
+        with self._lock:
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+            self.acquisitions += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+
+    def released(self):
+        with self._lock:
+            self.in_use -= 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "pool_size": self.pool_size,
+                "in_use": self.in_use,
+                "utilization": self.in_use / self.pool_size,
+                "peak_utilization": self.peak_in_use / self.pool_size,
+                "acquisitions": self.acquisitions,
+                "wait_avg_ms": 1000 * self.wait_total / self.acquisitions if self.acquisitions else 0.0,
+                "wait_max_ms": 1000 * self.wait_max,
+            }
+
+
+_driver = None
+_slots = None
+_metrics = None
+_lock = threading.Lock()
+
+
+def _settings():
+    return {
+        "pool_size": int(os.getenv("NEO4J_POOL_SIZE", "50")),
+        "acquire_timeout": float(os.getenv("NEO4J_ACQUIRE_TIMEOUT", "60")),
+        "liveness_check": float(os.getenv("NEO4J_LIVENESS_CHECK", "30")),
+        "max_lifetime": float(os.getenv("NEO4J_MAX_LIFETIME", "3600")),
+    }
+
+
+def get_driver():
+    """Returns the shared driver, creating and verifying it on first use."""
+    global _driver, _slots, _metrics
+    if _driver is not None:
+        return _driver
+    with _lock:
+        if _driver is None:
+            from neo4j import GraphDatabase
+
+            settings = _settings()
+            driver = GraphDatabase.driver(
+                os.getenv("NEO4J_URI"),
+                auth=(os.getenv("NEO4J_USER"), os.getenv("NEO4J_PASSWORD")),
+                max_connection_pool_size=settings["pool_size"],
+                connection_acquisition_timeout=settings["acquire_timeout"],
+                liveness_check_timeout=settings["liveness_check"],
+                max_connection_lifetime=settings["max_lifetime"],
+                keep_alive=True
+            )
+            driver.verify_connectivity()
+            _slots = threading.BoundedSemaphore(settings["pool_size"])
+            _metrics = PoolMetrics(settings["pool_size"])
+            _driver = driver
+            atexit.register(close_driver)
+    return _driver
+
+
+@contextmanager
+def session(access_mode=WRITE_ACCESS, **kwargs):
+    """Checks out a session from the shared pool, recording how long the checkout waited."""
+    driver = get_driver()
+    timeout = _settings()["acquire_timeout"]
+
+    start = time.perf_counter()
+    if not _slots.acquire(timeout=timeout):
+        raise TimeoutError(f"No Neo4j connection became available within {timeout}s")
+    _metrics.acquired(time.perf_counter() - start)
+
+    database = os.getenv("NEO4J_DATABASE")
+    if database:
+        # Naming the database saves a home-database lookup round trip per session
+        kwargs.setdefault("database", database)
+    try:
+        with driver.session(default_access_mode=access_mode, **kwargs) as neo4j_session:
+            yield neo4j_session
+    finally:
+        _metrics.released()
+        _slots.release()
+
+
+def read_session(**kwargs):
+    """Session routed to read replicas/followers on a cluster."""
+    return session(READ_ACCESS, **kwargs)
+
+
+def write_session(**kwargs):
+    """Session routed to the leader on a cluster."""
+    return session(WRITE_ACCESS, **kwargs)
+
+
+def pool_metrics():
+    """Pool utilization and acquisition wait statistics for this process."""
+    if _metrics is None:
+        return PoolMetrics(_settings()["pool_size"]).snapshot()
+    return _metrics.snapshot()
+
+
+def close_driver():
+    """Closes the shared driver; the next get_driver() call builds a fresh one."""
+    global _driver
+    with _lock:
+        if _driver is not None:
+            _driver.close()
+            _driver = None
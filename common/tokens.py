@@ -0,0 +1,25 @@
+"""
+Token counting shared by prompt packing, chunking and context budgets.
+
+Counts are exact for the OpenAI chat models when tiktoken is installed, and
+otherwise estimated at ~4 characters per token.
+"""
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+_encoding = None
+
+
+def count_tokens(text):
+    """Exact token count for gpt-4o-mini when tiktoken is available, else an estimate."""
+    global _encoding
+    if tiktoken is None:
+        return len(text) // 4 + 1
+    if _encoding is None:
+        try:
+            _encoding = tiktoken.encoding_for_model("gpt-4o-mini")
+        except KeyError:
+            _encoding = tiktoken.get_encoding("cl100k_base")
+    return len(_encoding.encode(text, disallowed_special=()))
@@ -0,0 +1,192 @@
+"""
+Streaming normalization of raw LLM triplet lines into canonical triplets.
+
+Extraction stores what the model printed, e.g. "1. (Jack, trades, cow for
+beans)". The graph loader wants [subject, relation, object] lists with one
+spelling per entity. This stage sits between them:
+
+    parse        strips numbering/bullets, stray parentheses and quotes, and
+                 splits on the first two commas, so commas inside the object
+                 survive ("(Jack, sells, cow, beans and a hen)")
+    canonicalize folds case, whitespace, edge punctuation and leading
+                 articles into a key, and maps every key to one interned
+                 surface form (the first one seen), so "The Moon", "moon" and
+                 "moon." become one Entity. Explicit aliases
+                 ({"alias": "canonical"}) merge forms the key cannot, in the
+                 spirit of the Canonicalize step of Extract-Define-Canonicalize
+                 (Papers/Extract_Define_Canonicalize.pdf).
+    dedupe       drops repeated (subject, relation, object) triplets per movie
+
+Records are streamed one at a time, so memory is bounded by the string
+table, not the corpus.
+
+Usage:
+    python -m common.triplets extracted_triplets.jsonl cleaned_triplets.jsonl --aliases aliases.json
+"""
+import json
+import os
+import re
+import sys
+
+# "1.", "2)", "-", "*", "•" list markers in front of a triplet
+LIST_MARKER = re.compile(r"^\s*(?:\d+\s*[.):]|[-*•])\s*")
+WHITESPACE = re.compile(r"\s+")
+LEADING_ARTICLE = re.compile(r"^(?:the|a|an)\s+")
+EDGE_CHARS = " \t\"'`.,;:!?[]{}"
+
+# Longer parts are almost always a sentence the model failed to split
+MAX_PART_LENGTH = 200
+
+
+def _clean_part(part):
+    """Collapses whitespace and strips edge punctuation, keeping balanced parentheses ("beans (magic)")."""
+    part = WHITESPACE.sub(" ", part).strip(EDGE_CHARS)
+    while part.startswith("(") and part.count("(") > part.count(")"):
+        part = part[1:].strip(EDGE_CHARS)
+    while part.endswith(")") and part.count(")") > part.count("("):
+        part = part[:-1].strip(EDGE_CHARS)
+    return part
+
+
+def parse_triplet(line):
+    """Parses one raw extraction line (or a 3-item list) into (subject, relation, object), or None."""
+    if isinstance(line, (list, tuple)):
+        parts = [str(part) for part in line] if len(line) == 3 else None
+    elif isinstance(line, str):
+        text = LIST_MARKER.sub("", line.strip())
+        start, end = text.find("("), text.rfind(")")
+        if start != -1 and end > start:
+            text = text[start + 1:end]
+        parts = text.split(",", 2)
+    else:
+        parts = None
+
+    if not parts or len(parts) != 3:
+        return None
+    parts = tuple(_clean_part(part) for part in parts)
+    if not all(parts) or any(len(part) > MAX_PART_LENGTH for part in parts):
+        return None
+    return parts
+
+
+class TripletCanonicalizer:
+    """Interned table mapping entity and relation surface forms to one canonical spelling each.
+
+    Usage:
+        canonicalizer = TripletCanonicalizer(aliases={"jack's mother": "Mother"})
+        canonicalizer.canonicalize(("the Moon", "Smiles at", "couple"))  # -> ("Moon", "smiles at", "couple")
+    """
+
+    def __init__(self, aliases=None):
+        self._entities = {}
+        self._relations = {}
+        self._aliases = {}
+        for alias, canonical in (aliases or {}).items():
+            # The canonical form claims its own key too, so it is never replaced by a later spelling
+            self._aliases[self.entity_key(alias)] = self.entity_key(canonical)
+            self._entities.setdefault(self.entity_key(canonical), sys.intern(_clean_part(canonical)))
+
+    @staticmethod
+    def entity_key(name):
+        return LEADING_ARTICLE.sub("", _clean_part(name).casefold())
+
+    @staticmethod
+    def relation_key(relation):
+        return _clean_part(relation).casefold()
+
+    def entity(self, name):
+        key = self.entity_key(name)
+        key = self._aliases.get(key, key)
+        canonical = self._entities.get(key)
+        if canonical is None:
+            # First spelling wins, minus a leading article ("The Moon" -> "Moon")
+            cleaned = _clean_part(name)
+            article = LEADING_ARTICLE.match(cleaned.casefold())
+            canonical = self._entities[key] = sys.intern(cleaned[article.end():] if article else cleaned)
+        return canonical
+
+    def relation(self, relation):
+        key = self.relation_key(relation)
+        canonical = self._relations.get(key)
+        if canonical is None:
+            canonical = self._relations[key] = sys.intern(key)
+        return canonical
+
+    def canonicalize(self, triplet):
+        subject, relation, object_ = triplet
+        return self.entity(subject), self.relation(relation), self.entity(object_)
+
+    def stats(self):
+        return {"entities": len(self._entities), "relations": len(self._relations), "aliases": len(self._aliases)}
+
+
+def normalize_triplets(lines, canonicalizer, stats=None):
+    """Parses, canonicalizes and dedupes one movie's raw triplet lines into [subject, relation, object] lists."""
+    seen = set()
+    triplets = []
+    for line in lines or []:
+        parsed = parse_triplet(line)
+        if parsed is None:
+            if stats is not None and str(line).strip():
+                stats["rejected"] += 1
+            continue
+        triplet = canonicalizer.canonicalize(parsed)
+        if triplet in seen:
+            if stats is not None:
+                stats["duplicates"] += 1
+            continue
+        seen.add(triplet)
+        triplets.append(list(triplet))
+    if stats is not None:
+        stats["triplets"] += len(triplets)
+    return triplets
+
+
+def normalize_records(records, canonicalizer=None, stats=None):
+    """Yields each extraction record with its Triplets normalized; records left with none are dropped."""
+    canonicalizer = canonicalizer or TripletCanonicalizer()
+    for record in records:
+        triplets = normalize_triplets(record.get("Triplets"), canonicalizer, stats)
+        if stats is not None:
+            stats["records"] += 1
+        if triplets:
+            yield {**record, "Triplets": triplets}
+        elif stats is not None:
+            stats["empty"] += 1
+
+
+def main():
+    import argparse
+    import time
+
+    from common.checkpoint import iter_records
+
+    parser = argparse.ArgumentParser(description="Normalize raw extraction output into canonical triplets")
+    parser.add_argument("input", help="Extraction checkpoint (JSONL) or legacy JSON list")
+    parser.add_argument("output", help="Cleaned triplets JSONL for newGraphGen.py")
+    parser.add_argument("--aliases", default=None, help='JSON file of {"alias": "canonical"} entity names')
+    args = parser.parse_args()
+
+    aliases = None
+    if args.aliases:
+        with open(args.aliases, "r", encoding="utf-8") as f:
+            aliases = json.load(f)
+    canonicalizer = TripletCanonicalizer(aliases)
+    stats = {"records": 0, "empty": 0, "triplets": 0, "rejected": 0, "duplicates": 0}
+
+    start = time.perf_counter()
+    tmp_path = args.output + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for record in normalize_records(iter_records(args.input), canonicalizer, stats):
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    os.replace(tmp_path, args.output)
+    elapsed = time.perf_counter() - start
+
+    print(f"Normalized {stats['records']} records in {elapsed:.1f}s: {stats['triplets']} triplets kept, "
+          f"{stats['rejected']} unparseable lines, {stats['duplicates']} duplicates, {stats['empty']} empty records")
+    print(f"String table: {canonicalizer.stats()}")
+    print(f"Saved cleaned triplets to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
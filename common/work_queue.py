@@ -0,0 +1,321 @@
+"""
+SQLite-backed work queue that lets several workers share one extraction or embedding job.
+
+TripletCheckpoint and the embedding store make a single process resumable,
+but two processes appending to them would step on each other. Here a job is
+split into row ranges, and workers lease ranges instead:
+
+    lease       a worker claims the first pending range, or one whose lease
+                expired (its worker died), for `lease_seconds`
+    heartbeat   a live worker extends its lease while it works, so only
+                crashed workers lose their ranges
+    commit      the range's results and its "done" state are written in one
+                transaction. Results are keyed by (job, row_id) and inserted
+                with INSERT OR IGNORE, so a range processed twice (a worker
+                that outlived its lease) still stores each row once.
+                Rows the worker could not process become single-row ranges
+                of their own and are retried.
+    release     the worker gave up on the whole range (an exception); it
+                goes back to pending
+
+Every lease counts as an attempt. A range that has been leased
+`max_attempts` times without being committed is marked failed, so a poison
+row cannot loop forever. retry_failed() puts failed ranges back.
+
+Every call is a short transaction. WAL mode lets status readers run
+alongside the workers, and any number of processes can share the database
+on one machine (or on a filesystem with working POSIX locks).
+
+Usage:
+    queue = WorkQueue("work_queue.sqlite3")
+    queue.create_job("extract", "extract", total_rows=34886, range_size=200)
+    while (lease := queue.lease("extract", owner="host-1:4242")) is not None:
+        results, failed = process(lease.first_row, lease.end_row)
+        queue.commit(lease, results, failed)
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+Lease = namedtuple("Lease", ["id", "job", "first_row", "end_row", "attempts", "owner"])
+
+
+def default_owner():
+    """A worker id that is unique per process: host:pid."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class WorkQueue:
+    """Row-range leases, retries and idempotent result storage in one SQLite file."""
+
+    def __init__(self, path="work_queue.sqlite3", lease_seconds=300, max_attempts=3):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=60)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                name TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                params TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS ranges (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                job TEXT NOT NULL,
+                first_row INTEGER NOT NULL,
+                end_row INTEGER NOT NULL,
+                state TEXT NOT NULL DEFAULT 'pending',
+                owner TEXT,
+                lease_expires REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                updated_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS ranges_job_state ON ranges(job, state);
+            CREATE TABLE IF NOT EXISTS results (
+                job TEXT NOT NULL,
+                row_id INTEGER NOT NULL,
+                payload BLOB NOT NULL,
+                owner TEXT,
+                committed_at REAL NOT NULL,
+                PRIMARY KEY (job, row_id)
+            ) WITHOUT ROWID;
+        """)
+
+    def _transaction(self, work):
+        """Runs `work(conn)` inside BEGIN IMMEDIATE, so concurrent lease/commit calls serialize."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = work(self._conn)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    # Jobs
+    def create_job(self, name, kind, total_rows, range_size=200, params=None):
+        """
+        Splits rows [0, total_rows) into ranges of `range_size`; a job that already exists is left as it is.
+
+        Returns:
+            bool: True when the job was created.
+        """
+        def work(conn):
+            if conn.execute("SELECT 1 FROM jobs WHERE name = ?", (name,)).fetchone():
+                return False
+            now = time.time()
+            conn.execute("INSERT INTO jobs (name, kind, params, created_at) VALUES (?, ?, ?, ?)",
+                         (name, kind, json.dumps(params or {}), now))
+            conn.executemany(
+                "INSERT INTO ranges (job, first_row, end_row, updated_at) VALUES (?, ?, ?, ?)",
+                ((name, first, min(first + range_size, total_rows), now) for first in range(0, total_rows, range_size))
+            )
+            return True
+        return self._transaction(work)
+
+    def job(self, name):
+        """(kind, params) of a job, or None when it does not exist."""
+        with self._lock:
+            row = self._conn.execute("SELECT kind, params FROM jobs WHERE name = ?", (name,)).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def jobs(self):
+        with self._lock:
+            return [name for (name,) in self._conn.execute("SELECT name FROM jobs ORDER BY created_at")]
+
+    # Leases
+    def lease(self, job, owner=None):
+        """Claims the next pending or expired range of `job`; None when nothing is left to lease."""
+        owner = owner or default_owner()
+
+        def work(conn):
+            now = time.time()
+            # Ranges whose worker died on their last allowed attempt are not handed out again
+            conn.execute(
+                "UPDATE ranges SET state = 'failed', error = COALESCE(error, 'lease expired'), updated_at = ? "
+                "WHERE job = ? AND state = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, job, now, self.max_attempts)
+            )
+            row = conn.execute(
+                "SELECT id, first_row, end_row, attempts FROM ranges "
+                "WHERE job = ? AND (state = 'pending' OR (state = 'leased' AND lease_expires < ?)) "
+                "ORDER BY id LIMIT 1",
+                (job, now)
+            ).fetchone()
+            if row is None:
+                return None
+            range_id, first_row, end_row, attempts = row
+            conn.execute(
+                "UPDATE ranges SET state = 'leased', owner = ?, lease_expires = ?, attempts = ?, updated_at = ? "
+                "WHERE id = ?",
+                (owner, now + self.lease_seconds, attempts + 1, now, range_id)
+            )
+            return Lease(range_id, job, first_row, end_row, attempts + 1, owner)
+        return self._transaction(work)
+
+    def heartbeat(self, lease):
+        """Extends a lease; False when it has expired and been claimed by someone else."""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE ranges SET lease_expires = ?, updated_at = ? WHERE id = ? AND owner = ? AND state = 'leased'",
+                (now + self.lease_seconds, now, lease.id, lease.owner)
+            )
+            return cursor.rowcount == 1
+
+    def commit(self, lease, results, failed=None):
+        """
+        Stores a range's results and marks it done.
+
+        Args:
+            lease (Lease): The lease being completed.
+            results (dict): row_id -> payload (bytes or str).
+            failed (dict): row_id -> error for rows to retry on their own. Rows of the range in neither
+                dict had nothing to process (e.g. an empty plot).
+
+        Returns:
+            bool: False when the lease had been lost. The results are still stored, since inserts are
+            idempotent, but the range is left to its new owner.
+        """
+        def work(conn):
+            now = time.time()
+            conn.executemany(
+                "INSERT OR IGNORE INTO results (job, row_id, payload, owner, committed_at) VALUES (?, ?, ?, ?, ?)",
+                ((lease.job, int(row_id), payload, lease.owner, now) for row_id, payload in results.items())
+            )
+            cursor = conn.execute(
+                "UPDATE ranges SET state = 'done', lease_expires = NULL, error = NULL, updated_at = ? "
+                "WHERE id = ? AND owner = ? AND state = 'leased'",
+                (now, lease.id, lease.owner)
+            )
+            if cursor.rowcount != 1:
+                return False
+            # Each failed row carries the range's attempt count into its own retry range
+            state = "pending" if lease.attempts < self.max_attempts else "failed"
+            conn.executemany(
+                "INSERT INTO ranges (job, first_row, end_row, state, attempts, error, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                ((lease.job, int(row_id), int(row_id) + 1, state, lease.attempts, str(error), now)
+                 for row_id, error in (failed or {}).items() if row_id not in results)
+            )
+            return True
+        return self._transaction(work)
+
+    def release(self, lease, error):
+        """Hands a whole range back after an error; it is retried until max_attempts, then marked failed."""
+        state = "pending" if lease.attempts < self.max_attempts else "failed"
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE ranges SET state = ?, owner = NULL, lease_expires = NULL, error = ?, updated_at = ? "
+                "WHERE id = ? AND owner = ? AND state = 'leased'",
+                (state, str(error), now, lease.id, lease.owner)
+            )
+
+    def retry_failed(self, job):
+        """Puts failed ranges back in the queue with a fresh attempt budget; returns how many."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE ranges SET state = 'pending', attempts = 0, owner = NULL, updated_at = ? "
+                "WHERE job = ? AND state = 'failed'",
+                (time.time(), job)
+            )
+            return cursor.rowcount
+
+    # Results
+    def done_rows(self, job):
+        """Row ids with a stored result."""
+        with self._lock:
+            return {row_id for (row_id,) in self._conn.execute("SELECT row_id FROM results WHERE job = ?", (job,))}
+
+    def iter_results(self, job, batch_size=1000):
+        """Yields (row_id, payload) in row order, a batch at a time."""
+        last = -1
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT row_id, payload FROM results WHERE job = ? AND row_id > ? ORDER BY row_id LIMIT ?",
+                    (job, last, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            yield from rows
+            last = rows[-1][0]
+
+    def status(self, job, window=60):
+        """Range counts by state, stored rows, live workers, recent throughput and the latest errors."""
+        now = time.time()
+        with self._lock:
+            states = dict(self._conn.execute(
+                "SELECT state, COUNT(*) FROM ranges WHERE job = ? GROUP BY state", (job,)
+            ).fetchall())
+            rows_done, recent = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(committed_at > ?), 0) FROM results WHERE job = ?",
+                (now - window, job)
+            ).fetchone()
+            total = self._conn.execute(
+                "SELECT COALESCE(MAX(end_row), 0) FROM ranges WHERE job = ?", (job,)
+            ).fetchone()[0]
+            workers = [owner for (owner,) in self._conn.execute(
+                "SELECT DISTINCT owner FROM ranges WHERE job = ? AND state = 'leased' AND lease_expires >= ?",
+                (job, now)
+            )]
+            errors = self._conn.execute(
+                "SELECT first_row, end_row, attempts, error FROM ranges "
+                "WHERE job = ? AND error IS NOT NULL AND state != 'done' ORDER BY updated_at DESC LIMIT 5",
+                (job,)
+            ).fetchall()
+        return {
+            "ranges": {state: states.get(state, 0) for state in ("pending", "leased", "done", "failed")},
+            "rows_done": rows_done,
+            "rows_total": total,
+            "workers": workers,
+            "rows_per_sec": round(recent / window, 2),
+            "recent_errors": [{"rows": [first, end], "attempts": attempts, "error": error}
+                              for first, end, attempts, error in errors],
+        }
+
+    def close(self):
+        self._conn.close()
+
+
+class Heartbeat:
+    """Background thread that keeps a lease alive while its range is processed.
+
+    Usage:
+        with Heartbeat(queue, lease) as heartbeat:
+            ...
+        heartbeat.lost   # True when the lease expired and was claimed by another worker
+    """
+
+    def __init__(self, queue, lease, interval=None):
+        self.queue = queue
+        self.lease = lease
+        self.interval = interval or max(1.0, queue.lease_seconds / 3)
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            if not self.queue.heartbeat(self.lease):
+                self.lost = True
+                return
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
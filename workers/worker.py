@@ -0,0 +1,335 @@
+"""
+Multi-worker triplet extraction and embedding generation on a shared work queue.
+
+A job (see common/work_queue.py) splits the cleaned dataset into row ranges.
+Each worker process leases a range, processes it, and commits the results
+to the queue's SQLite file. It heartbeats while it works. A crashed worker's
+range is re-leased once its lease expires, and rows that failed are retried
+on their own until --max-attempts. Results are stored once per row however
+often a range runs. `export` then writes them, in row order, to the usual
+outputs: the TripletCheckpoint JSONL for extraction, the EmbeddingStore for
+embeddings.
+
+Job kinds:
+    extract   asyncExtraction.run_extraction over the range (packing and
+              chunking options are fixed per job at submit time)
+    embed     batched embeddings.create over the range's plots
+
+Rate limits (--rpm/--tpm) apply per worker. Split the account's budget
+across the workers you start.
+
+Usage:
+    python workers/worker.py submit extract --kind extract --range-size 200 --pack-tokens 3000
+    python workers/worker.py run extract --concurrency 16 --rpm 1000     # on each worker
+    python workers/worker.py status extract --watch 10
+    python workers/worker.py retry-failed extract
+    python workers/worker.py export extract --output extracted_triplets.jsonl
+
+    python workers/worker.py submit embed --kind embed --range-size 2000
+    python workers/worker.py run embed
+    python workers/worker.py export embed --output movie_embeddings
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+for path in ("", "Phase1_EntityGen", "Phase3_LLM_RAG"):
+    sys.path.append(os.path.join(ROOT, path))
+
+from common.dataset import load_movies
+from common.work_queue import Heartbeat, WorkQueue, default_owner
+
+QUEUE_PATH = os.getenv("WORK_QUEUE_PATH", "work_queue.sqlite3")
+csv_file = "cleaned_wiki_movie_plots.csv"
+
+
+class _CollectingWriter:
+    """Stands in for OrderedWriter: run_extraction's records are kept in memory for the range's commit."""
+
+    def __init__(self):
+        self.records = {}
+
+    def add(self, index, record):
+        self.records[index] = record
+
+    def flush(self):
+        pass
+
+
+def extract_handler(params, args):
+    """Returns process(first_row, end_row) -> (results, failed) for an extraction job."""
+    import asyncExtraction
+
+    df = load_movies(["Title", params["column"]], path=params["csv"])
+    # One loop for the worker's lifetime: the async client and the limiter stay bound to it across ranges
+    loop = asyncio.new_event_loop()
+    client = asyncExtraction.make_client(args.base_url)
+    limiter = asyncExtraction.RateLimiter(rpm=args.rpm, tpm=args.tpm)
+
+    def process(first_row, end_row):
+        batch = df.loc[first_row:end_row - 1]
+        # Blank and NaN plots have nothing to extract; they go in neither dict, as with embed_handler
+        rows = [
+            (row_id, title, plot)
+            for row_id, title, plot in zip(batch.index.tolist(), batch["Title"].tolist(),
+                                           batch[params["column"]].tolist())
+            if isinstance(plot, str) and plot.strip()
+        ]
+        writer = _CollectingWriter()
+        loop.run_until_complete(asyncExtraction.run_extraction(
+            rows, client, limiter, writer, args.concurrency, args.max_retries, params.get("pack_tokens"),
+            params.get("pack_items", 16), chunk_tokens=params.get("chunk_tokens"),
+            chunk_overlap=params.get("chunk_overlap", 150)
+        ))
+        results, failed = {}, {}
+        for index, (row_id, _, _) in enumerate(rows):
+            record = writer.records.get(index)
+            if record is None:
+                failed[row_id] = "no triplets extracted"
+            else:
+                results[row_id] = json.dumps(record, ensure_ascii=False)
+        return results, failed
+
+    return process
+
+
+def embed_handler(params, args):
+    """Returns process(first_row, end_row) -> (results, failed) for an embedding job."""
+    import numpy as np
+    import openai
+    import Semantic_retrieval
+
+    df = load_movies(["Title", params["column"]], path=params["csv"])
+    if args.base_url:
+        client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY", "stub"), base_url=args.base_url)
+    else:
+        client = Semantic_retrieval.get_client()
+    # The SDK retries rate limits and transient errors with exponential backoff
+    client = client.with_options(max_retries=args.max_retries)
+
+    def process(first_row, end_row):
+        batch = df.loc[first_row:end_row - 1]
+        items = [
+            (row_id, title, plot[:Semantic_retrieval.MAX_INPUT_CHARS])
+            for row_id, title, plot in zip(batch.index.tolist(), batch["Title"].tolist(),
+                                           batch[params["column"]].tolist())
+            if isinstance(plot, str) and plot.strip()
+        ]
+        results = {}
+        for request in Semantic_retrieval.pack_requests(items):
+            response = client.embeddings.create(input=[text for _, _, text in request],
+                                                model=Semantic_retrieval.EMBEDDING_MODEL)
+            for (row_id, title, text), item in zip(request, response.data):
+                header = {"title": title, "plot_hash": Semantic_retrieval.plot_hash(text)}
+                results[row_id] = encode_vector(header, np.asarray(item.embedding, dtype=np.float32))
+        return results, {}
+
+    return process
+
+
+def encode_vector(header, vector):
+    """Embedding payload: a JSON header line, then the raw float32 vector."""
+    return json.dumps(header, ensure_ascii=False).encode("utf-8") + b"\n" + vector.tobytes()
+
+
+def decode_vector(payload):
+    import numpy as np
+
+    header, vector = bytes(payload).split(b"\n", 1)
+    return json.loads(header), np.frombuffer(vector, dtype=np.float32)
+
+
+HANDLERS = {"extract": extract_handler, "embed": embed_handler}
+
+
+def run_worker(queue, job, args):
+    """Leases, processes and commits ranges of `job` until none are left; returns the rows committed."""
+    kind, params = queue.job(job)
+    process = HANDLERS[kind](params, args)
+    owner = args.owner or default_owner()
+    committed = 0
+    start = time.perf_counter()
+
+    while args.max_ranges is None or args.max_ranges > 0:
+        lease = queue.lease(job, owner)
+        if lease is None:
+            # Other workers' leases may still expire and need picking up
+            if args.wait and queue.status(job)["ranges"]["leased"]:
+                time.sleep(args.wait)
+                continue
+            break
+        try:
+            with Heartbeat(queue, lease):
+                results, failed = process(lease.first_row, lease.end_row)
+        except KeyboardInterrupt:
+            queue.release(lease, "interrupted")
+            raise
+        except Exception as e:
+            print(f"Rows {lease.first_row}-{lease.end_row - 1} failed (attempt {lease.attempts}): {e!r}")
+            queue.release(lease, repr(e))
+            continue
+
+        if not queue.commit(lease, results, failed):
+            print(f"Lease on rows {lease.first_row}-{lease.end_row - 1} was lost; results kept, range left to "
+                  f"its new owner")
+        committed += len(results)
+        if args.max_ranges is not None:
+            args.max_ranges -= 1
+        elapsed = time.perf_counter() - start
+        print(f"Committed rows {lease.first_row}-{lease.end_row - 1}: {len(results)} done, {len(failed)} to retry "
+              f"({committed / max(elapsed, 1e-9):.1f} rows/sec)")
+    return committed
+
+
+def export_extract(queue, job, output):
+    from common.checkpoint import TripletCheckpoint
+
+    written = 0
+    with TripletCheckpoint(output) as checkpoint:
+        for row_id, payload in queue.iter_results(job):
+            if row_id not in checkpoint:
+                checkpoint.append(json.loads(payload))
+                written += 1
+    return written
+
+
+def export_embed(queue, job, output, batch_size=1000):
+    import Semantic_retrieval
+    from embedding_store import EmbeddingStore
+
+    store = None
+    if os.path.exists(os.path.join(output, "meta.json")):
+        store = EmbeddingStore(output)
+    stored = {(row["row_id"], row.get("plot_hash")) for row in store.rows} if store is not None else set()
+    stored_ids = {row_id for row_id, _ in stored}
+
+    written = 0
+    replaced = False
+    pending = []
+
+    def flush():
+        nonlocal store, written
+        if store is None:
+            store = EmbeddingStore.create(output, dim=len(pending[0][2]), model=Semantic_retrieval.EMBEDDING_MODEL)
+        store.append([row_id for row_id, _, _ in pending], [header["title"] for _, header, _ in pending],
+                     [vector for _, _, vector in pending],
+                     extra=[{"plot_hash": header["plot_hash"]} for _, header, _ in pending])
+        written += len(pending)
+        pending.clear()
+
+    for row_id, payload in queue.iter_results(job):
+        header, vector = decode_vector(payload)
+        if (row_id, header["plot_hash"]) in stored:
+            continue
+        replaced = replaced or row_id in stored_ids
+        pending.append((row_id, header, vector))
+        if len(pending) >= batch_size:
+            flush()
+    if pending:
+        flush()
+    # Changed plots were appended alongside their old vectors; drop the superseded ones
+    if replaced:
+        store.compact()
+    return written
+
+
+EXPORTERS = {"extract": export_extract, "embed": export_embed}
+
+
+def print_status(queue, job):
+    status = queue.status(job)
+    ranges = status["ranges"]
+    percent = 100 * status["rows_done"] / max(status["rows_total"], 1)
+    print(f"{job}: {status['rows_done']}/{status['rows_total']} rows ({percent:.1f}%), "
+          f"{status['rows_per_sec']} rows/sec over the last minute")
+    print(f"  ranges: {ranges['pending']} pending, {ranges['leased']} leased, {ranges['done']} done, "
+          f"{ranges['failed']} failed")
+    print(f"  workers: {', '.join(status['workers']) or 'none'}")
+    for error in status["recent_errors"]:
+        print(f"  rows {error['rows'][0]}-{error['rows'][1] - 1} (attempt {error['attempts']}): {error['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared work queue for extraction and embedding workers")
+    parser.add_argument("--queue", default=QUEUE_PATH, help="Queue SQLite file (env WORK_QUEUE_PATH)")
+    parser.add_argument("--lease-seconds", type=int, default=300)
+    parser.add_argument("--max-attempts", type=int, default=3)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    submit = commands.add_parser("submit", help="Create a job over the dataset's rows")
+    submit.add_argument("job")
+    submit.add_argument("--kind", choices=sorted(HANDLERS), required=True)
+    submit.add_argument("--csv", default=csv_file)
+    submit.add_argument("--column", default="Cleaned_Plot")
+    submit.add_argument("--range-size", type=int, default=200, help="Rows per lease")
+    submit.add_argument("--pack-tokens", type=int, default=None)
+    submit.add_argument("--pack-items", type=int, default=16)
+    submit.add_argument("--chunk-tokens", type=int, default=None)
+    submit.add_argument("--chunk-overlap", type=int, default=150)
+
+    run = commands.add_parser("run", help="Process ranges of a job until none are left")
+    run.add_argument("job")
+    run.add_argument("--concurrency", type=int, default=16, help="Requests in flight (extraction)")
+    run.add_argument("--rpm", type=int, default=None, help="This worker's requests-per-minute budget")
+    run.add_argument("--tpm", type=int, default=None, help="This worker's tokens-per-minute budget")
+    run.add_argument("--max-retries", type=int, default=6)
+    run.add_argument("--base-url", default=None, help="OpenAI-compatible endpoint, e.g. the stub server")
+    run.add_argument("--owner", default=None, help="Worker id (default host:pid)")
+    run.add_argument("--max-ranges", type=int, default=None, help="Stop after this many ranges")
+    run.add_argument("--wait", type=float, default=None,
+                     help="Poll every N seconds while other workers hold leases, to take over expired ones")
+
+    status = commands.add_parser("status", help="Progress of one job, or all of them")
+    status.add_argument("job", nargs="?")
+    status.add_argument("--watch", type=float, default=None, help="Refresh every N seconds")
+
+    retry = commands.add_parser("retry-failed", help="Re-queue ranges that ran out of attempts")
+    retry.add_argument("job")
+
+    export = commands.add_parser("export", help="Write a job's results to the pipeline's usual output")
+    export.add_argument("job")
+    export.add_argument("--output", required=True, help="Triplet JSONL (extract) or embedding store directory (embed)")
+    args = parser.parse_args()
+
+    queue = WorkQueue(args.queue, lease_seconds=args.lease_seconds, max_attempts=args.max_attempts)
+    if args.command != "submit" and args.job is not None and queue.job(args.job) is None:
+        parser.error(f"No job named {args.job!r} in {args.queue}")
+
+    if args.command == "submit":
+        if args.chunk_tokens is not None and args.chunk_overlap >= args.chunk_tokens:
+            parser.error("--chunk-overlap must be smaller than --chunk-tokens")
+        total_rows = int(load_movies(["Title"], path=args.csv).index.max()) + 1
+        params = {"csv": os.path.abspath(args.csv), "column": args.column}
+        if args.kind == "extract":
+            params.update(pack_tokens=args.pack_tokens, pack_items=args.pack_items, chunk_tokens=args.chunk_tokens,
+                          chunk_overlap=args.chunk_overlap)
+        if queue.create_job(args.job, args.kind, total_rows, args.range_size, params):
+            print(f"Created {args.kind} job {args.job!r}: {total_rows} rows in ranges of {args.range_size}")
+        else:
+            print(f"Job {args.job!r} already exists")
+    elif args.command == "run":
+        committed = run_worker(queue, args.job, args)
+        print(f"No ranges left to lease; committed {committed} rows")
+    elif args.command == "status":
+        while True:
+            for job in [args.job] if args.job else queue.jobs():
+                print_status(queue, job)
+            if not args.watch:
+                break
+            time.sleep(args.watch)
+            print()
+    elif args.command == "retry-failed":
+        print(f"Re-queued {queue.retry_failed(args.job)} ranges")
+    elif args.command == "export":
+        kind, _ = queue.job(args.job)
+        written = EXPORTERS[kind](queue, args.job, args.output)
+        print(f"Wrote {written} new rows to {args.output}")
+    queue.close()
+
+
+if __name__ == "__main__":
+    main()